@@ -101,3 +101,27 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
+
+# Merge pipeline settings
+# 流式合并: 按块读取、清洗、写出, 峰值内存取决于块大小
+MERGE_STREAMING = True
+MERGE_CHUNK_SIZE = 5000
+# 内存模式读取时并行解析文件的进程数, 1 表示顺序读取。只在整表读入内存时使用
+# (MERGE_STREAMING = False、任务包含向后/均值/中位数填充, 以及数据验证、图表接口), 默认的流式合并不使用。
+# 每个合并工作进程各自创建进程池, 同时运行 run_merge_worker --processes N 时最多有 N × 该值个解析进程,
+# 因此默认取较小的固定值, 避免多个工作进程争用 CPU
+MERGE_READ_WORKERS = min(2, os.cpu_count() or 1)
+# 任务队列: 处理接口只把任务放入队列, 由 `python manage.py run_merge_worker` 启动的工作进程处理;
+# 设为 False 时在请求内同步处理
+MERGE_JOB_QUEUE = True
+# 任务进度写入数据库的最小间隔 (秒)
+MERGE_PROGRESS_INTERVAL = 1.0
+# 清洗规则的执行方式: 'python' 逐行处理; 'vectorized' 把规则涉及的列转为 NumPy 数组按列批量处理,
+# 结果与逐行处理完全一致; 日期标准化等逐值开销大的规则明显更快, 去空格等简单规则逐行处理更快
+CLEANING_BACKEND = 'python'
+# 删除重复行时已见键摘要 (每个不同的键 16 字节) 的内存上限 (字节), 超过后溢写到临时目录
+DEDUP_MEMORY_LIMIT = 256 * 1024 * 1024  # 256MB
+# 解析结果缓存: 按文件内容哈希缓存解析后的数据, 重复处理同一文件时跳过解析;
+# PARSE_CACHE_DIR 设为 None 时关闭
+PARSE_CACHE_DIR = BASE_DIR / 'cache' / 'parsed'
+PARSE_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 1GB
@@ -5,3 +5,12 @@ class MergerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'merger'
     verbose_name = 'Excel 合并工具'
+
+    def ready(self):
+        from django.conf import settings
+        from .core import parse_cache
+
+        parse_cache.configure(
+            getattr(settings, 'PARSE_CACHE_DIR', None),
+            getattr(settings, 'PARSE_CACHE_MAX_BYTES', 1024 * 1024 * 1024),
+        )
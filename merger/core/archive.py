@@ -0,0 +1,146 @@
+"""
+压缩包输入
+zip 压缩包中的每个成员、gzip 文件解压后的内容都作为一个独立的输入文件 (ArchiveMember),
+读取时直接从压缩包中流式解压, 不解压到磁盘。
+
+读取函数统一通过 open_source / open_text / seekable / source_stat 访问输入,
+因此既可以传入普通文件路径, 也可以传入 ArchiveMember。
+"""
+import gzip
+import io
+import os
+import struct
+import zipfile
+from collections import namedtuple
+from pathlib import PurePosixPath
+
+
+ARCHIVE_FORMATS = ['zip', 'gz']
+
+# 成员文件的大小与修改时间 (修改时间取压缩包本身), 字段名与 os.stat_result 一致
+SourceStat = namedtuple('SourceStat', ['st_size', 'st_mtime_ns'])
+
+
+def archive_format(name):
+    """按文件名判断压缩格式, 不是压缩包时返回 None"""
+    suffix = PurePosixPath(str(name)).suffix.lower().lstrip('.')
+    return suffix if suffix in ARCHIVE_FORMATS else None
+
+
+class ArchiveMember:
+    """压缩包中的一个成员文件"""
+
+    def __init__(self, archive_path, member):
+        self.archive_path = str(archive_path)
+        self.member = member
+        self.archive_format = archive_format(self.archive_path)
+        if self.archive_format is None:
+            raise ValueError(f"Unsupported archive format: {self.archive_path}")
+
+    @property
+    def name(self):
+        return PurePosixPath(self.member).name
+
+    @property
+    def suffix(self):
+        return PurePosixPath(self.member).suffix
+
+    def open(self):
+        """以二进制流打开成员, 边读边解压"""
+        if self.archive_format == 'gz':
+            return gzip.open(self.archive_path, 'rb')
+        # ZipFile 关闭后, 已打开的成员流仍持有底层文件, 直到成员流关闭
+        with zipfile.ZipFile(self.archive_path) as archive:
+            return archive.open(self.member)
+
+    def read_bytes(self):
+        with self.open() as f:
+            return f.read()
+
+    def stat(self):
+        archive_stat = os.stat(self.archive_path)
+        if self.archive_format == 'gz':
+            # gzip 尾部 4 字节记录解压后大小 (对 2^32 取模), 仅用作缓存标识与估算
+            with open(self.archive_path, 'rb') as f:
+                f.seek(-4, os.SEEK_END)
+                size = struct.unpack('<I', f.read(4))[0]
+        else:
+            with zipfile.ZipFile(self.archive_path) as archive:
+                size = archive.getinfo(self.member).file_size
+        return SourceStat(size, archive_stat.st_mtime_ns)
+
+    def __eq__(self, other):
+        return (isinstance(other, ArchiveMember)
+                and (self.archive_path, self.member) == (other.archive_path, other.member))
+
+    def __hash__(self):
+        return hash((self.archive_path, self.member))
+
+    def __str__(self):
+        return f"{self.archive_path}!{self.member}"
+
+    def __repr__(self):
+        return f"ArchiveMember({self.archive_path!r}, {self.member!r})"
+
+
+def list_members(fileobj, name, supported_suffixes):
+    """
+    列出压缩包中可作为输入的成员
+
+    Args:
+        fileobj: 压缩包路径或可 seek 的文件对象
+        name: 压缩包原始文件名 (gzip 的成员名由它去掉 .gz 得到)
+        supported_suffixes: 支持的成员扩展名 (不含点, 小写)
+
+    Returns:
+        成员名列表; 目录、隐藏文件与 macOS 元数据会被跳过
+    """
+    fmt = archive_format(name)
+    if fmt == 'gz':
+        member = PurePosixPath(str(name).replace('\\', '/')).stem
+        suffix = PurePosixPath(member).suffix.lower().lstrip('.')
+        return [member] if suffix in supported_suffixes else []
+
+    if fmt == 'zip':
+        members = []
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                path = PurePosixPath(info.filename)
+                if info.is_dir() or path.name.startswith('.') or '__MACOSX' in path.parts:
+                    continue
+                if path.suffix.lower().lstrip('.') in supported_suffixes:
+                    members.append(info.filename)
+        return members
+
+    raise ValueError(f"Unsupported archive format: {name}")
+
+
+def open_source(path):
+    """以二进制模式打开输入 (普通文件或压缩包成员)"""
+    if isinstance(path, ArchiveMember):
+        return path.open()
+    return open(path, 'rb')
+
+
+def open_text(path, encoding, newline=None):
+    """以文本模式打开输入"""
+    if isinstance(path, ArchiveMember):
+        return io.TextIOWrapper(path.open(), encoding=encoding, newline=newline)
+    return open(path, 'r', encoding=encoding, newline=newline)
+
+
+def seekable(path):
+    """
+    供需要随机访问的格式 (xlsx/xls/parquet/arrow) 使用:
+    普通文件返回路径字符串, 压缩包成员解压到内存后返回 BytesIO
+    """
+    if isinstance(path, ArchiveMember):
+        return io.BytesIO(path.read_bytes())
+    return str(path)
+
+
+def source_stat(path):
+    """输入的大小与修改时间"""
+    if isinstance(path, ArchiveMember):
+        return path.stat()
+    return os.stat(path)
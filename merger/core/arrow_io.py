@@ -0,0 +1,295 @@
+"""
+Parquet / Arrow IPC 读写
+按记录批次读取并转换为行, 支持只读取指定列 (列投影);
+写出时按批次转换为列式数据, 列类型随数据放宽 (见 write_rows)
+"""
+import json
+import os
+import tempfile
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from . import archive, compression
+
+
+# 每个记录批次的行数
+BATCH_ROWS = 65536
+
+_CONVERSION_ERRORS = (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError, TypeError)
+
+
+def _open_source(path):
+    """普通文件以内存映射打开, 压缩包成员解压到内存缓冲区"""
+    source = archive.seekable(path)
+    if isinstance(source, str):
+        return pa.memory_map(source, 'r')
+    return pa.BufferReader(source.getvalue())
+
+
+def _open_ipc(path):
+    """打开 Arrow IPC 文件, 同时兼容文件格式 (含 Feather v2) 与流格式"""
+    source = _open_source(path)
+    try:
+        return ipc.open_file(source)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return ipc.open_stream(source)
+
+
+def _ipc_batches(reader):
+    if isinstance(reader, ipc.RecordBatchFileReader):
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        yield from reader
+
+
+def read_schema(path, file_format):
+    """
+    只读取列名与行数, 不解码数据
+
+    Returns:
+        (columns, num_rows)
+    """
+    if file_format == 'parquet':
+        parquet_file = pq.ParquetFile(_open_source(path))
+        return parquet_file.schema_arrow.names, parquet_file.metadata.num_rows
+
+    reader = _open_ipc(path)
+    return reader.schema.names, sum(batch.num_rows for batch in _ipc_batches(reader))
+
+
+def _is_nested(data_type):
+    return (pa.types.is_list(data_type) or pa.types.is_large_list(data_type)
+            or pa.types.is_struct(data_type) or pa.types.is_map(data_type))
+
+
+def _batch_rows(batch):
+    """记录批次 -> 行列表; 嵌套类型序列化为 JSON 文本, 带时区的时间戳转为 UTC 时间"""
+    columns = []
+    for field, column in zip(batch.schema, batch.columns):
+        data_type = field.type
+        if pa.types.is_timestamp(data_type) and data_type.tz:
+            column = column.cast(pa.timestamp(data_type.unit))
+        values = column.to_pylist()
+        if _is_nested(data_type):
+            values = [
+                json.dumps(value, ensure_ascii=False, default=str) if value is not None else None
+                for value in values
+            ]
+        columns.append(values)
+    return [list(row) for row in zip(*columns)]
+
+
+def stream_rows(path, file_format, columns=None):
+    """
+    按批次流式读取
+
+    Args:
+        path: 文件路径
+        file_format: 'parquet' 或 'arrow'
+        columns: 只读取这些列 (不存在的列忽略); None 表示全部列
+
+    Returns:
+        (header, rows): rows 为惰性迭代器
+    """
+    if file_format == 'parquet':
+        parquet_file = pq.ParquetFile(_open_source(path))
+        names = parquet_file.schema_arrow.names
+        if columns is not None:
+            wanted = set(columns)
+            names = [name for name in names if name in wanted]
+        batches = parquet_file.iter_batches(batch_size=BATCH_ROWS, columns=names)
+    else:
+        reader = _open_ipc(path)
+        names = reader.schema.names
+        if columns is not None:
+            wanted = set(columns)
+            names = [name for name in names if name in wanted]
+        batches = (batch.select(names) for batch in _ipc_batches(reader))
+
+    def generate_rows():
+        for batch in batches:
+            yield from _batch_rows(batch)
+
+    return list(names), generate_rows()
+
+
+def _to_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def _is_numeric(data_type):
+    return pa.types.is_integer(data_type) or pa.types.is_floating(data_type)
+
+
+def _unify_types(data_type, other):
+    """
+    能同时容纳两种类型的类型: 相同类型不变, 数值之间按 Arrow 的规则提升 (如整数 → 浮点数),
+    其余情况 (布尔值与数值、日期与时间戳等) 为字符串
+    """
+    if data_type == other:
+        return data_type
+    if not (_is_numeric(data_type) and _is_numeric(other)):
+        return pa.string()
+    try:
+        schema = pa.unify_schemas(
+            [pa.schema([('v', data_type)]), pa.schema([('v', other)])],
+            promote_options='permissive',
+        )
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return pa.string()
+    return schema.field('v').type
+
+
+def _batch_array(values):
+    """
+    按这批值推断类型并转换
+
+    pyarrow 按第一个非空值确定类型并把其余的值强制转换过去 (日期之后的整数被当作天数),
+    因此这里按值的 Python 类型推断: 只有一种类型时交给 pyarrow, 有多种类型时每种类型取一个
+    样本推断, 再按 _unify_types 合并, 结果与值的顺序无关
+
+    Returns:
+        pyarrow 数组; 类型混杂而只能写为字符串时返回 None
+    """
+    kinds = set(map(type, values))
+    kinds.discard(type(None))
+    if any(issubclass(kind, str) for kind in kinds):
+        # 空字符串按空值处理
+        values = [None if value == '' else value for value in values]
+
+    data_type = None
+    if len(kinds) > 1:
+        samples = {}
+        for value in values:
+            if value is not None and type(value) not in samples:
+                samples[type(value)] = value
+        for sample in samples.values():
+            try:
+                sample_type = pa.infer_type([sample])
+            except _CONVERSION_ERRORS:
+                return None
+            data_type = sample_type if data_type is None else _unify_types(data_type, sample_type)
+            if pa.types.is_string(data_type):
+                return None
+    try:
+        return pa.array(values, type=data_type)
+    except _CONVERSION_ERRORS:
+        return None
+
+
+def _column_array(values, data_type):
+    """
+    按列类型转换一批值
+
+    先按这批值本身推断类型, 与当前列类型不同时放宽列类型, 不会把值强制转换为
+    不相容的类型 (如把 2.5 截断为整数)
+
+    Args:
+        data_type: 当前列类型, None 表示之前的批次全部为空
+
+    Returns:
+        (array, data_type): data_type 为放宽后的列类型 (仍全部为空时为 None)
+    """
+    if data_type is None or not pa.types.is_string(data_type):
+        array = _batch_array(values)
+        if array is not None and not pa.types.is_string(array.type):
+            if pa.types.is_null(array.type):
+                if data_type is None:
+                    return array, None
+                return pa.nulls(len(array), data_type), data_type
+            if data_type is None or array.type == data_type:
+                return array, array.type
+            data_type = _unify_types(data_type, array.type)
+            if not pa.types.is_string(data_type):
+                try:
+                    return array.cast(data_type), data_type
+                except _CONVERSION_ERRORS + (pa.ArrowNotImplementedError,):
+                    pass
+        data_type = pa.string()
+
+    # 字符串列保留空字符串, 其余值按 Python 的 str 转换
+    return pa.array([_to_text(value) for value in values], type=data_type), data_type
+
+
+def _cast_batch(batch, schema):
+    """把临时文件中的批次转换为最终的列类型"""
+    if batch.schema.equals(schema):
+        return batch
+    arrays = []
+    for column, field in zip(batch.columns, schema):
+        if column.type != field.type:
+            if pa.types.is_null(column.type):
+                column = pa.nulls(len(column), field.type)
+            elif pa.types.is_string(field.type):
+                # 与直接按字符串类型写出的值一致 (Python 的 str)
+                column = pa.array([_to_text(value) for value in column.to_pylist()], type=field.type)
+            else:
+                column = column.cast(field.type, safe=False)
+        arrays.append(column)
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write_rows(header, rows, output_path, file_format):
+    """
+    按批次写出 Parquet / Arrow IPC 文件
+
+    列类型随数据逐步确定: 后续批次出现当前类型无法容纳的值时放宽该列的类型 (整数 → 浮点数,
+    或改为字符串), 而不是中途报错; 全部为空的列使用字符串类型。
+    输出文件的 schema 必须在写入前确定, 因此各批次先写入临时目录中的 Arrow IPC 文件
+    (列类型变化时换一个文件), 全部转换完成后再按最终类型写出
+    """
+    if not header:
+        raise RuntimeError("No header provided")
+
+    names = [str(name) if name is not None else '' for name in header]
+    types = [None] * len(names)
+    rows = iter(rows)
+
+    with tempfile.TemporaryDirectory(prefix='arrow-') as tempdir:
+        segments = []
+        writer = None
+        segment_schema = None
+        try:
+            for batch_rows in iter(lambda: list(islice(rows, BATCH_ROWS)), []):
+                arrays = []
+                for i in range(len(names)):
+                    values = [row[i] if i < len(row) else None for row in batch_rows]
+                    array, types[i] = _column_array(values, types[i])
+                    arrays.append(array)
+                batch = pa.RecordBatch.from_arrays(arrays, names=names)
+
+                if writer is None or not batch.schema.equals(segment_schema):
+                    if writer is not None:
+                        writer.close()
+                    segment_schema = batch.schema
+                    segments.append(os.path.join(tempdir, f"{len(segments)}.arrow"))
+                    writer = ipc.new_file(segments[-1], segment_schema)
+                writer.write_batch(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+
+        schema = pa.schema([
+            pa.field(name, data_type if data_type is not None else pa.string())
+            for name, data_type in zip(names, types)
+        ])
+        if file_format == 'parquet':
+            writer = pq.ParquetWriter(compression.output_target(output_path), schema)
+        else:
+            writer = ipc.new_file(compression.output_target(output_path), schema)
+
+        with writer:
+            for path in segments:
+                with pa.memory_map(path, 'r') as source:
+                    reader = ipc.open_file(source)
+                    for i in range(reader.num_record_batches):
+                        writer.write_batch(_cast_batch(reader.get_batch(i), schema))
+
+    return output_path
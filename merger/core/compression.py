@@ -0,0 +1,95 @@
+"""
+结果文件压缩
+写出器直接写入压缩流 (gzip 文件或 zip 成员), 边写边压缩, 不产生未压缩的中间文件;
+同时统计写入的未压缩字节数
+
+写出函数的输出位置既可以是文件路径, 也可以是可写的二进制流 (open_output 返回的流)
+"""
+import gzip
+import io
+import zipfile
+from contextlib import contextmanager
+
+
+OUTPUT_COMPRESSIONS = ['gzip', 'zip']
+
+# 压缩后结果文件追加的扩展名
+SUFFIXES = {'gzip': '.gz', 'zip': '.zip'}
+
+# 压缩级别: 6 是 zlib 默认值, 在速度与压缩率之间折中
+COMPRESS_LEVEL = 6
+
+
+class CountingWriter(io.RawIOBase):
+    """
+    只写的二进制流包装, 统计写入的字节数
+
+    不支持 seek (zip 写出器会改用数据描述符), flush 不会传递给压缩流,
+    避免 gzip 每次 flush 都截断压缩块; 关闭时不关闭被包装的流
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_written = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        data = memoryview(b)
+        self.raw.write(data)
+        self.bytes_written += data.nbytes
+        return data.nbytes
+
+    def tell(self):
+        return self.bytes_written
+
+
+@contextmanager
+def open_output(output_path, compression, member_name):
+    """
+    打开压缩输出流
+
+    Args:
+        output_path: 压缩文件路径
+        compression: 'gzip' 或 'zip'
+        member_name: 压缩包中的文件名 (gzip 写入文件头的原始文件名)
+
+    Yields:
+        CountingWriter, 退出时 bytes_written 为未压缩大小
+    """
+    if compression == 'gzip':
+        with open(output_path, 'wb') as f, \
+                gzip.GzipFile(filename=member_name, mode='wb', fileobj=f, compresslevel=COMPRESS_LEVEL) as gz:
+            yield CountingWriter(gz)
+    elif compression == 'zip':
+        with zipfile.ZipFile(output_path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as zf, \
+                zf.open(member_name, 'w', force_zip64=True) as member:
+            yield CountingWriter(member)
+    else:
+        raise ValueError(f"Unsupported output compression: {compression}")
+
+
+def is_stream(output):
+    return hasattr(output, 'write')
+
+
+def output_target(output):
+    """传给 openpyxl / xlwt / pyarrow 的输出位置: 流原样返回, 路径转为字符串"""
+    return output if is_stream(output) else str(output)
+
+
+@contextmanager
+def open_text_output(output, encoding, newline=None):
+    """以文本模式打开输出; 输出为流时在退出后解除包装, 不关闭该流"""
+    if not is_stream(output):
+        with open(output, 'w', encoding=encoding, newline=newline) as f:
+            yield f
+        return
+
+    f = io.TextIOWrapper(output, encoding=encoding, newline=newline)
+    try:
+        yield f
+    finally:
+        f.flush()
+        f.detach()
@@ -5,11 +5,17 @@
 
 import re
 import json
-from datetime import datetime
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, Optional, Callable
 from collections import Counter
+from itertools import compress
 import statistics
 
+import numpy as np
+
+from .date_parsing import DateParser
+from .dedup import RowDeduplicator, dedup_keys
+from .numeric_stats import FILL_STATISTICS, fill_statistic
+
 
 class DataPreviewGenerator:
     """数据预览生成器"""
@@ -185,9 +191,15 @@ class DataPreviewGenerator:
 class DataCleaner:
     """数据清洗工具"""
     
+    # standardize_date 依次尝试的日期格式
+    DATE_FORMATS = [
+        '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y',
+        '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S'
+    ]
+    
     @staticmethod
     def apply_cleaning_rules(headers: List[str], rows: List[List[Any]], 
-                            rules: List[Dict]) -> Tuple[List[str], List[List[Any]]]:
+                            rules: List[Dict], state: Dict = None) -> Tuple[List[str], List[List[Any]]]:
         """
         应用数据清洗规则
         
@@ -195,24 +207,27 @@ class DataCleaner:
             headers: 列头
             rows: 数据行
             rules: 清洗规则列表
+            state: 跨批次状态 (可选)。按块流式清洗时传入同一个字典,
+                   去重的已见键 (摘要)、向前填充的上一个值和日期布局会在块之间延续
             
         Returns:
             清洗后的 (headers, rows)
         """
         # 按顺序执行规则
-        for rule in sorted(rules, key=lambda x: x.get('order', 0)):
+        for rule_idx, rule in enumerate(sorted(rules, key=lambda x: x.get('order', 0))):
             action = rule.get('action')
+            rule_state = state.setdefault(rule_idx, {}) if state is not None else None
             
             if action == 'remove_duplicates':
-                rows = DataCleaner._remove_duplicates(headers, rows, rule)
+                rows = DataCleaner._remove_duplicates(headers, rows, rule, rule_state)
             elif action == 'fill_null':
-                rows = DataCleaner._fill_null(headers, rows, rule)
+                rows = DataCleaner._fill_null(headers, rows, rule, rule_state)
             elif action == 'convert_type':
                 rows = DataCleaner._convert_type(headers, rows, rule)
             elif action == 'trim_spaces':
                 rows = DataCleaner._trim_spaces(headers, rows, rule)
             elif action == 'standardize_date':
-                rows = DataCleaner._standardize_date(headers, rows, rule)
+                rows = DataCleaner._standardize_date(headers, rows, rule, rule_state)
             elif action == 'uppercase':
                 rows = DataCleaner._uppercase(headers, rows, rule)
             elif action == 'lowercase':
@@ -221,40 +236,33 @@ class DataCleaner:
         return headers, rows
     
     @staticmethod
-    def _remove_duplicates(headers: List[str], rows: List[List[Any]], rule: Dict) -> List[List[Any]]:
-        """删除重复行"""
+    def _remove_duplicates(headers: List[str], rows: List[List[Any]], rule: Dict,
+                           state: Dict = None) -> List[List[Any]]:
+        """删除重复行; 已见的键以摘要形式保存在 RowDeduplicator 中, 可跨批次延续"""
         columns = rule.get('columns', [])
-        
-        if not columns:
-            # 删除完全重复的行
-            seen = set()
-            unique_rows = []
-            for row in rows:
-                row_tuple = tuple(row)
-                if row_tuple not in seen:
-                    seen.add(row_tuple)
-                    unique_rows.append(row)
-            return unique_rows
-        else:
-            # 根据指定列删除重复
-            col_indices = [headers.index(col) for col in columns if col in headers]
-            seen = set()
-            unique_rows = []
-            for row in rows:
-                key = tuple(row[idx] if idx < len(row) else None for idx in col_indices)
-                if key not in seen:
-                    seen.add(key)
-                    unique_rows.append(row)
-            return unique_rows
+        dedup = state.get('dedup') if state is not None else None
+        if dedup is None:
+            dedup = RowDeduplicator()
+            if state is not None:
+                state['dedup'] = dedup
+        
+        # 未指定列时比较整行, 否则根据指定列删除重复
+        col_indices = [headers.index(col) for col in columns if col in headers] if columns else None
+        keep = dedup.keep_mask(dedup_keys(rows, col_indices), len(rows))
+        if state is None:
+            dedup.close()
+        return list(compress(rows, keep))
     
     @staticmethod
-    def _fill_null(headers: List[str], rows: List[List[Any]], rule: Dict) -> List[List[Any]]:
+    def _fill_null(headers: List[str], rows: List[List[Any]], rule: Dict,
+                   state: Dict = None) -> List[List[Any]]:
         """填充空值"""
         columns = rule.get('columns', [])
         method = rule.get('parameters', {}).get('method', 'forward')
         fill_value = rule.get('parameters', {}).get('value', '')
         
-        for col in columns:
+        # 同一列重复出现时只填充一次: 再次填充不会改变结果, 且跨批次状态按列名保存
+        for col in dict.fromkeys(columns):
             if col not in headers:
                 continue
             
@@ -262,7 +270,7 @@ class DataCleaner:
             
             if method == 'forward':
                 # 向前填充
-                last_value = None
+                last_value = state.get(col) if state is not None else None
                 for row in rows:
                     if col_idx >= len(row):
                         row.extend([None] * (col_idx - len(row) + 1))
@@ -271,6 +279,8 @@ class DataCleaner:
                         row[col_idx] = last_value
                     else:
                         last_value = row[col_idx]
+                if state is not None:
+                    state[col] = last_value
             
             elif method == 'backward':
                 # 向后填充
@@ -293,33 +303,20 @@ class DataCleaner:
                     if row[col_idx] is None or row[col_idx] == '':
                         row[col_idx] = fill_value
             
-            elif method == 'mean':
-                # 均值填充（仅数值）
-                values = [float(row[col_idx]) for row in rows 
-                         if col_idx < len(row) and row[col_idx] is not None 
-                         and row[col_idx] != '' and str(row[col_idx]).replace('.', '').replace('-', '').isdigit()]
-                
-                if values:
-                    mean_value = statistics.mean(values)
-                    for row in rows:
-                        if col_idx >= len(row):
-                            row.extend([None] * (col_idx - len(row) + 1))
-                        if row[col_idx] is None or row[col_idx] == '':
-                            row[col_idx] = mean_value
-            
-            elif method == 'median':
-                # 中位数填充（仅数值）
-                values = [float(row[col_idx]) for row in rows 
-                         if col_idx < len(row) and row[col_idx] is not None 
-                         and row[col_idx] != '' and str(row[col_idx]).replace('.', '').replace('-', '').isdigit()]
+            elif method in FILL_STATISTICS:
+                # 均值/中位数填充（仅数值）: 整列只取出一次, 数值转换与统计在 NumPy 中完成,
+                # 然后只回写空值所在的行
+                values = np.fromiter((row[col_idx] if col_idx < len(row) else None for row in rows),
+                                     dtype=object, count=len(rows))
+                missing = (values == None) | (values == '')  # noqa: E711 - 逐元素比较
+                fill = fill_statistic(values[~missing], method)
                 
-                if values:
-                    median_value = statistics.median(values)
-                    for row in rows:
+                if fill is not None:
+                    for i in np.flatnonzero(missing).tolist():
+                        row = rows[i]
                         if col_idx >= len(row):
                             row.extend([None] * (col_idx - len(row) + 1))
-                        if row[col_idx] is None or row[col_idx] == '':
-                            row[col_idx] = median_value
+                        row[col_idx] = fill
         
         return rows
     
@@ -369,34 +366,32 @@ class DataCleaner:
         return rows
     
     @staticmethod
-    def _standardize_date(headers: List[str], rows: List[List[Any]], rule: Dict) -> List[List[Any]]:
-        """标准化日期格式"""
+    def _standardize_date(headers: List[str], rows: List[List[Any]], rule: Dict,
+                          state: Dict = None) -> List[List[Any]]:
+        """
+        标准化日期格式
+
+        每列使用一个 DateParser: 按列学习的日期布局保存在 state 中, 流式清洗时在块之间延续
+        """
         columns = rule.get('columns', [])
         target_format = rule.get('parameters', {}).get('format', '%Y-%m-%d')
+        parsers = state.setdefault('parsers', {}) if state is not None else {}
         
         for col in columns:
             if col not in headers:
                 continue
             
             col_idx = headers.index(col)
+            parser = parsers.get(col_idx)
+            if parser is None:
+                parser = parsers[col_idx] = DateParser(DataCleaner.DATE_FORMATS)
             
-            for row in rows:
-                if col_idx >= len(row) or not row[col_idx]:
-                    continue
-                
-                # 尝试多种日期格式
-                date_formats = [
-                    '%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y',
-                    '%Y-%m-%d %H:%M:%S', '%Y/%m/%d %H:%M:%S'
-                ]
-                
-                for fmt in date_formats:
-                    try:
-                        dt = datetime.strptime(str(row[col_idx]), fmt)
-                        row[col_idx] = dt.strftime(target_format)
-                        break
-                    except:
-                        continue
+            # 跳过空值 (None、空字符串、0 等), 无法解析的值保持不变
+            targets = [row for row in rows if col_idx < len(row) and row[col_idx]]
+            formatted = parser.format_many([str(row[col_idx]) for row in targets], target_format)
+            for row, value in zip(targets, formatted):
+                if value is not None:
+                    row[col_idx] = value
         
         return rows
     
@@ -438,6 +433,9 @@ class DataCleaner:
 class DataValidator:
     """数据验证工具"""
     
+    # 类型验证 (type=date) 接受的日期格式
+    DATE_FORMATS = ['%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y']
+    
     @staticmethod
     def validate_data(headers: List[str], rows: List[List[Any]], 
                      rules: List[Dict]) -> Dict[str, Any]:
@@ -467,30 +465,67 @@ class DataValidator:
                 continue
             
             col_idx = headers.index(column)
-            
-            if rule_type == 'required':
-                errors.extend(DataValidator._validate_required(column, col_idx, rows, rule))
-            elif rule_type == 'type':
-                errors.extend(DataValidator._validate_type(column, col_idx, rows, rule))
-            elif rule_type == 'range':
-                errors.extend(DataValidator._validate_range(column, col_idx, rows, rule))
-            elif rule_type == 'length':
-                errors.extend(DataValidator._validate_length(column, col_idx, rows, rule))
-            elif rule_type == 'regex':
-                errors.extend(DataValidator._validate_regex(column, col_idx, rows, rule))
-            elif rule_type == 'unique':
-                errors.extend(DataValidator._validate_unique(column, col_idx, rows, rule))
-            elif rule_type == 'enum':
-                errors.extend(DataValidator._validate_enum(column, col_idx, rows, rule))
+            errors.extend(DataValidator.validate_column(rule_type, column, col_idx, rows, rule))
         
+        return DataValidator.build_result(errors, warnings, len(rows))
+    
+    @staticmethod
+    def validate_column(rule_type: str, column: str, col_idx: int, rows: List[List[Any]],
+                        rule: Dict, seen: set = None) -> List[Dict]:
+        """
+        对单列执行一条验证规则
+        
+        Args:
+            seen: 唯一性验证的已见值集合 (可选), 分块验证时跨块共享
+        """
+        errors = []
+        check = DataValidator.cell_checker(rule_type, column, col_idx, rule, seen)
+        if check is None:
+            return errors
+        
+        for row_idx, row in enumerate(rows):
+            check(row, row_idx + 1, errors)
+        return errors
+    
+    @staticmethod
+    def cell_checker(rule_type: str, column: str, col_idx: int, rule: Dict,
+                     seen: set = None) -> Optional[Callable]:
+        """
+        生成单行检查函数 check(row, row_number, errors), 发现的错误追加到 errors
+        
+        Args:
+            seen: 唯一性验证的已见值集合 (可选), 分块验证时跨块共享
+            
+        Returns:
+            检查函数; 规则不会产生任何错误 (未知类型、空正则) 时返回 None
+        """
+        if rule_type == 'required':
+            return DataValidator._check_required(column, col_idx, rule)
+        elif rule_type == 'type':
+            return DataValidator._check_type(column, col_idx, rule)
+        elif rule_type == 'range':
+            return DataValidator._check_range(column, col_idx, rule)
+        elif rule_type == 'length':
+            return DataValidator._check_length(column, col_idx, rule)
+        elif rule_type == 'regex':
+            return DataValidator._check_regex(column, col_idx, rule)
+        elif rule_type == 'unique':
+            return DataValidator._check_unique(column, col_idx, rule, seen)
+        elif rule_type == 'enum':
+            return DataValidator._check_enum(column, col_idx, rule)
+        return None
+    
+    @staticmethod
+    def build_result(errors: List[Dict], warnings: List[Dict], total_rows: int) -> Dict[str, Any]:
+        """汇总验证结果"""
         is_valid = len(errors) == 0
         
         # 计算统计信息
         statistics_data = {
-            'total_rows': len(rows),
+            'total_rows': total_rows,
             'total_errors': len(errors),
             'total_warnings': len(warnings),
-            'error_rate': len(errors) / max(len(rows), 1)
+            'error_rate': len(errors) / max(total_rows, 1)
         }
         
         return {
@@ -501,28 +536,28 @@ class DataValidator:
         }
     
     @staticmethod
-    def _validate_required(column: str, col_idx: int, rows: List[List[Any]], rule: Dict) -> List[Dict]:
+    def _check_required(column: str, col_idx: int, rule: Dict) -> Callable:
         """验证必填字段"""
-        errors = []
-        for row_idx, row in enumerate(rows):
+        def check(row, row_number, errors):
             if col_idx >= len(row) or row[col_idx] is None or row[col_idx] == '':
                 errors.append({
-                    'row': row_idx + 1,
+                    'row': row_number,
                     'column': column,
                     'value': row[col_idx] if col_idx < len(row) else None,
                     'message': rule.get('error_message', f"'{column}' 不能为空")
                 })
-        return errors
+        return check
     
     @staticmethod
-    def _validate_type(column: str, col_idx: int, rows: List[List[Any]], rule: Dict) -> List[Dict]:
+    def _check_type(column: str, col_idx: int, rule: Dict) -> Callable:
         """验证数据类型"""
-        errors = []
         expected_type = rule.get('parameters', {}).get('type', 'string')
+        # 日期按列学习布局, 同一检查函数处理的各行共用
+        date_parser = DateParser(DataValidator.DATE_FORMATS) if expected_type == 'date' else None
         
-        for row_idx, row in enumerate(rows):
+        def check(row, row_number, errors):
             if col_idx >= len(row) or row[col_idx] is None or row[col_idx] == '':
-                continue
+                return
             
             value = row[col_idx]
             is_valid = False
@@ -544,155 +579,138 @@ class DataValidator:
             elif expected_type == 'phone':
                 is_valid = bool(re.match(r'^\d{11}$|^\d{3}-\d{8}$|^\d{4}-\d{7}$', str(value)))
             elif expected_type == 'date':
-                date_formats = ['%Y-%m-%d', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y']
-                for fmt in date_formats:
-                    try:
-                        datetime.strptime(str(value), fmt)
-                        is_valid = True
-                        break
-                    except:
-                        pass
+                is_valid = date_parser.parse(str(value)) is not None
             
             if not is_valid:
                 errors.append({
-                    'row': row_idx + 1,
+                    'row': row_number,
                     'column': column,
                     'value': value,
                     'message': rule.get('error_message', f"'{column}' 类型错误，期望 {expected_type}")
                 })
-        
-        return errors
+        return check
     
     @staticmethod
-    def _validate_range(column: str, col_idx: int, rows: List[List[Any]], rule: Dict) -> List[Dict]:
+    def _check_range(column: str, col_idx: int, rule: Dict) -> Callable:
         """验证数值范围"""
-        errors = []
         params = rule.get('parameters', {})
         min_value = params.get('min')
         max_value = params.get('max')
         
-        for row_idx, row in enumerate(rows):
+        def check(row, row_number, errors):
             if col_idx >= len(row) or row[col_idx] is None or row[col_idx] == '':
-                continue
+                return
             
             try:
                 value = float(row[col_idx])
                 if min_value is not None and value < min_value:
                     errors.append({
-                        'row': row_idx + 1,
+                        'row': row_number,
                         'column': column,
                         'value': value,
                         'message': rule.get('error_message', f"'{column}' 值 {value} 小于最小值 {min_value}")
                     })
                 if max_value is not None and value > max_value:
                     errors.append({
-                        'row': row_idx + 1,
+                        'row': row_number,
                         'column': column,
                         'value': value,
                         'message': rule.get('error_message', f"'{column}' 值 {value} 大于最大值 {max_value}")
                     })
             except:
                 pass
-        
-        return errors
+        return check
     
     @staticmethod
-    def _validate_length(column: str, col_idx: int, rows: List[List[Any]], rule: Dict) -> List[Dict]:
+    def _check_length(column: str, col_idx: int, rule: Dict) -> Callable:
         """验证长度限制"""
-        errors = []
         params = rule.get('parameters', {})
         min_length = params.get('min')
         max_length = params.get('max')
         
-        for row_idx, row in enumerate(rows):
+        def check(row, row_number, errors):
             if col_idx >= len(row) or row[col_idx] is None or row[col_idx] == '':
-                continue
+                return
             
             length = len(str(row[col_idx]))
             
             if min_length is not None and length < min_length:
                 errors.append({
-                    'row': row_idx + 1,
+                    'row': row_number,
                     'column': column,
                     'value': row[col_idx],
                     'message': rule.get('error_message', f"'{column}' 长度 {length} 小于最小长度 {min_length}")
                 })
             if max_length is not None and length > max_length:
                 errors.append({
-                    'row': row_idx + 1,
+                    'row': row_number,
                     'column': column,
                     'value': row[col_idx],
                     'message': rule.get('error_message', f"'{column}' 长度 {length} 大于最大长度 {max_length}")
                 })
-        
-        return errors
+        return check
     
     @staticmethod
-    def _validate_regex(column: str, col_idx: int, rows: List[List[Any]], rule: Dict) -> List[Dict]:
+    def _check_regex(column: str, col_idx: int, rule: Dict) -> Optional[Callable]:
         """验证正则表达式"""
-        errors = []
         pattern = rule.get('parameters', {}).get('pattern', '')
         
         if not pattern:
-            return errors
+            return None
         
-        for row_idx, row in enumerate(rows):
+        def check(row, row_number, errors):
             if col_idx >= len(row) or row[col_idx] is None or row[col_idx] == '':
-                continue
+                return
             
             if not re.match(pattern, str(row[col_idx])):
                 errors.append({
-                    'row': row_idx + 1,
+                    'row': row_number,
                     'column': column,
                     'value': row[col_idx],
                     'message': rule.get('error_message', f"'{column}' 不匹配正则表达式 {pattern}")
                 })
-        
-        return errors
+        return check
     
     @staticmethod
-    def _validate_unique(column: str, col_idx: int, rows: List[List[Any]], rule: Dict) -> List[Dict]:
+    def _check_unique(column: str, col_idx: int, rule: Dict, seen: set = None) -> Callable:
         """验证唯一性"""
-        errors = []
-        seen = set()
+        if seen is None:
+            seen = set()
         
-        for row_idx, row in enumerate(rows):
+        def check(row, row_number, errors):
             if col_idx >= len(row) or row[col_idx] is None or row[col_idx] == '':
-                continue
+                return
             
             value = row[col_idx]
             if value in seen:
                 errors.append({
-                    'row': row_idx + 1,
+                    'row': row_number,
                     'column': column,
                     'value': value,
                     'message': rule.get('error_message', f"'{column}' 值 '{value}' 重复")
                 })
             else:
                 seen.add(value)
-        
-        return errors
+        return check
     
     @staticmethod
-    def _validate_enum(column: str, col_idx: int, rows: List[List[Any]], rule: Dict) -> List[Dict]:
+    def _check_enum(column: str, col_idx: int, rule: Dict) -> Callable:
         """验证枚举值"""
-        errors = []
         allowed_values = rule.get('parameters', {}).get('values', [])
         
-        for row_idx, row in enumerate(rows):
+        def check(row, row_number, errors):
             if col_idx >= len(row) or row[col_idx] is None or row[col_idx] == '':
-                continue
+                return
             
             if row[col_idx] not in allowed_values:
                 errors.append({
-                    'row': row_idx + 1,
+                    'row': row_number,
                     'column': column,
                     'value': row[col_idx],
                     'message': rule.get('error_message', 
                                       f"'{column}' 值 '{row[col_idx]}' 不在允许的值列表中: {allowed_values}")
                 })
-        
-        return errors
+        return check
 
 
 class ChartGenerator:
@@ -1,11 +1,18 @@
 """
 通用数据处理器
-支持 Excel (XLS/XLSX)、CSV、JSON 格式的合并与处理
+支持 Excel (XLS/XLSX)、CSV、JSON / JSON Lines、Parquet / Arrow IPC 格式的合并与处理
 """
 import sys
 import json
 import csv
 import re
+import time
+import codecs
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+from decimal import Decimal
+from itertools import chain, islice, repeat
 from pathlib import Path
 from io import StringIO, BytesIO
 from typing import List, Tuple, Dict, Any, Optional
@@ -13,21 +20,73 @@ from typing import List, Tuple, Dict, Any, Optional
 from openpyxl import Workbook, load_workbook
 from openpyxl.drawing.image import Image as OpenpyxlImage
 
+from . import archive, compression, json_stream, parse_cache
+from .archive import ArchiveMember
+from .xlsx_images import extract_images
+from .xlsx_scan import scan_sheet
+
 try:
     import xlwt
     XLS_SUPPORT = True
 except ImportError:
     XLS_SUPPORT = False
 
+try:
+    import xlrd
+    XLS_READ_SUPPORT = True
+except ImportError:
+    XLS_READ_SUPPORT = False
+
+try:
+    from . import arrow_io
+    ARROW_SUPPORT = True
+except ImportError:
+    ARROW_SUPPORT = False
+
 
 class DataProcessor:
     """通用数据处理器类"""
     
-    SUPPORTED_FORMATS = ['xlsx', 'xls', 'csv', 'json']
+    SUPPORTED_FORMATS = ['xlsx', 'xls', 'csv', 'json', 'ndjson', 'parquet', 'arrow']
+    
+    # 列式格式: 读取时支持列投影, 不经过解析缓存
+    COLUMNAR_FORMATS = ['parquet', 'arrow']
+    
+    # 表头识别窗口: 首个非空行起最多检查的行数
+    HEADER_SEARCH_ROWS = 6
+    
+    # 表头扫描与CSV编码/方言检测时读取的文件开头字节数
+    SAMPLE_BYTES = 64 * 1024
+    
+    # CSV 候选编码 (带 BOM 的文件直接按 BOM 确定编码)
+    CSV_ENCODINGS = ['utf-8', 'gbk', 'gb18030', 'latin1']
+    
+    # CSV 方言检测: 候选分隔符与参与检测的样本行数
+    CSV_DELIMITERS = ',\t;|'
+    CSV_SNIFF_ROWS = 200
+    CSV_DEFAULT_DIALECT = {
+        'delimiter': ',',
+        'quotechar': '"',
+        'doublequote': True,
+        'skipinitialspace': False,
+    }
+    
+    # 表头包含这些关键字的列视为图片列
+    IMAGE_COLUMN_TOKENS = ("图", "照", "image", "photo")
+    
+    # XLSX 单个工作表的最大行数 (含表头)
+    XLSX_MAX_ROWS = 1048576
+    
+    # XLS (BIFF8) 单个工作表的最大行数 (含表头) 与最大列数
+    XLS_MAX_ROWS = 65536
+    XLS_MAX_COLUMNS = 256
+    
+    # XLS 写入时每隔多少行把已完成的行数据刷出到临时文件
+    XLS_FLUSH_ROWS = 1000
     
     @staticmethod
     def detect_format(file_path):
-        """检测文件格式"""
+        """检测文件格式 (压缩包成员按成员名检测)"""
         if isinstance(file_path, str):
             file_path = Path(file_path)
         
@@ -40,14 +99,27 @@ class DataProcessor:
             return 'csv'
         elif suffix in ['.json']:
             return 'json'
+        elif suffix in ['.jsonl', '.ndjson']:
+            return 'jsonl'
+        elif suffix in ['.parquet']:
+            return 'parquet'
+        elif suffix in ['.arrow', '.feather', '.ipc']:
+            return 'arrow'
         else:
             raise ValueError(f"Unsupported file format: {suffix}")
     
     @staticmethod
-    def read_file(file_path):
+    def read_file(file_path, columns=None):
         """
         读取文件并返回标准化数据格式
         
+        启用解析缓存 (parse_cache.configure) 时, 内容相同的文件直接从缓存读取
+        
+        Args:
+            file_path: 文件路径
+            columns: 列投影, 只读取这些列; 仅列式格式 (Parquet/Arrow) 在读取时生效,
+                     其他格式忽略该参数并返回全部列
+        
         Returns:
             (header, data_rows, metadata): 表头、数据行、元数据
             - header: list of str
@@ -56,6 +128,28 @@ class DataProcessor:
         """
         file_format = DataProcessor.detect_format(file_path)
         
+        if file_format in DataProcessor.COLUMNAR_FORMATS:
+            # 列式格式本身解码很快, 且投影不同结果不同, 不经过解析缓存
+            header, rows, metadata = DataProcessor.stream_columnar(file_path, file_format, columns)
+            return header, list(rows), metadata
+        
+        cache = parse_cache.get_cache()
+        if cache is None:
+            return DataProcessor._parse_file(file_path, file_format)
+        
+        key = cache.key_for(file_path, file_format)
+        cached = cache.load(key)
+        if cached is not None:
+            header, rows, metadata = cached
+            return header, list(rows), metadata
+        
+        header, rows, metadata = DataProcessor._parse_file(file_path, file_format)
+        cache.store(key, header, rows, metadata)
+        return header, rows, metadata
+    
+    @staticmethod
+    def _parse_file(file_path, file_format):
+        """按格式解析文件 (不经过缓存)"""
         if file_format == 'xlsx':
             return DataProcessor._read_excel(file_path, 'xlsx')
         elif file_format == 'xls':
@@ -64,110 +158,237 @@ class DataProcessor:
             return DataProcessor._read_csv(file_path)
         elif file_format == 'json':
             return DataProcessor._read_json(file_path)
+        elif file_format == 'jsonl':
+            return DataProcessor._read_json(file_path, lines=True)
         else:
             raise ValueError(f"Unsupported format: {file_format}")
     
     @staticmethod
-    def _read_excel(path, format_type='xlsx'):
-        """读取Excel文件 (从原 excel_processor.py 适配)"""
-        if isinstance(path, str):
-            path = Path(path)
+    def iter_file(file_path, columns=None):
+        """
+        以流式方式读取文件
         
-        # First pass: load cached values
-        wb_values = load_workbook(path, data_only=True)
-        try:
-            ws_values = wb_values.worksheets[0]
-            rows = []
-            for r in ws_values.iter_rows():
-                rows.append(tuple(cell.value for cell in r))
-        finally:
-            wb_values.close()
-
-        if len(rows) < 1:
-            raise ValueError(f"{path} does not contain enough rows to find a header.")
-
-        # Find first non-empty row index
-        first_non_empty = 0
-        for i, r in enumerate(rows):
-            if any(cell is not None and str(cell).strip() != "" for cell in r):
-                first_non_empty = i
+        Returns:
+            (header, rows, metadata): 与 read_file 相同, 但 rows 为惰性迭代器。
+            XLSX/XLS/CSV 按行解析, JSON/JSONL 按记录解析, Parquet/Arrow 按记录批次解析;
+            其他格式整体读取后逐行产出。
+            启用解析缓存时命中则逐块读取缓存, 未命中则在行被完整消费后写入缓存。
+            columns 的含义与 read_file 相同。
+        """
+        file_format = DataProcessor.detect_format(file_path)
+        
+        if file_format in DataProcessor.COLUMNAR_FORMATS:
+            return DataProcessor.stream_columnar(file_path, file_format, columns)
+        
+        cache = parse_cache.get_cache()
+        if cache is not None:
+            key = cache.key_for(file_path, file_format)
+            cached = cache.load(key)
+            if cached is not None:
+                return cached
+        
+        if file_format == 'xlsx':
+            header, rows, metadata = DataProcessor.stream_excel(file_path, 'xlsx')
+            metadata['images'] = [
+                dict(img_info, header_row_idx=metadata['header_row_idx'])
+                for img_info in extract_images(archive.seekable(file_path))
+            ]
+        elif file_format == 'xls':
+            header, rows, metadata = DataProcessor.stream_excel(file_path, 'xls')
+            metadata['images'] = []
+        elif file_format == 'csv':
+            header, rows, metadata = DataProcessor.stream_csv(file_path)
+        elif file_format in ('json', 'jsonl'):
+            header, rows, metadata = DataProcessor.stream_json(file_path, lines=file_format == 'jsonl')
+        else:
+            header, rows, metadata = DataProcessor._parse_file(file_path, file_format)
+        
+        if cache is not None:
+            rows = cache.store_iter(key, header, rows, metadata)
+        return header, iter(rows), metadata
+    
+    @staticmethod
+    def _is_blank_row(row):
+        """判断一行是否全部为空"""
+        return not any(cell is not None and str(cell).strip() != "" for cell in row)
+    
+    @staticmethod
+    def _detect_header(rows):
+        """
+        从行迭代器中识别表头
+        
+        只缓冲首个非空行起的 HEADER_SEARCH_ROWS 行, 取非空单元格最多的一行作为表头,
+        因此内存占用与总行数无关。
+        
+        Returns:
+            (header_idx, header_row, remaining): 表头行号(0-based)、原始表头行、剩余行迭代器
+        """
+        rows = iter(rows)
+        first_row = None
+        first_non_empty = None
+        window = []
+        
+        for idx, row in enumerate(rows):
+            if first_row is None:
+                first_row = row
+            if first_non_empty is None:
+                if DataProcessor._is_blank_row(row):
+                    continue
+                first_non_empty = idx
+            window.append(row)
+            if len(window) >= DataProcessor.HEADER_SEARCH_ROWS:
                 break
-
-        # Search for header row
-        search_end = min(len(rows), first_non_empty + 6)
-        best_idx = first_non_empty
+        
+        if first_row is None:
+            raise ValueError("File does not contain enough rows to find a header.")
+        
+        if first_non_empty is None:
+            # 全部为空行: 与旧实现一致, 以首行为表头且没有数据行
+            return 0, first_row, iter(())
+        
+        best_offset = 0
         best_count = -1
-        for i in range(first_non_empty, search_end):
-            count = sum(1 for cell in rows[i] if cell is not None and str(cell).strip() != "")
+        for offset, row in enumerate(window):
+            count = sum(1 for cell in row if cell is not None and str(cell).strip() != "")
             if count > best_count:
                 best_count = count
-                best_idx = i
-
+                best_offset = offset
+        
+        remaining = chain(window[best_offset + 1:], rows)
+        return first_non_empty + best_offset, window[best_offset], remaining
+    
+    @staticmethod
+    def _iter_sheet_values(path):
+        """以只读模式逐行产出首个工作表的单元格值, 迭代结束或关闭时释放工作簿"""
+        wb = load_workbook(archive.seekable(path), read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            # 部分工具写出的 <dimension> 只有 "A1", 此时按实际单元格解析以免截断数据
+            if (ws.max_row or 0) <= 1 and (ws.max_column or 0) <= 1:
+                ws.reset_dimensions()
+            for row in ws.iter_rows(values_only=True):
+                yield row
+        finally:
+            wb.close()
+    
+    @staticmethod
+    def _open_xls_sheet(path):
+        """按需打开 XLS 工作簿, 只解析首个工作表; 返回 (book, sheet)"""
+        if not XLS_READ_SUPPORT:
+            raise RuntimeError("Reading XLS files requires xlrd library. Install: pip install xlrd")
+        if isinstance(path, ArchiveMember):
+            book = xlrd.open_workbook(file_contents=path.read_bytes(), on_demand=True)
+        else:
+            book = xlrd.open_workbook(str(path), on_demand=True)
+        try:
+            return book, book.sheet_by_index(0)
+        except Exception:
+            book.release_resources()
+            raise
+    
+    @staticmethod
+    def _xls_row_values(sheet, row_idx, datemode):
+        """把 XLS 一行转换为与 openpyxl values_only 一致的值元组"""
+        values = []
+        for ctype, value in zip(sheet.row_types(row_idx), sheet.row_values(row_idx)):
+            if ctype == xlrd.XL_CELL_NUMBER:
+                if value.is_integer():
+                    value = int(value)
+            elif ctype == xlrd.XL_CELL_DATE:
+                try:
+                    converted = xlrd.xldate_as_datetime(value, datemode)
+                    value = converted.time() if value < 1 else converted
+                except (ValueError, OverflowError):
+                    pass
+            elif ctype == xlrd.XL_CELL_BOOLEAN:
+                value = bool(value)
+            elif ctype == xlrd.XL_CELL_ERROR:
+                value = xlrd.error_text_from_code.get(value)
+            elif ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                value = None
+            values.append(value)
+        
+        # 与 openpyxl 一致, 每行补齐到工作表宽度
+        if len(values) < sheet.ncols:
+            values.extend([None] * (sheet.ncols - len(values)))
+        return tuple(values)
+    
+    @staticmethod
+    def _iter_xls_values(path):
+        """逐行产出 XLS 首个工作表的单元格值, 内存占用只与该工作表大小相关"""
+        book, sheet = DataProcessor._open_xls_sheet(path)
+        try:
+            for row_idx in range(sheet.nrows):
+                yield DataProcessor._xls_row_values(sheet, row_idx, book.datemode)
+        finally:
+            book.release_resources()
+    
+    @staticmethod
+    def stream_excel(path, format_type='xlsx'):
+        """
+        流式读取Excel文件
+        
+        Returns:
+            (header, rows, metadata): rows 为惰性迭代器, 每次只解析一行,
+            内存占用与总行数无关
+        """
+        if isinstance(path, str):
+            path = Path(path)
+        
+        if format_type == 'xls':
+            values = DataProcessor._iter_xls_values(path)
+        else:
+            values = DataProcessor._iter_sheet_values(path)
+        try:
+            header_idx, header_row, remaining = DataProcessor._detect_header(values)
+        except ValueError:
+            values.close()
+            raise ValueError(f"{path} does not contain enough rows to find a header.")
+        
         # Normalize header
-        header = tuple((str(cell).strip() if cell is not None else "") for cell in rows[best_idx])
-
-        # Data rows
-        data_rows = []
+        header = [(str(cell).strip() if cell is not None else "") for cell in header_row]
+        
         image_columns = {
             idx for idx, col_name in enumerate(header)
-            if col_name and any(token in col_name for token in ("图", "照", "image", "photo"))
+            if col_name and any(token in col_name for token in DataProcessor.IMAGE_COLUMN_TOKENS)
+        }
+        
+        def generate_rows():
+            try:
+                for row in remaining:
+                    if DataProcessor._is_blank_row(row):
+                        continue
+                    normalized_row = list(row)
+                    for col_idx in image_columns:
+                        if col_idx < len(normalized_row):
+                            normalized_row[col_idx] = None
+                    yield normalized_row
+            finally:
+                values.close()
+        
+        metadata = {
+            'header_row_idx': header_idx,
+            'format': format_type,
         }
         
-        for row in rows[best_idx + 1:]:
-            if any(cell is not None and str(cell).strip() != "" for cell in row):
-                normalized_row = list(row)
-                for col_idx in image_columns:
-                    if col_idx < len(normalized_row):
-                        normalized_row[col_idx] = None
-                data_rows.append(normalized_row)
+        return header, generate_rows(), metadata
+    
+    @staticmethod
+    def _read_excel(path, format_type='xlsx'):
+        """读取Excel文件 (从原 excel_processor.py 适配)"""
+        if isinstance(path, str):
+            path = Path(path)
+        
+        header, rows, stream_metadata = DataProcessor.stream_excel(path, format_type)
+        best_idx = stream_metadata['header_row_idx']
+        data_rows = list(rows)
 
-        # Extract images (only for xlsx)
+        # Extract images (only for xlsx): 直接读取 zip 中的绘图部件, 无需再次加载工作簿
         images_info = []
         if format_type == 'xlsx':
-            wb_images = load_workbook(path, data_only=False)
-            try:
-                ws_images = wb_images.worksheets[0]
-                if hasattr(ws_images, '_images') and ws_images._images:
-                    from openpyxl.utils import coordinate_from_string, column_index_from_string
-
-                    for img in ws_images._images:
-                        try:
-                            img_bytes = None
-                            if hasattr(img, '_data'):
-                                img_bytes = img._data()
-                            elif hasattr(img, 'ref') and hasattr(img.ref, 'read'):
-                                img_bytes = img.ref.read()
-
-                            if not img_bytes:
-                                continue
-
-                            anchor_info = {
-                                'row': None,
-                                'col': None,
-                                'width': img.width if hasattr(img, 'width') else 100,
-                                'height': img.height if hasattr(img, 'height') else 100,
-                            }
-
-                            if hasattr(img, 'anchor'):
-                                anchor = img.anchor
-                                if hasattr(anchor, '_from') and anchor._from:
-                                    anchor_info['row'] = anchor._from.row
-                                    anchor_info['col'] = anchor._from.col
-                                elif isinstance(anchor, str):
-                                    col_str, row_num = coordinate_from_string(anchor)
-                                    anchor_info['row'] = row_num - 1
-                                    anchor_info['col'] = column_index_from_string(col_str) - 1
-
-                            if anchor_info['row'] is not None and anchor_info['col'] is not None:
-                                images_info.append({
-                                    'image_data': img_bytes,
-                                    'anchor_info': anchor_info,
-                                    'header_row_idx': best_idx,
-                                })
-                        except Exception as exc:
-                            print(f"Warning: Failed to extract image: {exc}", file=sys.stderr)
-            finally:
-                wb_images.close()
+            for img_info in extract_images(archive.seekable(path)):
+                img_info['header_row_idx'] = best_idx
+                images_info.append(img_info)
 
         metadata = {
             'images': images_info,
@@ -175,164 +396,515 @@ class DataProcessor:
             'format': format_type,
         }
         
-        return list(header), data_rows, metadata
+        return header, data_rows, metadata
     
     @staticmethod
     def _read_csv(path, encoding='utf-8'):
         """读取CSV文件"""
+        header, rows, metadata = DataProcessor.stream_csv(path, encoding)
+        return header, list(rows), metadata
+    
+    @staticmethod
+    def stream_csv(path, encoding='utf-8'):
+        """
+        流式读取CSV文件
+        
+        编码与分隔符由文件开头的样本检测, 之后只做一次流式解析; 数据行在产出时即完成
+        规范化 (跳过空行、按表头长度截断或用 '' 补齐), 不会在内存中保留整个文件。
+        
+        Returns:
+            (header, rows, metadata): rows 为惰性迭代器; metadata['encoding'] 在解析过程中
+            发生编码回退时会被更新
+        """
         if isinstance(path, str):
             path = Path(path)
         
-        # Try different encodings
-        encodings = [encoding, 'utf-8-sig', 'gbk', 'gb2312', 'latin1']
+        enc, dialect, _, _ = DataProcessor._sniff_csv(path, encoding)
+        metadata = {
+            'format': 'csv',
+            'encoding': enc,
+            'dialect': dialect,
+        }
+        lines = DataProcessor._iter_csv_lines(path, enc, metadata)
+        reader = csv.reader(lines, **dialect)
         
-        for enc in encodings:
+        try:
+            # First non-empty row is header
+            header = None
+            for row in reader:
+                if any(cell.strip() for cell in row):
+                    header = [cell.strip() for cell in row]
+                    break
+        except csv.Error as e:
+            lines.close()
+            raise ValueError(f"Failed to parse CSV file {path.name}: {e}")
+        
+        if header is None:
+            lines.close()
+            raise ValueError(f"{path} has no valid header")
+        
+        width = len(header)
+        
+        def generate_rows():
             try:
-                with open(path, 'r', encoding=enc, newline='') as f:
-                    reader = csv.reader(f)
-                    rows = list(reader)
-                    
-                    if not rows:
-                        raise ValueError(f"{path} is empty")
-                    
-                    # First non-empty row is header
-                    header = None
-                    data_start = 0
-                    
-                    for i, row in enumerate(rows):
-                        if any(cell.strip() for cell in row):
-                            header = [cell.strip() for cell in row]
-                            data_start = i + 1
-                            break
-                    
-                    if header is None:
-                        raise ValueError(f"{path} has no valid header")
-                    
-                    # Data rows
-                    data_rows = []
-                    for row in rows[data_start:]:
-                        if any(cell.strip() for cell in row):
-                            # Normalize row length to match header
-                            normalized_row = row[:len(header)]
-                            if len(normalized_row) < len(header):
-                                normalized_row.extend([''] * (len(header) - len(normalized_row)))
-                            data_rows.append(normalized_row)
-                    
-                    metadata = {
-                        'format': 'csv',
-                        'encoding': enc,
-                    }
-                    
-                    return header, data_rows, metadata
-                    
-            except (UnicodeDecodeError, Exception) as e:
-                if enc == encodings[-1]:
-                    raise ValueError(f"Failed to read CSV file with any encoding: {e}")
+                for row in reader:
+                    if any(cell.strip() for cell in row):
+                        # Normalize row length to match header
+                        if len(row) > width:
+                            del row[width:]
+                        elif len(row) < width:
+                            row.extend([''] * (width - len(row)))
+                        yield row
+            except csv.Error as e:
+                raise ValueError(f"Failed to parse CSV file {path.name}: {e}")
+            finally:
+                lines.close()
+        
+        return header, generate_rows(), metadata
+    
+    @staticmethod
+    def iter_csv_chunks(path, chunk_size=5000, encoding='utf-8'):
+        """
+        按块读取CSV文件, 供需要批量处理的调用方使用
+        
+        Returns:
+            (header, chunks, metadata): chunks 逐个产出最多 chunk_size 行的列表,
+            峰值内存只与块大小有关
+        """
+        header, rows, metadata = DataProcessor.stream_csv(path, encoding)
+        
+        def generate_chunks():
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    return
+                yield chunk
+        
+        return header, generate_chunks(), metadata
+    
+    @staticmethod
+    def _sniff_csv(path, encoding='utf-8'):
+        """
+        根据文件开头的样本 (SAMPLE_BYTES) 检测CSV编码与分隔符
+        
+        Returns:
+            (encoding, dialect, text, complete): 编码、csv.reader 方言参数、
+            样本文本 (去掉末尾不完整的行)、样本是否已包含整个文件
+        """
+        raw, complete = DataProcessor._read_sample(path)
+        if not raw:
+            raise ValueError(f"{path} is empty")
+        
+        if raw.startswith(codecs.BOM_UTF8):
+            encodings = ['utf-8-sig']
+        elif raw.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            encodings = ['utf-16']
+        else:
+            encodings = [encoding] + [enc for enc in DataProcessor.CSV_ENCODINGS if enc != encoding]
+        
+        enc, text = DataProcessor._decode_sample(raw, encodings, complete)
+        if not complete:
+            # 丢弃最后一行不完整的内容
+            text = text[:text.rfind('\n') + 1] or text
+        
+        dialect = dict(DataProcessor.CSV_DEFAULT_DIALECT)
+        dialect['delimiter'] = DataProcessor._detect_delimiter(text)
+        
+        return enc, dialect, text, complete
+    
+    @staticmethod
+    def _detect_delimiter(text):
+        """
+        检测CSV分隔符
+        
+        用每个候选分隔符解析样本的前 CSV_SNIFF_ROWS 行, 取各行列数最一致 (其次列数最多) 且多于
+        一列的分隔符; 解析遵循引号规则, 因此引号内的逗号、换行不会干扰判断。
+        都不满足时 (如单列文件) 使用逗号。
+        """
+        best, best_score = ',', None
+        for delimiter in DataProcessor.CSV_DELIMITERS:
+            try:
+                rows = islice(csv.reader(StringIO(text), delimiter=delimiter), DataProcessor.CSV_SNIFF_ROWS)
+                counts = Counter(len(row) for row in rows if any(cell.strip() for cell in row))
+            except csv.Error:
                 continue
+            if not counts:
+                continue
+            width, freq = counts.most_common(1)[0]
+            if width < 2:
+                continue
+            score = (freq / sum(counts.values()), width)
+            if best_score is None or score > best_score:
+                best, best_score = delimiter, score
+        return best
+    
+    @staticmethod
+    def _iter_csv_lines(path, encoding, state):
+        """
+        逐行解码CSV文件, 供 csv.reader 使用
+        
+        按 \\n 切分字节后逐行解码 (UTF-8/GBK 的多字节字符不会包含 0x0A)。样本之后才出现的
+        解码错误从出错行起改用下一个候选编码, 最终使用的编码记录在 state['encoding']。
+        UTF-16 与只用 \\r 换行的文件无法按字节切分, 直接以文本模式读取。
+        """
+        if encoding.startswith('utf-16') or DataProcessor._has_cr_line_endings(path):
+            with archive.open_text(path, encoding, newline='') as f:
+                yield from f
+            return
+        
+        candidates = DataProcessor.CSV_ENCODINGS
+        fallbacks = candidates[candidates.index(encoding) + 1:] if encoding in candidates else []
+        
+        with archive.open_source(path) as f:
+            for raw_line in f:
+                try:
+                    yield raw_line.decode(encoding)
+                    continue
+                except UnicodeDecodeError:
+                    pass
+                
+                line = None
+                while fallbacks:
+                    fallback = fallbacks.pop(0)
+                    try:
+                        line = raw_line.decode(fallback)
+                    except UnicodeDecodeError:
+                        continue
+                    print(f"Warning: {path.name} is not valid {encoding}, switching to {fallback}", file=sys.stderr)
+                    encoding = fallback
+                    state['encoding'] = fallback
+                    break
+                if line is None:
+                    raise ValueError(f"Failed to decode CSV file {path.name} with any encoding")
+                yield line
+    
+    @staticmethod
+    def _has_cr_line_endings(path):
+        """文件开头只出现 \\r 而没有 \\n 时视为旧式 Mac 换行"""
+        with archive.open_source(path) as f:
+            head = f.read(DataProcessor.SAMPLE_BYTES)
+        return b'\r' in head and b'\n' not in head
     
     @staticmethod
-    def _read_json(path, encoding='utf-8'):
+    def _read_json(path, encoding='utf-8', lines=False):
         """
-        读取JSON文件
+        读取JSON / JSON Lines 文件
         支持格式:
         1. Array of objects: [{"col1": "val1", "col2": "val2"}, ...]
-        2. Object with data array: {"data": [...]}
-        3. Object with records: {"records": [...]}
+        2. Object with data array: {"data": [...]} (也支持 records/rows/items)
+        3. JSON Lines: 每行一个对象
+        
+        记录逐条解码, 表头为所有记录键的并集; 数字、布尔等保留原生类型,
+        嵌套对象/数组序列化为 JSON 文本, 缺失的键为 None
         """
         if isinstance(path, str):
             path = Path(path)
         
-        with open(path, 'r', encoding=encoding) as f:
-            data = json.load(f)
+        header, data_rows = json_stream.read_records(path, encoding, lines)
+        if not data_rows:
+            raise ValueError(f"{path} contains no data")
         
-        # Determine structure
-        records = None
+        metadata = {
+            'format': 'jsonl' if lines else 'json',
+            'encoding': encoding,
+        }
         
-        if isinstance(data, list):
-            records = data
-        elif isinstance(data, dict):
-            # Try common keys
-            for key in ['data', 'records', 'rows', 'items']:
-                if key in data and isinstance(data[key], list):
-                    records = data[key]
-                    break
-            
-            if records is None:
-                raise ValueError(f"JSON structure not recognized. Expected array or object with 'data'/'records' key")
-        else:
-            raise ValueError(f"JSON must be an array or object")
+        return header, data_rows, metadata
+    
+    @staticmethod
+    def stream_json(path, encoding='utf-8', lines=False):
+        """
+        流式读取JSON / JSON Lines 文件
         
-        if not records:
+        先遍历一遍收集键的并集 (不保留数据), 再逐条产出行, 内存占用与记录数无关
+        
+        Returns:
+            (header, rows, metadata): rows 为惰性迭代器
+        """
+        if isinstance(path, str):
+            path = Path(path)
+        
+        header, rows = json_stream.stream_rows(path, encoding, lines)
+        if not header:
             raise ValueError(f"{path} contains no data")
         
-        # Extract header from first record
-        if not isinstance(records[0], dict):
-            raise ValueError(f"JSON records must be objects/dictionaries")
+        metadata = {
+            'format': 'jsonl' if lines else 'json',
+            'encoding': encoding,
+        }
+        
+        return header, rows, metadata
+    
+    @staticmethod
+    def stream_columnar(path, file_format, columns=None):
+        """
+        流式读取 Parquet / Arrow IPC 文件
         
-        header = list(records[0].keys())
+        按记录批次解码, columns 指定时只解码这些列
         
-        # Extract data rows
-        data_rows = []
-        for record in records:
-            row = [record.get(col, None) for col in header]
-            # Convert to string for consistency
-            row = [str(val) if val is not None else '' for val in row]
-            data_rows.append(row)
+        Returns:
+            (header, rows, metadata): rows 为惰性迭代器
+        """
+        if not ARROW_SUPPORT:
+            raise RuntimeError("Parquet/Arrow format requires pyarrow library. Install: pip install pyarrow")
         
+        header, rows = arrow_io.stream_rows(path, file_format, columns)
         metadata = {
-            'format': 'json',
-            'encoding': encoding,
+            'format': file_format,
         }
+        return header, rows, metadata
+    
+    @staticmethod
+    def scan_headers(file_paths):
+        """
+        表头预扫描: 只读取每个文件的表头识别窗口, 不解析数据行
         
-        return header, data_rows, metadata
+        Returns:
+            dict:
+            - columns: 合并后的表头 (与 merge_files 的列顺序一致)
+            - files: 每个文件的 path/format/columns/index_map/header_row_idx/estimated_rows
+            - elapsed_ms: 扫描耗时
+        """
+        started = time.perf_counter()
+        combined_header = []
+        column_index = {}
+        files = []
+        
+        for path in file_paths:
+            file_format = DataProcessor.detect_format(path)
+            if file_format == 'xlsx':
+                scan = DataProcessor._scan_excel(path)
+            elif file_format == 'xls':
+                scan = DataProcessor._scan_xls(path)
+            elif file_format == 'csv':
+                scan = DataProcessor._scan_csv(path)
+            elif file_format in ('json', 'jsonl'):
+                scan = DataProcessor._scan_json(path, lines=file_format == 'jsonl')
+            elif file_format in DataProcessor.COLUMNAR_FORMATS:
+                scan = DataProcessor._scan_columnar(path, file_format)
+            else:
+                # 其余格式没有廉价的窗口读取方式, 退回流式读取表头
+                header, rows, metadata = DataProcessor.iter_file(path)
+                close = getattr(rows, 'close', None)
+                if close:
+                    close()
+                scan = {
+                    'columns': header,
+                    'header_row_idx': metadata.get('header_row_idx', 0),
+                    'estimated_rows': None,
+                }
+            
+            scan['path'] = str(path)
+            scan['format'] = file_format
+            scan['index_map'] = DataProcessor._register_columns(scan['columns'], column_index, combined_header)
+            files.append(scan)
+        
+        return {
+            'columns': combined_header,
+            'files': files,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        }
+    
+    @staticmethod
+    def _scan_excel(path):
+        """
+        扫描XLSX表头窗口; 行数来自 <dimension> 或按已解析字节数估算
+        
+        前导空行过多、窗口不完整时退回 stream_excel 识别表头, 保证与实际读取时的表头一致
+        """
+        window, total_rows = scan_sheet(archive.seekable(path), DataProcessor.HEADER_SEARCH_ROWS)
+        if window is None:
+            header, rows, metadata = DataProcessor.stream_excel(path, 'xlsx')
+            rows.close()
+            header_idx = metadata['header_row_idx']
+            return {
+                'columns': header,
+                'header_row_idx': header_idx,
+                'estimated_rows': max(total_rows - header_idx - 1, 0) if total_rows else None,
+            }
+        
+        try:
+            header_idx, header_row, _ = DataProcessor._detect_header(window)
+        except ValueError:
+            raise ValueError(f"{path} does not contain enough rows to find a header.")
+        
+        return {
+            'columns': [(str(cell).strip() if cell is not None else "") for cell in header_row],
+            'header_row_idx': header_idx,
+            'estimated_rows': max(total_rows - header_idx - 1, 0) if total_rows else None,
+        }
+    
+    @staticmethod
+    def _scan_xls(path):
+        """扫描XLS表头窗口; 行数取自工作表记录的行数"""
+        book, sheet = DataProcessor._open_xls_sheet(path)
+        try:
+            window = (
+                DataProcessor._xls_row_values(sheet, row_idx, book.datemode)
+                for row_idx in range(sheet.nrows)
+            )
+            try:
+                header_idx, header_row, _ = DataProcessor._detect_header(window)
+            except ValueError:
+                raise ValueError(f"{path} does not contain enough rows to find a header.")
+            total_rows = sheet.nrows
+        finally:
+            book.release_resources()
+        
+        return {
+            'columns': [(str(cell).strip() if cell is not None else "") for cell in header_row],
+            'header_row_idx': header_idx,
+            'estimated_rows': max(total_rows - header_idx - 1, 0),
+        }
+    
+    @staticmethod
+    def _read_sample(path):
+        """读取文件开头的样本字节, 返回 (样本, 是否已读到文件末尾)"""
+        with archive.open_source(path) as f:
+            raw = f.read(DataProcessor.SAMPLE_BYTES + 1)
+        complete = len(raw) <= DataProcessor.SAMPLE_BYTES
+        return raw[:DataProcessor.SAMPLE_BYTES], complete
+    
+    @staticmethod
+    def _decode_sample(raw, encodings, complete):
+        """按候选编码解码样本, 末尾被截断的多字节字符不视为错误"""
+        for enc in encodings:
+            try:
+                decoder = codecs.getincrementaldecoder(enc)()
+                return enc, decoder.decode(raw, final=complete)
+            except UnicodeDecodeError:
+                continue
+        raise ValueError("Failed to decode file sample with any encoding")
+    
+    @staticmethod
+    def _scan_csv(path, encoding='utf-8'):
+        """扫描CSV表头; 行数按样本中每行平均字节数估算"""
+        if isinstance(path, str):
+            path = Path(path)
+        
+        enc, dialect, text, complete = DataProcessor._sniff_csv(path, encoding)
+        
+        header = None
+        data_count = 0
+        for row in csv.reader(StringIO(text), **dialect):
+            if not any(cell.strip() for cell in row):
+                continue
+            if header is None:
+                header = [cell.strip() for cell in row]
+            else:
+                data_count += 1
+        
+        if header is None:
+            raise ValueError(f"{path} has no valid header")
+        
+        if complete:
+            estimated_rows = data_count
+        else:
+            sample_bytes = len(text.encode(enc, errors='ignore')) or 1
+            estimated_rows = round(data_count * archive.source_stat(path).st_size / sample_bytes)
+        
+        return {
+            'columns': header,
+            'header_row_idx': 0,
+            'estimated_rows': estimated_rows,
+            'encoding': enc,
+            'dialect': dialect,
+        }
+    
+    @staticmethod
+    def _scan_json(path, encoding='utf-8', lines=False):
+        """
+        扫描JSON表头: 表头为所有记录键的并集, 必须遍历全部记录才能确定;
+        遍历时不保留数据, 结果按文件大小与修改时间缓存, 随后的流式读取不再重复扫描
+        """
+        header, count = json_stream.scan_keys(path, encoding, lines)
+        if not count:
+            raise ValueError(f"{path} contains no data")
+        
+        return {
+            'columns': header,
+            'header_row_idx': 0,
+            'estimated_rows': count,
+        }
+    
+    @staticmethod
+    def _scan_columnar(path, file_format):
+        """扫描Parquet/Arrow表头: 列名与行数直接来自文件的结构信息"""
+        if not ARROW_SUPPORT:
+            raise RuntimeError("Parquet/Arrow format requires pyarrow library. Install: pip install pyarrow")
+        
+        columns, num_rows = arrow_io.read_schema(path, file_format)
+        return {
+            'columns': columns,
+            'header_row_idx': 0,
+            'estimated_rows': num_rows,
+        }
+    
+    @staticmethod
+    def read_files(file_paths, workers=1, columns=None):
+        """
+        读取多个文件, 按传入顺序逐个返回 read_file 的结果
+        
+        workers > 1 时在进程池中并行解析, 结果仍按原顺序产出,
+        调用方可以在后续文件解析的同时处理已完成的文件。
+        
+        Args:
+            file_paths: 文件路径列表
+            workers: 并行进程数, 1 表示在当前进程中顺序读取
+            columns: 列投影 (见 read_file)
+        
+        Yields:
+            (header, rows, metadata)
+        """
+        file_paths = list(file_paths)
+        workers = min(workers or 1, len(file_paths))
+        
+        if workers > 1:
+            try:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError) as e:
+                print(f"Warning: Process pool unavailable, reading files sequentially: {e}", file=sys.stderr)
+            else:
+                with executor:
+                    yield from executor.map(DataProcessor.read_file, file_paths, repeat(columns))
+                return
+        
+        for path in file_paths:
+            yield DataProcessor.read_file(path, columns)
     
     @staticmethod
-    def merge_files(file_paths, output_format='xlsx'):
+    def merge_files(file_paths, output_format='xlsx', workers=1, progress=None, columns=None):
         """
         合并多个文件
         
         Args:
             file_paths: 文件路径列表
             output_format: 输出格式
+            workers: 并行读取文件的进程数 (见 read_files)
+            progress: 可选的 ProgressTracker, 记录读取进度与耗时
+            columns: 列投影 (见 read_file), 列式格式只读取这些列
         
         Returns:
-            (header, merged_rows, all_metadata): 合并后的表头、数据、元数据
+            (header, merged_rows, all_metadata): 合并后的表头、数据、元数据;
+            元数据中的 file_rows 为各文件的数据行数 (按文件顺序)
         """
         combined_header = []
+        column_index = {}  # 列名 -> 合并表头中的位置, O(1) 查找
         merged_rows = []
         all_images = []
+        file_rows = []
         current_row = 1
         
-        for path in file_paths:
-            header, rows, metadata = DataProcessor.read_file(path)
-            
-            # Add new columns to combined header
-            new_columns = []
-            for col in header:
-                if col and col not in combined_header:
-                    combined_header.append(col)
-                    new_columns.append(col)
-            
-            # Extend existing rows if header grew
-            if new_columns:
-                for r in merged_rows:
-                    r.extend([None] * len(new_columns))
-            
-            # Build index map
-            index_map = []
-            for col in header:
-                if col and col in combined_header:
-                    index_map.append(combined_header.index(col))
-                else:
-                    index_map.append(None)
+        results = DataProcessor.read_files(file_paths, workers, columns)
+        if progress is not None:
+            results = progress.iter_files(results)
+        
+        for header, rows, metadata in results:
+            # Register new columns and build index map
+            index_map = DataProcessor._register_columns(header, column_index, combined_header)
             
-            # Map rows to combined header
-            for row in rows:
-                mapped = [None] * len(combined_header)
-                for i, val in enumerate(row):
-                    if i < len(index_map) and index_map[i] is not None:
-                        mapped[index_map[i]] = val
-                merged_rows.append(mapped)
+            # Map rows to the header width known so far; rows are padded once at the end
+            DataProcessor._map_rows(rows, index_map, len(combined_header), merged_rows)
             
             # Process images (only for Excel files)
             if metadata.get('format') in ['xlsx', 'xls'] and metadata.get('images'):
@@ -371,14 +943,61 @@ class DataProcessor:
                     })
             
             current_row += len(rows)
+            file_rows.append(len(rows))
+        
+        # Pad rows from earlier files to the final header width in a single pass
+        width = len(combined_header)
+        for row in merged_rows:
+            if len(row) < width:
+                row.extend([None] * (width - len(row)))
         
         all_metadata = {
             'images': all_images,
             'output_format': output_format,
+            'file_rows': file_rows,
         }
         
         return combined_header, merged_rows, all_metadata
     
+    @staticmethod
+    def _register_columns(header, column_index, combined_header):
+        """
+        将文件表头登记到合并表头
+        
+        Args:
+            header: 当前文件表头
+            column_index: 列名 -> 合并表头位置的字典 (会被更新)
+            combined_header: 合并表头列表 (新列追加到末尾)
+        
+        Returns:
+            index_map: 当前文件每一列在合并表头中的位置, 空列名为 None
+        """
+        index_map = []
+        for col in header:
+            if not col:
+                index_map.append(None)
+                continue
+            idx = column_index.get(col)
+            if idx is None:
+                idx = len(combined_header)
+                column_index[col] = idx
+                combined_header.append(col)
+            index_map.append(idx)
+        return index_map
+    
+    @staticmethod
+    def _map_rows(rows, index_map, width, out):
+        """按索引映射把数据行重排为合并表头顺序, 追加到 out"""
+        pairs = [(i, j) for i, j in enumerate(index_map) if j is not None]
+        for row in rows:
+            mapped = [None] * width
+            n = len(row)
+            for i, j in pairs:
+                if i < n:
+                    mapped[j] = row[i]
+            out.append(mapped)
+        return out
+    
     @staticmethod
     def apply_cell_operations(merged_rows, combined_header, operations):
         """应用单元格操作"""
@@ -387,7 +1006,6 @@ class DataProcessor:
         
         for op in operations:
             col_name = op.get('column')
-            action = op.get('action')
             
             # Find column index
             col_idx = None
@@ -400,34 +1018,64 @@ class DataProcessor:
                 print(f"Warning: Column '{col_name}' not found", file=sys.stderr)
                 continue
             
+            func = DataProcessor.cell_operation(op)
+            if func is None:
+                continue
+            
             # Apply operation to each row
             for row in merged_rows:
-                if col_idx >= len(row) or row[col_idx] is None:
-                    continue
-                
-                val = str(row[col_idx]) if row[col_idx] is not None else ''
-                
-                if action == 'add_prefix':
-                    row[col_idx] = op['value'] + val
-                elif action == 'add_suffix':
-                    row[col_idx] = val + op['value']
-                elif action == 'remove_prefix':
-                    if val.startswith(op['value']):
-                        row[col_idx] = val[len(op['value']):]
-                elif action == 'remove_suffix':
-                    if val.endswith(op['value']):
-                        row[col_idx] = val[:-len(op['value'])]
-                elif action == 'replace':
-                    row[col_idx] = val.replace(op.get('old_value', ''), op.get('new_value', ''))
-                elif action == 'insert_at':
-                    pos = op.get('position', 0)
-                    if 0 <= pos <= len(val):
-                        row[col_idx] = val[:pos] + op['value'] + val[pos:]
-                elif action == 'delete_at':
-                    pos = op.get('position', 0)
-                    length = op.get('length', 1)
-                    if 0 <= pos < len(val):
-                        row[col_idx] = val[:pos] + val[pos + length:]
+                if col_idx < len(row):
+                    row[col_idx] = func(row[col_idx])
+    
+    @staticmethod
+    def cell_operation(op):
+        """
+        生成单元格操作的取值函数 func(value) -> 新值, 空值 (None) 原样返回
+        
+        Returns:
+            取值函数; 未知操作类型返回 None
+        """
+        action = op.get('action')
+        
+        if action == 'add_prefix':
+            def func(value):
+                return value if value is None else op['value'] + str(value)
+        elif action == 'add_suffix':
+            def func(value):
+                return value if value is None else str(value) + op['value']
+        elif action == 'remove_prefix':
+            def func(value):
+                if value is None:
+                    return value
+                val = str(value)
+                return val[len(op['value']):] if val.startswith(op['value']) else value
+        elif action == 'remove_suffix':
+            def func(value):
+                if value is None:
+                    return value
+                val = str(value)
+                return val[:-len(op['value'])] if val.endswith(op['value']) else value
+        elif action == 'replace':
+            def func(value):
+                return value if value is None else str(value).replace(op.get('old_value', ''), op.get('new_value', ''))
+        elif action == 'insert_at':
+            def func(value):
+                if value is None:
+                    return value
+                val = str(value)
+                pos = op.get('position', 0)
+                return val[:pos] + op['value'] + val[pos:] if 0 <= pos <= len(val) else value
+        elif action == 'delete_at':
+            def func(value):
+                if value is None:
+                    return value
+                val = str(value)
+                pos = op.get('position', 0)
+                length = op.get('length', 1)
+                return val[:pos] + val[pos + length:] if 0 <= pos < len(val) else value
+        else:
+            return None
+        return func
     
     @staticmethod
     def create_derived_column(merged_rows, combined_header, rules):
@@ -437,8 +1085,6 @@ class DataProcessor:
         
         source_col = rules.get('source_column')
         new_col = rules.get('new_column')
-        mappings = rules.get('mappings', [])
-        extraction = rules.get('extraction')
         
         # Find source column index
         source_idx = None
@@ -455,17 +1101,33 @@ class DataProcessor:
         combined_header.append(new_col)
         new_idx = len(combined_header) - 1
         
+        DataProcessor._fill_derived_column(merged_rows, source_idx, new_idx, rules)
+    
+    @staticmethod
+    def _fill_derived_column(merged_rows, source_idx, new_idx, rules):
+        """按列规则计算派生列的值 (列位置已解析)"""
+        derive = DataProcessor.derived_value(rules)
+        width = new_idx + 1
+        
         # Process each row
         for row in merged_rows:
             # Extend row if needed
-            if len(row) < len(combined_header):
-                row.extend([None] * (len(combined_header) - len(row)))
+            if len(row) < width:
+                row.extend([None] * (width - len(row)))
             
-            if source_idx >= len(row) or row[source_idx] is None:
-                row[new_idx] = None
-                continue
+            row[new_idx] = derive(row[source_idx] if source_idx < len(row) else None)
+    
+    @staticmethod
+    def derived_value(rules):
+        """生成派生列的取值函数 derive(源单元格值) -> 派生值, 源值为 None 时派生值为 None"""
+        mappings = rules.get('mappings', [])
+        extraction = rules.get('extraction')
+        
+        def derive(value):
+            if value is None:
+                return None
             
-            source_val = str(row[source_idx])
+            source_val = str(value)
             
             # Apply extraction
             if extraction:
@@ -495,7 +1157,9 @@ class DataProcessor:
                             result = value
                             break
             
-            row[new_idx] = result
+            return result
+        
+        return derive
     
     @staticmethod
     def filter_columns(combined_header, merged_rows, filter_mode, filter_columns):
@@ -530,7 +1194,7 @@ class DataProcessor:
         Args:
             combined_header: 表头
             merged_rows: 数据行
-            output_path: 输出路径
+            output_path: 输出路径, 或可写的二进制流 (例如压缩输出流)
             metadata: 元数据 (包含图片等)
             output_format: 输出格式
         """
@@ -538,7 +1202,7 @@ class DataProcessor:
             output_path = Path(output_path)
         
         # Override format from path if specified
-        if output_path.suffix:
+        if isinstance(output_path, Path) and output_path.suffix:
             detected_format = output_path.suffix.lower().lstrip('.')
             if detected_format in DataProcessor.SUPPORTED_FORMATS:
                 output_format = detected_format
@@ -551,29 +1215,51 @@ class DataProcessor:
             return DataProcessor._write_csv(combined_header, merged_rows, output_path)
         elif output_format == 'json':
             return DataProcessor._write_json(combined_header, merged_rows, output_path)
+        elif output_format == 'ndjson':
+            return DataProcessor._write_ndjson(combined_header, merged_rows, output_path)
+        elif output_format in DataProcessor.COLUMNAR_FORMATS:
+            return DataProcessor._write_columnar(combined_header, merged_rows, output_path, output_format)
         else:
             raise ValueError(f"Unsupported output format: {output_format}")
     
     @staticmethod
     def _write_xlsx(combined_header, merged_rows, output_path, metadata=None):
-        """写入XLSX文件"""
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Merged"
+        """
+        写入XLSX文件
         
+        使用 openpyxl 的只写模式, 行数据边生成边写入临时文件, 内存占用与行数无关。
+        超过单个工作表行数上限时续写到 Merged_2、Merged_3 ..., 每个工作表都重复表头。
+        """
         if not combined_header:
             raise RuntimeError("No header provided")
         
-        # Write header
-        ws.append(combined_header)
+        wb = Workbook(write_only=True)
+        header = list(combined_header)
+        width = len(header)
+        rows_per_sheet = DataProcessor.XLSX_MAX_ROWS - 1
+        
+        def new_sheet():
+            title = "Merged" if not sheets else f"Merged_{len(sheets) + 1}"
+            ws = wb.create_sheet(title)
+            ws.append(header)
+            sheets.append(ws)
+            return ws
+        
+        sheets = []
+        ws = new_sheet()
+        written = 0
         
         # Write data rows
         for row in merged_rows:
-            if len(row) < len(combined_header):
-                row = list(row) + [None] * (len(combined_header) - len(row))
+            if written == rows_per_sheet:
+                ws = new_sheet()
+                written = 0
+            if len(row) < width:
+                row = list(row) + [None] * (width - len(row))
             ws.append(row)
+            written += 1
         
-        # Add images
+        # Add images (行数据写完后才能确定图片所在的工作表)
         if metadata and metadata.get('images'):
             from openpyxl.utils import get_column_letter
             for img_data in metadata['images']:
@@ -585,48 +1271,114 @@ class DataProcessor:
                     if img_data.get('height'):
                         img.height = img_data['height']
                     
-                    merged_row = img_data['merged_row']
+                    # merged_row 为单表中的行号 (第 1 行为表头), 换算到续写后的工作表
+                    sheet_idx, data_row = divmod(img_data['merged_row'] - 2, rows_per_sheet)
+                    if sheet_idx < 0 or sheet_idx >= len(sheets):
+                        continue
                     col_idx = img_data['col_index']
                     
-                    cell_ref = f"{get_column_letter(col_idx + 1)}{merged_row}"
-                    img.anchor = cell_ref
+                    img.anchor = f"{get_column_letter(col_idx + 1)}{data_row + 2}"
                     
-                    ws.add_image(img)
+                    sheets[sheet_idx].add_image(img)
                 except Exception as e:
                     print(f"Warning: Failed to add image: {e}", file=sys.stderr)
         
-        wb.save(str(output_path))
+        wb.save(compression.output_target(output_path))
         return output_path
     
     @staticmethod
     def _write_xls(combined_header, merged_rows, output_path):
-        """写入XLS文件"""
+        """
+        写入XLS文件
+        
+        超过单个工作表行数上限时续写到 Merged_2、Merged_3 ..., 每个工作表都重复表头。
+        样式对象只创建一次并按值类型复用; 每 XLS_FLUSH_ROWS 行调用 flush_row_data
+        把已完成的行写入临时文件, 内存占用与行数无关。
+        """
         if not XLS_SUPPORT:
             raise RuntimeError("XLS format requires xlwt library. Install: pip install xlwt")
         
-        wb = xlwt.Workbook()
-        ws = wb.add_sheet('Merged')
-        
         if not combined_header:
             raise RuntimeError("No header provided")
         
-        # Write header
-        for col_idx, header_val in enumerate(combined_header):
-            ws.write(0, col_idx, header_val)
+        header = list(combined_header)
+        if len(header) > DataProcessor.XLS_MAX_COLUMNS:
+            raise ValueError(
+                f"XLS format supports at most {DataProcessor.XLS_MAX_COLUMNS} columns, got {len(header)}"
+            )
+        
+        wb = xlwt.Workbook(encoding='utf-8')
+        rows_per_sheet = DataProcessor.XLS_MAX_ROWS - 1
+        flush_rows = DataProcessor.XLS_FLUSH_ROWS
+        
+        # 缓存的样式: 日期/时间需要数字格式才能在 Excel 中按日期显示
+        default_style = xlwt.Style.default_style
+        date_styles = {
+            datetime.datetime: xlwt.easyxf(num_format_str='YYYY-MM-DD HH:MM:SS'),
+            datetime.date: xlwt.easyxf(num_format_str='YYYY-MM-DD'),
+            datetime.time: xlwt.easyxf(num_format_str='HH:MM:SS'),
+        }
+        native_types = (str, int, float, bool, Decimal)
+        
+        def new_sheet():
+            title = "Merged" if not sheets else f"Merged_{len(sheets) + 1}"
+            ws = wb.add_sheet(title)
+            header_row = ws.row(0)
+            for col_idx, header_val in enumerate(header):
+                header_row.write(col_idx, header_val, default_style)
+            sheets.append(ws)
+            return ws
+        
+        sheets = []
+        ws = new_sheet()
+        row_idx = 0
         
         # Write data rows
-        for row_idx, row in enumerate(merged_rows, start=1):
+        for row in merged_rows:
+            if row_idx == rows_per_sheet:
+                ws.flush_row_data()
+                ws = new_sheet()
+                row_idx = 0
+            row_idx += 1
+            
+            xls_row = ws.row(row_idx)
             for col_idx, cell_val in enumerate(row):
-                if cell_val is not None:
-                    ws.write(row_idx, col_idx, cell_val)
+                if cell_val is None or cell_val == '':
+                    continue
+                style = date_styles.get(type(cell_val))
+                if style is None:
+                    style = default_style
+                    # 日期类型的子类 (如 pandas.Timestamp) 按基类选择样式
+                    for date_type in date_styles:
+                        if isinstance(cell_val, date_type):
+                            style = date_styles[date_type]
+                            break
+                    else:
+                        if not isinstance(cell_val, native_types):
+                            cell_val = str(cell_val)
+                xls_row.write(col_idx, cell_val, style)
+            
+            if row_idx % flush_rows == 0:
+                ws.flush_row_data()
         
-        wb.save(str(output_path))
+        wb.save(compression.output_target(output_path))
         return output_path
     
+    @staticmethod
+    def _write_columnar(combined_header, merged_rows, output_path, output_format):
+        """
+        写入Parquet / Arrow IPC文件
+        按记录批次写出, 每列的类型随数据放宽 (整数与浮点数混合时为浮点数, 其余类型混杂的列写为字符串)
+        """
+        if not ARROW_SUPPORT:
+            raise RuntimeError("Parquet/Arrow format requires pyarrow library. Install: pip install pyarrow")
+        
+        return arrow_io.write_rows(combined_header, merged_rows, output_path, output_format)
+    
     @staticmethod
     def _write_csv(combined_header, merged_rows, output_path, encoding='utf-8-sig'):
         """写入CSV文件"""
-        with open(output_path, 'w', encoding=encoding, newline='') as f:
+        with compression.open_text_output(output_path, encoding, newline='') as f:
             writer = csv.writer(f)
             
             # Write header
@@ -643,28 +1395,46 @@ class DataProcessor:
         
         return output_path
     
+    @staticmethod
+    def _json_records(combined_header, merged_rows):
+        """逐行生成紧凑的 JSON 对象文本; None 与缺失的列写为空字符串, 日期等非 JSON 类型转为字符串"""
+        header = list(combined_header)
+        width = len(header)
+        encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=str).encode
+        for row in merged_rows:
+            values = [val if val is not None else '' for val in row[:width]]
+            if len(values) < width:
+                values.extend([''] * (width - len(values)))
+            yield encode(dict(zip(header, values)))
+    
     @staticmethod
     def _write_json(combined_header, merged_rows, output_path, encoding='utf-8'):
         """
         写入JSON文件
-        格式: {"data": [{"col1": "val1", ...}, ...]}
+        格式: {"columns": [...], "data": [{"col1": "val1", ...}, ...], "count": N}
+        
+        记录逐条编码并写出 (每条一行, 紧凑格式), 不在内存中构建完整文档
         """
-        records = []
-        for row in merged_rows:
-            record = {}
-            for i, col in enumerate(combined_header):
-                val = row[i] if i < len(row) else None
-                # Convert None to empty string for JSON
-                record[col] = val if val is not None else ''
-            records.append(record)
-        
-        output_data = {
-            'data': records,
-            'count': len(records),
-            'columns': combined_header,
-        }
+        columns = json.dumps(list(combined_header), ensure_ascii=False, separators=(',', ':'))
+        count = 0
+        with compression.open_text_output(output_path, encoding, newline='\n') as f:
+            f.write(f'{{"columns":{columns},"data":[')
+            for record in DataProcessor._json_records(combined_header, merged_rows):
+                f.write(',\n' if count else '\n')
+                f.write(record)
+                count += 1
+            f.write(f'\n],"count":{count}}}\n')
         
-        with open(output_path, 'w', encoding=encoding, ensure_ascii=False) as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
+        return output_path
+    
+    @staticmethod
+    def _write_ndjson(combined_header, merged_rows, output_path, encoding='utf-8'):
+        """
+        写入NDJSON (JSON Lines) 文件: 每行一个记录对象
+        """
+        with compression.open_text_output(output_path, encoding, newline='\n') as f:
+            for record in DataProcessor._json_records(combined_header, merged_rows):
+                f.write(record)
+                f.write('\n')
         
         return output_path
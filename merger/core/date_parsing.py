@@ -0,0 +1,386 @@
+"""
+日期解析
+按列学习日期文本的布局并缓存, 批量解析时按布局用 NumPy 向量化处理,
+只有不符合已知布局的值才逐个用 datetime.strptime 依次尝试各格式。
+
+布局是某个格式在固定字段宽度下的文本形状, 例如 '%Y-%m-%d' 下的 '2024-01-05' 和
+'2024-1-5' 是两个布局。布局从用 strptime 解析成功的值中学习, 每列最多保留
+MAX_LAYOUTS 个, 按命中次数排序, 主导布局最先尝试。
+
+结果与依次用各格式调用 strptime 一致, 前提是格式之间互斥 (同一文本最多被一个格式
+解析成功), DataCleaner 与 DataValidator 使用的格式列表都满足这一点。
+"""
+import re
+from datetime import datetime
+from typing import List, Optional
+
+import numpy as np
+
+
+# 支持学习布局的格式指令 → (datetime 参数位置, strptime 使用的正则)
+_DIRECTIVES = {
+    'Y': (0, r'\d\d\d\d'),
+    'm': (1, r'1[0-2]|0[1-9]|[1-9]'),
+    'd': (2, r'3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9]'),
+    'H': (3, r'2[0-3]|[0-1]\d|\d'),
+    'M': (4, r'[0-5]\d|\d'),
+    'S': (5, r'6[0-1]|[0-5]\d|\d'),
+}
+# 格式中没有的字段取 strptime 的默认值
+_DEFAULT_FIELDS = (1900, 1, 1, 0, 0, 0)
+_ZERO = ord('0')
+_MONTH_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _format_regex(fmt: str) -> Optional[re.Pattern]:
+    """
+    把格式转为与 strptime 相同的正则 (字段为命名分组), 用于从解析成功的值中取出字段位置
+
+    Returns:
+        编译后的正则; 格式包含不支持的指令时返回 None
+    """
+    pattern = []
+    used = set()
+    i = 0
+    while i < len(fmt):
+        ch = fmt[i]
+        if ch == '%':
+            directive = fmt[i + 1:i + 2]
+            if directive == '%':
+                pattern.append('%')
+            elif directive in _DIRECTIVES and directive not in used:
+                used.add(directive)
+                pattern.append(f"(?P<{directive}>{_DIRECTIVES[directive][1]})")
+            else:
+                return None
+            i += 2
+        elif ch.isspace():
+            # 与 strptime 一致: 连续空白匹配任意长度的空白
+            while i < len(fmt) and fmt[i].isspace():
+                i += 1
+            pattern.append(r'\s+')
+        else:
+            pattern.append(re.escape(ch))
+            i += 1
+    return re.compile(''.join(pattern), re.IGNORECASE)
+
+
+class _Layout:
+    """
+    固定位置的日期文本布局
+
+    字段都是 ASCII 数字, 字段之间由非数字字符隔开, 这样符合布局的文本在 strptime
+    中的字段划分是唯一的, 按位置取出字段即与 strptime 的解析结果相同。
+    """
+
+    def __init__(self, text: str, fields: List[tuple]):
+        # fields: [(datetime 参数位置, 起始, 结束)], 按起始位置排序
+        self.length = len(text)
+        self.fields = fields
+        self.hits = 0
+
+        pattern = []
+        covered = set()
+        pos = 0
+        for _, start, end in fields:
+            pattern.append(re.escape(text[pos:start]))
+            pattern.append(f"(\\d{{{end - start}}})")
+            covered.update(range(start, end))
+            pos = end
+        pattern.append(re.escape(text[pos:]))
+        self.regex = re.compile(''.join(pattern), re.ASCII)
+        self.slots = [slot for slot, _, _ in fields]
+        self.literals = [(i, ord(text[i])) for i in range(len(text)) if i not in covered]
+        self.key = (self.regex.pattern, tuple(self.slots))
+
+    @classmethod
+    def learn(cls, regex: re.Pattern, text: str, parsed: datetime) -> Optional['_Layout']:
+        """从 strptime 解析成功的值中学习布局, 无法用固定位置表示时返回 None"""
+        # strptime 使用 match 并要求匹配到文本末尾
+        match = regex.match(text)
+        if match is None or match.end() != len(text):
+            return None
+
+        fields = []
+        for directive, value in match.groupdict().items():
+            if not (value.isascii() and value.isdigit()):
+                return None
+            fields.append((_DIRECTIVES[directive][0], match.start(directive), match.end(directive)))
+        fields.sort(key=lambda field: field[1])
+        if not {0, 1, 2} <= {slot for slot, _, _ in fields}:
+            return None
+
+        bounds = [0] + [pos for _, start, end in fields for pos in (start, end)] + [len(text)]
+        for start, end in zip(bounds[::2], bounds[1::2]):
+            literal = text[start:end]
+            # 相邻字段之间必须有分隔符, 分隔符中不能有数字 (否则字段划分不唯一)
+            if (not literal and 0 < start < len(text)) or any(ch.isdigit() or ch == '\x00' for ch in literal):
+                return None
+
+        layout = cls(text, fields)
+        return layout if layout.parse(text) == parsed else None
+
+    def parse(self, text: str) -> Optional[datetime]:
+        """
+        按布局解析单个值
+
+        Returns:
+            datetime; 不符合布局或字段取值无效时返回 None (由 strptime 判定)
+        """
+        match = self.regex.fullmatch(text)
+        if match is None:
+            return None
+        values = list(_DEFAULT_FIELDS)
+        for slot, value in zip(self.slots, match.groups()):
+            values[slot] = int(value)
+        try:
+            return datetime(*values)
+        except ValueError:
+            return None
+
+    def match_codes(self, codes: np.ndarray):
+        """
+        向量化解析: codes 为等长文本的码位矩阵 (行数 × self.length)
+
+        Returns:
+            (有效掩码, 6 个字段数组), 字段取值的有效范围与 datetime 构造函数一致
+        """
+        valid = np.ones(len(codes), dtype=bool)
+        for pos, code in self.literals:
+            valid &= codes[:, pos] == code
+
+        values = [np.full(len(codes), default, dtype=np.int64) for default in _DEFAULT_FIELDS]
+        for slot, start, end in self.fields:
+            value = values[slot] = np.zeros(len(codes), dtype=np.int64)
+            for pos in range(start, end):
+                # 无符号减法: 小于 '0' 的码位回绕为很大的数
+                digit = codes[:, pos] - np.uint32(_ZERO)
+                valid &= digit < 10
+                value *= 10
+                value += digit
+
+        year, month, day, hour, minute, second = values
+        leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+        month_days = _MONTH_DAYS[np.clip(month, 0, 12)] + ((month == 2) & leap)
+        valid &= ((year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_days)
+                  & (hour <= 23) & (minute <= 59) & (second <= 59))
+        return valid, values
+
+
+class _Formatter:
+    """
+    向量化的 strftime, 只支持 %Y %m %d %H %M %S %% 与普通字符
+
+    目标格式包含其他指令, 或与 strftime 的输出不一致时不可用 (compile 返回 None)
+    """
+
+    PROBES = [datetime(2023, 11, 27, 13, 45, 58), datetime(1999, 1, 2, 3, 4, 5)]
+
+    def __init__(self, tokens: List[tuple]):
+        # tokens: [(位置, 码位)] 的普通字符与 [(位置, datetime 参数位置, 宽度)] 的字段
+        self.literals = [token for token in tokens if len(token) == 2]
+        self.fields = [token for token in tokens if len(token) == 3]
+        self.width = sum(1 if len(token) == 2 else token[2] for token in tokens)
+        # %Y 对 1000 年以前的年份不补零, 这些值逐个格式化
+        self.uses_year = any(slot == 0 for _, slot, _ in self.fields)
+
+    @classmethod
+    def compile(cls, target_format: str) -> Optional['_Formatter']:
+        tokens = []
+        pos = 0
+        i = 0
+        while i < len(target_format):
+            ch = target_format[i]
+            if ch == '%':
+                directive = target_format[i + 1:i + 2]
+                if directive == '%':
+                    tokens.append((pos, ord('%')))
+                    pos += 1
+                elif directive in _DIRECTIVES:
+                    width = 4 if directive == 'Y' else 2
+                    tokens.append((pos, _DIRECTIVES[directive][0], width))
+                    pos += width
+                else:
+                    return None
+                i += 2
+            elif ch == '\x00':
+                return None
+            else:
+                tokens.append((pos, ord(ch)))
+                pos += 1
+                i += 1
+        if not tokens:
+            return None
+
+        formatter = cls(tokens)
+        for probe in cls.PROBES:
+            values = [np.array([getattr(probe, name)]) for name in
+                      ('year', 'month', 'day', 'hour', 'minute', 'second')]
+            try:
+                if formatter.format(values).tolist() != [probe.strftime(target_format)]:
+                    return None
+            except Exception:
+                return None
+        return formatter
+
+    def format(self, values: List[np.ndarray]) -> np.ndarray:
+        """按字段数组批量格式化, 返回字符串对象数组"""
+        count = len(values[0])
+        out = np.empty((count, self.width), dtype=np.uint32)
+        for pos, code in self.literals:
+            out[:, pos] = code
+        for pos, slot, width in self.fields:
+            value = values[slot]
+            for j in range(width):
+                out[:, pos + j] = value // 10 ** (width - 1 - j) % 10 + _ZERO
+        return out.view(f'<U{self.width}').ravel().astype(object)
+
+
+class DateParser:
+    """
+    单列的日期解析器
+
+    依次尝试 formats 中的格式; 学到的布局保存在解析器上, 同一列的后续数据
+    (例如流式处理的下一块) 直接沿用。
+    """
+
+    MAX_LAYOUTS = 8
+    # 批量解析前用于学习布局的样本数 (不同值)
+    SAMPLE_SIZE = 256
+    # 逐个解析的结果缓存上限
+    CACHE_SIZE = 4096
+
+    def __init__(self, formats: List[str]):
+        self.formats = list(formats)
+        self.layouts = []
+        self._regexes = {fmt: _format_regex(fmt) for fmt in self.formats}
+        self._formatters = {}
+        self._cache = {}
+        self._calls = 0
+
+    def parse(self, text: str) -> Optional[datetime]:
+        """解析单个值, 所有格式都无法解析时返回 None"""
+        if text in self._cache:
+            return self._cache[text]
+
+        parsed = None
+        for layout in self.layouts:
+            parsed = layout.parse(text)
+            if parsed is not None:
+                if self._calls < self.SAMPLE_SIZE:
+                    layout.hits += 1
+                break
+        else:
+            parsed = self._parse_formats(text)
+
+        self._calls += 1
+        if self._calls == self.SAMPLE_SIZE:
+            self._sort_layouts()
+        if len(self._cache) >= self.CACHE_SIZE:
+            self._cache.clear()
+        self._cache[text] = parsed
+        return parsed
+
+    def format(self, text: str, target_format: str) -> Optional[str]:
+        """解析单个值并按 target_format 格式化, 无法解析时返回 None"""
+        parsed = self.parse(text)
+        return None if parsed is None else self._strftime(parsed, target_format)
+
+    def format_many(self, texts: List[str], target_format: str) -> List[Optional[str]]:
+        """
+        批量解析并格式化, 每个不同的值只处理一次
+
+        Returns:
+            与 texts 等长的列表, 无法解析的位置为 None
+        """
+        unique = list(dict.fromkeys(texts))
+        results = self._format_unique(unique, target_format)
+        if len(unique) == len(texts):
+            return results
+        return list(map(dict(zip(unique, results)).__getitem__, texts))
+
+    def _parse_formats(self, text: str) -> Optional[datetime]:
+        for fmt in self.formats:
+            try:
+                parsed = datetime.strptime(text, fmt)
+            except Exception:
+                continue
+            self._learn(fmt, text, parsed)
+            return parsed
+        return None
+
+    def _learn(self, fmt: str, text: str, parsed: datetime):
+        regex = self._regexes[fmt]
+        if regex is None or len(self.layouts) >= self.MAX_LAYOUTS:
+            return
+        layout = _Layout.learn(regex, text, parsed)
+        if layout is not None and all(layout.key != known.key for known in self.layouts):
+            layout.hits = 1
+            self.layouts.append(layout)
+
+    def _sort_layouts(self):
+        self.layouts.sort(key=lambda layout: -layout.hits)
+
+    def _formatter(self, target_format: str) -> Optional[_Formatter]:
+        if target_format not in self._formatters:
+            self._formatters[target_format] = _Formatter.compile(target_format)
+        return self._formatters[target_format]
+
+    def _format_unique(self, texts: List[str], target_format: str) -> List[Optional[str]]:
+        count = len(texts)
+        if count <= self.SAMPLE_SIZE:
+            return [self.format(text, target_format) for text in texts]
+
+        # 从均匀分布的样本中学习布局 (已学到的布局沿用)
+        for text in texts[::count // self.SAMPLE_SIZE]:
+            self.parse(text)
+        self._sort_layouts()
+
+        results = np.full(count, None, dtype=object)
+        pending = np.ones(count, dtype=bool)
+        lengths = np.fromiter(map(len, texts), dtype=np.intp, count=count)
+        formatter = self._formatter(target_format)
+
+        for length in dict.fromkeys(layout.length for layout in self.layouts):
+            positions = np.flatnonzero(lengths == length)
+            if not len(positions):
+                continue
+            candidates = np.array([texts[i] for i in positions.tolist()], dtype=f'<U{length}')
+            codes = candidates.view(np.uint32).reshape(len(positions), length)
+            remaining = np.ones(len(positions), dtype=bool)
+
+            for layout in self.layouts:
+                if layout.length != length:
+                    continue
+                valid, values = layout.match_codes(codes)
+                valid &= remaining
+                layout.hits += int(valid.sum())
+                remaining &= ~valid
+                if formatter is not None and formatter.uses_year:
+                    fast = valid & (values[0] >= 1000)
+                elif formatter is not None:
+                    fast = valid
+                else:
+                    fast = np.zeros(len(valid), dtype=bool)
+                if fast.any():
+                    results[positions[fast]] = formatter.format([value[fast] for value in values])
+                slow = np.flatnonzero(valid & ~fast)
+                if len(slow):
+                    # 格式化无法向量化的值: 由字段构造 datetime 后逐个 strftime
+                    results[positions[slow]] = [
+                        self._strftime(datetime(*args), target_format)
+                        for args in zip(*(value[slow].tolist() for value in values))
+                    ]
+            pending[positions[~remaining]] = False
+
+        self._sort_layouts()
+        for i in np.flatnonzero(pending).tolist():
+            results[i] = self.format(texts[i], target_format)
+        return results.tolist()
+
+    @staticmethod
+    def _strftime(parsed: datetime, target_format: str) -> Optional[str]:
+        try:
+            return parsed.strftime(target_format)
+        except Exception:
+            return None
@@ -0,0 +1,225 @@
+"""
+行去重引擎
+每个去重键只保存 16 字节的 BLAKE2b 摘要, 而不是整行元组:
+
+- 摘要保存在有序的 NumPy 数组中 (没有 Python 对象开销), 每批新摘要作为一个有序段
+  追加, 较小的段按大小几何合并, 查找时对每段做二分查找
+- 内存中的摘要超过 memory_limit 字节时, 按摘要前缀分区合并写入临时目录中的有序文件,
+  之后通过内存映射查找, 内存占用与已去重的行数无关
+
+键的规范编码与 Python 的相等比较一致: 数值按值比较 (1、1.0、True 视为相同, NaN 之间也视为相同),
+字符串按内容比较; 列表、字典等不可哈希的单元格按内容编码, 同样可以参与去重。
+"""
+import marshal
+import numbers
+import os
+import sys
+import tempfile
+from decimal import Decimal
+from functools import partial
+from hashlib import blake2b
+from itertools import chain, islice, repeat
+from operator import methodcaller
+from typing import List, Any, Iterable, Iterator, Optional
+
+import numpy as np
+
+
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024  # 256MB
+
+_DIGEST_SIZE = 16
+_DIGEST_DTYPE = np.dtype(f'S{_DIGEST_SIZE}')
+# 这些类型的值可以直接编码: marshal 对相等的值产生相同的字节
+_PLAIN_TYPES = frozenset({str, int, type(None)})
+_hasher = partial(blake2b, digest_size=_DIGEST_SIZE)
+_digest = methodcaller('digest')
+
+
+def _canonical(value):
+    """把单元格值转为可以用 marshal 编码的规范形式, 相等的值规范形式相同"""
+    if value is None or type(value) in _PLAIN_TYPES:
+        return value
+    if isinstance(value, str):
+        return str(value)
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, numbers.Integral):
+        return int(value)
+    if isinstance(value, Decimal):
+        # Decimal 与 float 精确相等时 Python 认为两者相等
+        if value.is_finite() and float(value) == value:
+            value = float(value)
+        else:
+            return ('decimal', str(value.normalize()))
+    if isinstance(value, (float, numbers.Real)):
+        value = float(value)
+        return int(value) if value.is_integer() else value
+    if isinstance(value, list):
+        return ('list', [_canonical(item) for item in value])
+    if isinstance(value, tuple):
+        return ('tuple', [_canonical(item) for item in value])
+    if isinstance(value, dict):
+        items = sorted([_encode([key]), _canonical(item)] for key, item in value.items())
+        return ('dict', items)
+    if isinstance(value, (set, frozenset)):
+        return ('set', sorted(_encode([item]) for item in value))
+    kind = type(value)
+    return (f"{kind.__module__}.{kind.__qualname__}", repr(value))
+
+
+def _encode(key: List[Any]) -> bytes:
+    if not _PLAIN_TYPES.issuperset(map(type, key)):
+        key = [_canonical(value) for value in key]
+    return marshal.dumps(key, 2)
+
+
+def row_digest(key: List[Any]) -> bytes:
+    """去重键 (单元格值列表) 的 16 字节摘要"""
+    return _hasher(_encode(key)).digest()
+
+
+def _batch_digests(keys: List[List[Any]]) -> np.ndarray:
+    """一批去重键的摘要数组"""
+    if _PLAIN_TYPES.issuperset(map(type, chain.from_iterable(keys))):
+        # 整批都是字符串/整数/None 时, 编码与哈希都在 C 层的 map 中完成
+        encoded = map(marshal.dumps, keys, repeat(2))
+    else:
+        encoded = map(_encode, keys)
+    return np.frombuffer(b''.join(map(_digest, map(_hasher, encoded))), dtype=_DIGEST_DTYPE)
+
+
+def dedup_keys(rows: List[List[Any]], col_indices: Optional[List[int]] = None) -> Iterator[List[Any]]:
+    """
+    每行的去重键
+
+    Args:
+        col_indices: 参与比较的列位置, None 表示整行比较; 行中不存在的列视为 None
+    """
+    if col_indices is None:
+        return iter(rows)
+    return ([row[idx] if idx < len(row) else None for idx in col_indices] for row in rows)
+
+
+def _member(run: np.ndarray, digests: np.ndarray) -> np.ndarray:
+    """digests 中的每个摘要是否在有序数组 run 中"""
+    idx = np.searchsorted(run, digests)
+    idx[idx == len(run)] = len(run) - 1
+    return run[idx] == digests
+
+
+class RowDeduplicator:
+    """
+    跨批次的去重状态
+
+    对每批数据调用 keep_mask, 返回首次出现的行 (与之前所有批次相比) 的掩码。
+    溢写到磁盘后需要调用 close 删除临时文件。
+    """
+
+    # 每批计算摘要的行数, 限制临时对象的内存
+    BATCH_SIZE = 65536
+    # 溢写文件按摘要首字节的高 6 位分区
+    PARTITION_BITS = 6
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT, spill_dir: Optional[str] = None):
+        self.memory_limit = memory_limit
+        self.spill_dir = spill_dir
+        # 已保存的摘要数 (不同键的数量), 其中已写入磁盘的数量
+        self.stored = 0
+        self.spilled = 0
+
+        self._runs = []
+        self._partitions = [None] * (1 << self.PARTITION_BITS)
+        self._paths = [None] * (1 << self.PARTITION_BITS)
+        self._tempdir = None
+        self._generation = 0
+
+    def keep_mask(self, keys: Iterable[List[Any]], count: int) -> np.ndarray:
+        """
+        Args:
+            keys: 每行的去重键 (见 dedup_keys)
+            count: 行数
+
+        Returns:
+            布尔数组, 首次出现的行为 True
+        """
+        keep = np.zeros(count, dtype=bool)
+        keys = iter(keys)
+        for start in range(0, count, self.BATCH_SIZE):
+            digests = _batch_digests(list(islice(keys, self.BATCH_SIZE)))
+            unique, first = np.unique(digests, return_index=True)
+            new = ~self._contains(unique)
+            keep[start + first[new]] = True
+            self._add(unique[new])
+        return keep
+
+    def close(self):
+        """删除溢写的临时文件"""
+        self._runs = []
+        self._partitions = [None] * len(self._partitions)
+        self._paths = [None] * len(self._paths)
+        if self._tempdir is not None:
+            try:
+                self._tempdir.cleanup()
+            except OSError as e:
+                print(f"Warning: Failed to remove dedup spill directory {self._tempdir.name}: {e}", file=sys.stderr)
+            self._tempdir = None
+
+    def _partition_bounds(self, digests: np.ndarray) -> np.ndarray:
+        """有序摘要数组中各分区的起止位置"""
+        prefixes = digests.view(np.uint8)[::_DIGEST_SIZE] >> (8 - self.PARTITION_BITS)
+        return np.searchsorted(prefixes, np.arange(len(self._partitions) + 1))
+
+    def _contains(self, digests: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(digests), dtype=bool)
+        if not len(digests):
+            return found
+        for run in self._runs:
+            found |= _member(run, digests)
+        if self.spilled:
+            bounds = self._partition_bounds(digests)
+            for p in np.flatnonzero(np.diff(bounds)).tolist():
+                partition = self._partitions[p]
+                if partition is not None:
+                    start, end = bounds[p], bounds[p + 1]
+                    found[start:end] |= _member(partition, digests[start:end])
+        return found
+
+    def _add(self, digests: np.ndarray):
+        if not len(digests):
+            return
+        runs = self._runs
+        runs.append(digests)
+        while len(runs) > 1 and len(runs[-2]) <= len(runs[-1]):
+            last = runs.pop()
+            runs[-1] = np.sort(np.concatenate([runs[-1], last]))
+        self.stored += len(digests)
+        if (self.stored - self.spilled) * _DIGEST_SIZE > self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        """把内存中的摘要按分区合并写入磁盘"""
+        merged = self._runs[0] if len(self._runs) == 1 else np.sort(np.concatenate(self._runs))
+        self._runs = []
+        if self._tempdir is None:
+            self._tempdir = tempfile.TemporaryDirectory(prefix='dedup-', dir=self.spill_dir)
+        self._generation += 1
+
+        bounds = self._partition_bounds(merged)
+        for p in np.flatnonzero(np.diff(bounds)).tolist():
+            digests = merged[bounds[p]:bounds[p + 1]]
+            old_path = self._paths[p]
+            if old_path is not None:
+                digests = np.sort(np.concatenate([np.asarray(self._partitions[p]), digests]))
+                self._partitions[p] = None
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    # Windows 上仍被映射的文件无法删除, 由 close 统一清理
+                    pass
+
+            # 每次写入新文件, 不覆盖可能仍被映射的旧文件
+            path = os.path.join(self._tempdir.name, f"{p:02x}-{self._generation}.bin")
+            digests.tofile(path)
+            self._partitions[p] = np.memmap(path, dtype=_DIGEST_DTYPE, mode='r')
+            self._paths[p] = path
+        self.spilled = self.stored
@@ -11,6 +11,8 @@ from io import BytesIO
 from openpyxl import Workbook, load_workbook
 from openpyxl.drawing.image import Image as OpenpyxlImage
 
+from .xlsx_images import extract_images
+
 try:
     import xlwt
     XLS_SUPPORT = True
@@ -23,13 +25,15 @@ def read_sheet(path):
     if isinstance(path, str):
         path = Path(path)
     
-    # First pass: load cached values (data_only=True) so formula cells resolve to their results
-    wb_values = load_workbook(path, data_only=True)
+    # Load cached values (data_only=True) so formula cells resolve to their results.
+    # read_only mode parses the sheet XML row by row instead of building the full cell graph.
+    wb_values = load_workbook(path, read_only=True, data_only=True)
     try:
         ws_values = wb_values.worksheets[0]
-        rows = []
-        for r in ws_values.iter_rows():
-            rows.append(tuple(cell.value for cell in r))
+        # Some writers emit a bogus "A1" <dimension>; parse actual cells so nothing is truncated
+        if (ws_values.max_row or 0) <= 1 and (ws_values.max_column or 0) <= 1:
+            ws_values.reset_dimensions()
+        rows = list(ws_values.iter_rows(values_only=True))
     finally:
         wb_values.close()
 
@@ -72,51 +76,8 @@ def read_sheet(path):
                     normalized_row[col_idx] = None
             data_rows.append(tuple(normalized_row))
 
-    # Second pass: load original workbook (data_only=False) to extract embedded images
-    images_info = []
-    wb_images = load_workbook(path, data_only=False)
-    try:
-        ws_images = wb_images.worksheets[0]
-        if hasattr(ws_images, '_images') and ws_images._images:
-            from openpyxl.utils import coordinate_from_string, column_index_from_string
-
-            for img in ws_images._images:
-                try:
-                    img_bytes = None
-                    if hasattr(img, '_data'):
-                        img_bytes = img._data()
-                    elif hasattr(img, 'ref') and hasattr(img.ref, 'read'):
-                        img_bytes = img.ref.read()
-
-                    if not img_bytes:
-                        continue
-
-                    anchor_info = {
-                        'row': None,
-                        'col': None,
-                        'width': img.width if hasattr(img, 'width') else 100,
-                        'height': img.height if hasattr(img, 'height') else 100,
-                    }
-
-                    if hasattr(img, 'anchor'):
-                        anchor = img.anchor
-                        if hasattr(anchor, '_from') and anchor._from:
-                            anchor_info['row'] = anchor._from.row
-                            anchor_info['col'] = anchor._from.col
-                        elif isinstance(anchor, str):
-                            col_str, row_num = coordinate_from_string(anchor)
-                            anchor_info['row'] = row_num - 1  # zero-based
-                            anchor_info['col'] = column_index_from_string(col_str) - 1
-
-                    if anchor_info['row'] is not None and anchor_info['col'] is not None:
-                        images_info.append({
-                            'image_data': img_bytes,
-                            'anchor_info': anchor_info,
-                        })
-                except Exception as exc:
-                    print(f"Warning: Failed to extract image: {exc}", file=sys.stderr)
-    finally:
-        wb_images.close()
+    # Images come straight from the drawing parts in the zip archive, no second workbook load
+    images_info = extract_images(path)
 
     return header, data_rows, images_info, best_idx
 
@@ -0,0 +1,329 @@
+"""
+JSON / JSON Lines 增量解析
+逐条解码记录数组 (顶层数组或顶层对象中的 data/records/rows/items 数组) 与 JSONL 文件的每一行,
+文件按块读入, 内存占用只与单条记录大小相关
+"""
+import json
+import re
+from functools import lru_cache
+
+from . import archive
+
+
+# 顶层对象中可作为记录数组的键, 按优先级排列: 同时存在时使用排在前面的键
+RECORD_KEYS = ('data', 'records', 'rows', 'items')
+
+READ_SIZE = 1024 * 1024
+_WHITESPACE = ' \t\n\r'
+
+_decoder = json.JSONDecoder()
+# 完整的字符串 (含转义字符)
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+# 跳过值时括号之间的内容: 括号与引号以外的字符, 以及完整的字符串
+_SKIP = re.compile(r'(?:[^"\[\]{}]+|"[^"\\]*(?:\\.[^"\\]*)*")*', re.S)
+
+
+class _Buffer:
+    """按块读入的文本缓冲区, 提供跳过空白与逐个解码 JSON 值的能力"""
+
+    def __init__(self, f):
+        self.f = f
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=READ_SIZE):
+        if self.eof:
+            return False
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        # 丢弃已消费的部分, 避免缓冲区无限增长
+        if self.pos:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        self.text += chunk
+        return True
+
+    def peek(self):
+        """跳过空白并返回下一个字符 (文件结束时为空字符串)"""
+        while True:
+            text, pos = self.text, self.pos
+            while pos < len(text) and text[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(text):
+                return text[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Invalid JSON: expected '{char}' at offset {self.pos}")
+        self.pos += 1
+
+    def decode(self):
+        """解码下一个完整的 JSON 值; 值跨越块边界时继续读入, 每次读入量加倍"""
+        self.peek()
+        size = READ_SIZE
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self._fill(size):
+                    size *= 2
+                    continue
+                raise ValueError(f"Invalid JSON at offset {self.pos}")
+            # 数字等标量在缓冲区末尾可能被截断, 需要读到后续内容才能确定
+            if end == len(self.text) and self._fill(size):
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """
+        跳过下一个 JSON 值而不构造它: 对象与数组只按括号 (忽略字符串中的括号) 定位结尾,
+        被跳过的内容不做完整的语法检查
+        """
+        first = self.peek()
+        if first not in ('[', '{', '"'):
+            # 数字、布尔值等标量很短, 直接解码
+            self.decode()
+            return
+
+        size = READ_SIZE
+        if first == '"':
+            while True:
+                match = _STRING.match(self.text, self.pos)
+                if match:
+                    self.pos = match.end()
+                    return
+                if not self._fill(size):
+                    raise ValueError(f"Invalid JSON: unterminated string at offset {self.pos}")
+                size *= 2
+
+        depth = 0
+        while True:
+            end = _SKIP.match(self.text, self.pos).end()
+            if end == len(self.text) or self.text[end] == '"':
+                # 到达缓冲区末尾, 或字符串跨越块边界: 读入后续内容后从该处继续
+                self.pos = end
+                if not self._fill(size):
+                    raise ValueError(f"Invalid JSON: unexpected end of file at offset {self.pos}")
+                size *= 2
+                continue
+            self.pos = end + 1
+            size = READ_SIZE
+            depth += 1 if self.text[end] in '[{' else -1
+            if not depth:
+                return
+
+
+def _iter_array(buf):
+    """逐个产出当前位置处数组的元素"""
+    buf.expect('[')
+    if buf.peek() == ']':
+        buf.pos += 1
+        return
+    while True:
+        yield buf.decode()
+        char = buf.peek()
+        buf.pos += 1
+        if char == ']':
+            return
+        if char != ',':
+            raise ValueError(f"Invalid JSON: expected ',' or ']' at offset {buf.pos - 1}")
+
+
+def _iter_document_records(f, reopen):
+    """
+    定位记录数组并逐条产出记录
+
+    顶层对象中有多个记录数组时按 RECORD_KEYS 的优先级选择 (值不是数组的键忽略)。
+    data 数组直接流式读取; 其余键要读完整个对象才能确定没有优先级更高的数组,
+    因此先跳过并记下位置, 最后用 reopen() 重新打开文件, 跳到该位置后流式读取。
+    同一个键出现多次时使用第一个数组
+    """
+    buf = _Buffer(f)
+    first = buf.peek()
+    if first == '[':
+        yield from _iter_array(buf)
+        return
+    if first != '{':
+        raise ValueError("JSON must be an array or object")
+
+    # 顶层对象: 逐个读取键, 跳过其余的值; best 为 (优先级, 成员序号)
+    best = None
+    buf.expect('{')
+    member = 0
+    while buf.peek() not in ('}', ''):
+        key = buf.decode()
+        buf.expect(':')
+        if key in RECORD_KEYS and buf.peek() == '[':
+            rank = RECORD_KEYS.index(key)
+            if rank == 0:
+                yield from _iter_array(buf)
+                return
+            if best is None or rank < best[0]:
+                best = (rank, member)
+        buf.skip()
+        if buf.peek() == ',':
+            buf.pos += 1
+        member += 1
+
+    if best is None:
+        raise ValueError("JSON structure not recognized. Expected array or object with 'data'/'records' key")
+
+    with reopen() as f:
+        buf = _Buffer(f)
+        buf.expect('{')
+        for _ in range(best[1]):
+            buf.decode()
+            buf.expect(':')
+            buf.skip()
+            buf.expect(',')
+        buf.decode()
+        buf.expect(':')
+        yield from _iter_array(buf)
+
+
+def _iter_lines_records(f):
+    """JSON Lines: 每个非空行是一条记录"""
+    for line_no, line in enumerate(f, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON on line {line_no}: {e}")
+
+
+def iter_records(path, encoding='utf-8', lines=False):
+    """
+    逐条产出 JSON 记录
+
+    Args:
+        path: 文件路径
+        encoding: 文件编码 (带 BOM 的 UTF-8 会自动处理)
+        lines: True 表示 JSON Lines 格式
+    """
+    if encoding.lower().replace('_', '-') in ('utf-8', 'utf8'):
+        encoding = 'utf-8-sig'
+    with archive.open_text(path, encoding) as f:
+        if lines:
+            yield from _iter_lines_records(f)
+        else:
+            yield from _iter_document_records(f, lambda: archive.open_text(path, encoding))
+
+
+def _check_record(record):
+    if not isinstance(record, dict):
+        raise ValueError("JSON records must be objects/dictionaries")
+
+
+def cell_value(value):
+    """保留数字、布尔等原生类型; 嵌套的对象/数组序列化为 JSON 文本"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def _row_values(values):
+    row = list(values)
+    for i, value in enumerate(row):
+        if isinstance(value, (dict, list)):
+            row[i] = json.dumps(value, ensure_ascii=False)
+    return row
+
+
+def read_records(path, encoding='utf-8', lines=False):
+    """
+    单遍读取全部记录
+
+    表头为所有记录键的并集 (按首次出现的顺序), 每条记录在读取时即转换为行,
+    不保留记录字典; 缺失的键为 None
+
+    Returns:
+        (header, rows)
+    """
+    header = []
+    index = {}
+    rows = []
+    # 记录的键顺序与表头一致时 (最常见的情况) 直接按值顺序生成行
+    header_keys = ()
+    for record in iter_records(path, encoding, lines):
+        _check_record(record)
+        keys = tuple(record)
+        if keys == header_keys:
+            rows.append(_row_values(record.values()))
+            continue
+        for key in keys:
+            if key not in index:
+                index[key] = len(header)
+                header.append(key)
+        if keys == tuple(header):
+            header_keys = keys
+            rows.append(_row_values(record.values()))
+            continue
+        row = [None] * len(header)
+        for key, value in record.items():
+            row[index[key]] = cell_value(value)
+        rows.append(row)
+
+    # 较早的记录按最终表头宽度补齐
+    width = len(header)
+    for row in rows:
+        if len(row) < width:
+            row.extend([None] * (width - len(row)))
+    return header, rows
+
+
+def scan_keys(path, encoding='utf-8', lines=False):
+    """
+    只收集键的并集与记录数 (不保留数据), 供流式读取前确定表头
+
+    Returns:
+        (header, record_count)
+    """
+    stat = archive.source_stat(path)
+    if not isinstance(path, archive.ArchiveMember):
+        path = str(path)
+    return _scan_keys(path, stat.st_size, stat.st_mtime_ns, encoding, lines)
+
+
+@lru_cache(maxsize=64)
+def _scan_keys(path, size, mtime_ns, encoding, lines):
+    header = []
+    seen = set()
+    count = 0
+    for record in iter_records(path, encoding, lines):
+        _check_record(record)
+        count += 1
+        for key in record:
+            if key not in seen:
+                seen.add(key)
+                header.append(key)
+    return header, count
+
+
+def stream_rows(path, encoding='utf-8', lines=False):
+    """
+    流式读取: 先扫描一遍得到键的并集, 再逐条产出行
+
+    Returns:
+        (header, rows): rows 为惰性迭代器
+    """
+    header, _ = scan_keys(path, encoding, lines)
+
+    header_keys = tuple(header)
+
+    def generate_rows():
+        for record in iter_records(path, encoding, lines):
+            if tuple(record) == header_keys:
+                yield _row_values(record.values())
+            else:
+                yield [cell_value(record.get(key)) for key in header]
+
+    return header, generate_rows()
@@ -0,0 +1,65 @@
+"""
+数值列统计
+均值/中位数填充的数值转换与统计, DataCleaner 与 VectorizedCleaner 共用, 两种后端的填充值完全一致:
+
+- 数值判定与 DataValidator 的 number 类型一致: float() 能转换的值 (数字、数字字符串) 参与统计,
+  NaN 与无穷大除外; 整列在 NumPy 中一次转换, 有无法转换的值时才逐个转换
+- 均值用 math.fsum 求出总和及其余项后再相除, 与 statistics.mean 的结果相同;
+  中位数用 NumPy 的选择算法 (np.partition) 求得, 不对整列排序, 与 statistics.median 的结果相同
+"""
+import math
+import statistics
+from fractions import Fraction
+from itertools import chain
+from typing import Optional
+
+import numpy as np
+
+
+# 按整列统计值填充的方式
+FILL_STATISTICS = ('mean', 'median')
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except Exception:
+        return math.nan
+
+
+def to_numeric(values: np.ndarray) -> np.ndarray:
+    """对象数组 → float64 数组, 无法转换为数值的值为 NaN"""
+    try:
+        # 对象数组的类型转换在 C 层逐个调用 float, 语义与 float() 相同
+        return values.astype(np.float64)
+    except Exception:
+        return np.fromiter(map(_to_float, values), dtype=np.float64, count=len(values))
+
+
+def fill_statistic(values: np.ndarray, method: str) -> Optional[float]:
+    """
+    计算填充值
+
+    Args:
+        values: 列中的非空单元格值 (对象数组)
+        method: 'mean' 或 'median'
+
+    Returns:
+        均值或中位数, 没有数值时返回 None
+    """
+    numbers = to_numeric(values)
+    numbers = numbers[np.isfinite(numbers)]
+    if not len(numbers):
+        return None
+
+    if method == 'mean':
+        values = numbers.tolist()
+        try:
+            # fsum 的结果是舍入后的总和, 加上余项后再相除, 只舍入一次
+            total = math.fsum(values)
+            residual = math.fsum(chain(values, (-total,)))
+        except OverflowError:
+            # 总和超出 float 范围
+            return statistics.mean(values)
+        return float((Fraction(total) + Fraction(residual)) / len(values))
+    return float(np.median(numbers))
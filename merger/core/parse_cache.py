@@ -0,0 +1,219 @@
+"""
+解析结果缓存
+按文件内容哈希 + 解析器版本缓存 read_file / iter_file 的结果 (header, rows, metadata),
+同一文件在不同任务、预览、验证、图表之间重复使用时无需再次解析。
+
+缓存文件格式 (每个条目一个文件):
+    [块][块]...[元数据块][8 字节元数据块偏移]
+    每个块为 4 字节长度 + zlib 压缩的 pickle 数据; 数据块按列存储 (每块最多 CHUNK_ROWS 行),
+    元数据块包含表头、元数据与总行数。数据块可以逐块读取, 因此流式读取时内存占用与行数无关。
+
+按文件修改时间实现 LRU: 命中时更新修改时间, 写入后按修改时间从旧到新淘汰, 直到总大小不超过上限。
+"""
+import hashlib
+import os
+import pickle
+import struct
+import sys
+import tempfile
+import zlib
+from itertools import islice
+from pathlib import Path
+
+from . import archive
+
+
+# 解析逻辑 (表头识别、类型转换、图片提取等) 变化时递增, 旧缓存自动失效
+PARSER_VERSION = 4
+
+CHUNK_ROWS = 5000
+COMPRESS_LEVEL = 1
+ENTRY_SUFFIX = '.pcache'
+
+_LENGTH = struct.Struct('<I')
+_OFFSET = struct.Struct('<Q')
+
+
+def _write_block(f, obj):
+    data = zlib.compress(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), COMPRESS_LEVEL)
+    f.write(_LENGTH.pack(len(data)))
+    f.write(data)
+
+
+def _read_block(f):
+    size = _LENGTH.unpack(f.read(_LENGTH.size))[0]
+    return pickle.loads(zlib.decompress(f.read(size)))
+
+
+def _to_columns(rows):
+    """行块 -> (列列表, 行长度); 行长度全部相同时只记录一个整数"""
+    lengths = [len(row) for row in rows]
+    width = max(lengths) if lengths else 0
+    columns = [[row[i] if i < len(row) else None for row in rows] for i in range(width)]
+    if lengths and lengths.count(width) == len(lengths):
+        lengths = width
+    return columns, lengths
+
+
+def _from_columns(columns, lengths, count):
+    if isinstance(lengths, int):
+        return [list(values) for values in zip(*columns)] if lengths else [[] for _ in range(count)]
+    return [[columns[i][r] for i in range(length)] for r, length in enumerate(lengths)]
+
+
+class ParseCache:
+    """磁盘解析结果缓存"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._keys = {}  # (路径, 大小, 修改时间) -> 内容哈希, 避免同一进程重复计算哈希
+
+    def key_for(self, path, file_format):
+        """计算缓存键: 内容 SHA-256 + 格式 + 解析器版本"""
+        stat = archive.source_stat(path)
+        memo_key = (str(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._keys.get(memo_key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with archive.open_source(path) as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    sha.update(block)
+            digest = sha.hexdigest()
+            self._keys[memo_key] = digest
+        return f"{digest}-{file_format}-v{PARSER_VERSION}"
+
+    def _entry_path(self, key):
+        return self.directory / key[:2] / f"{key}{ENTRY_SUFFIX}"
+
+    def load(self, key):
+        """
+        读取缓存条目
+
+        Returns:
+            (header, rows, metadata) 或 None (未命中/损坏); rows 为逐块解压的惰性迭代器
+        """
+        entry = self._entry_path(key)
+        try:
+            f = open(entry, 'rb')
+        except OSError:
+            return None
+
+        try:
+            f.seek(-_OFFSET.size, os.SEEK_END)
+            f.seek(_OFFSET.unpack(f.read(_OFFSET.size))[0])
+            info = _read_block(f)
+        except Exception as e:
+            f.close()
+            print(f"Warning: Discarding unreadable parse cache entry {entry.name}: {e}", file=sys.stderr)
+            self._remove(entry)
+            return None
+
+        try:
+            os.utime(entry)
+        except OSError:
+            pass
+
+        def generate_rows():
+            with f:
+                f.seek(0)
+                while f.tell() < info['data_end']:
+                    columns, lengths, count = _read_block(f)
+                    yield from _from_columns(columns, lengths, count)
+
+        return info['header'], generate_rows(), info['metadata']
+
+    def store(self, key, header, rows, metadata):
+        """写入完整的行列表"""
+        for _ in self.store_iter(key, header, rows, metadata):
+            pass
+
+    def store_iter(self, key, header, rows, metadata):
+        """
+        边产出行边写入缓存
+
+        行迭代器被完整消费后才提交条目 (临时文件原子替换); 中途放弃或出错时丢弃临时文件
+        """
+        entry = self._entry_path(key)
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=entry.parent, suffix='.tmp')
+        except OSError as e:
+            print(f"Warning: Parse cache unavailable: {e}", file=sys.stderr)
+            yield from rows
+            return
+
+        committed = False
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                total = 0
+                rows = iter(rows)
+                while True:
+                    chunk = list(islice(rows, CHUNK_ROWS))
+                    if not chunk:
+                        break
+                    # 先写入再产出, 调用方之后修改行对象不会影响缓存内容
+                    _write_block(f, _to_columns(chunk) + (len(chunk),))
+                    total += len(chunk)
+                    yield from chunk
+
+                data_end = f.tell()
+                _write_block(f, {
+                    'header': header,
+                    'metadata': metadata,
+                    'rows': total,
+                    'data_end': data_end,
+                })
+                f.write(_OFFSET.pack(data_end))
+
+            os.replace(tmp_name, entry)
+            committed = True
+        finally:
+            if not committed:
+                self._remove(Path(tmp_name))
+
+        self.evict()
+
+    def evict(self):
+        """按最近使用时间淘汰条目, 直到总大小不超过 max_bytes"""
+        entries = []
+        total = 0
+        for entry in self.directory.glob(f'*/*{ENTRY_SUFFIX}'):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(entry)
+            total -= size
+
+    def clear(self):
+        for entry in self.directory.glob(f'*/*{ENTRY_SUFFIX}'):
+            self._remove(entry)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_cache = None
+
+
+def configure(directory, max_bytes):
+    """启用全局解析缓存; directory 为空时关闭"""
+    global _cache
+    _cache = ParseCache(directory, max_bytes) if directory else None
+    return _cache
+
+
+def get_cache():
+    return _cache
@@ -0,0 +1,250 @@
+"""
+流式合并管道
+读取 → 清洗 → 验证 → 列规则 → 单元格操作 → 列过滤 → 写出, 各阶段按行块流动,
+峰值内存取决于块大小而不是总行数; 读取后的各处理阶段由 RulePlan 对每块融合执行
+"""
+import time
+from itertools import islice
+from typing import List, Dict, Any, Iterator, Optional
+
+from .data_processor import DataProcessor
+from .dedup import DEFAULT_MEMORY_LIMIT
+from .progress import ProgressTracker
+from .rule_plan import RulePlan, NON_STREAMING_FILL_METHODS
+
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def can_stream(cleaning_rules: List[Dict]) -> bool:
+    """判断清洗规则是否都能按块流式执行"""
+    for rule in cleaning_rules or []:
+        if rule.get('action') == 'fill_null':
+            method = rule.get('parameters', {}).get('method', 'forward')
+            if method in NON_STREAMING_FILL_METHODS:
+                return False
+    return True
+
+
+def projection_columns(header: List[str], cleaning_rules: List[Dict] = None,
+                       validation_rules: List[Dict] = None, column_rule: Optional[Dict] = None,
+                       operations: List[Dict] = None, filter_mode: str = 'none',
+                       filter_columns: List[str] = None) -> Optional[List[str]]:
+    """
+    计算需要读取的列: 列过滤后保留的列 + 清洗/验证/列规则/单元格操作引用的列
+
+    Returns:
+        按 header 顺序排列的列名; 不需要投影 (没有列过滤、所有列都需要,
+        或有作用于整行的清洗规则) 时返回 None
+    """
+    if filter_mode not in ('keep', 'remove') or not filter_columns:
+        return None
+
+    referenced = set()
+    for rule in cleaning_rules or []:
+        if not rule.get('columns'):
+            # 未指定列的规则 (例如整行去重) 依赖所有列
+            return None
+        referenced.update(rule['columns'])
+    referenced.update(rule.get('column') for rule in validation_rules or [])
+    if column_rule:
+        referenced.add(column_rule.get('source_column'))
+    referenced.update(op.get('column') for op in operations or [])
+
+    kept, _ = DataProcessor.filter_columns(header, [], filter_mode, filter_columns)
+    referenced.update(kept)
+    columns = [col for col in header if col in referenced]
+    return columns if len(columns) < len(header) else None
+
+
+def iter_chunks(rows, chunk_size: int) -> Iterator[List[Any]]:
+    """把行迭代器切分为固定大小的块"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class StreamingMergePipeline:
+    """
+    流式合并管道
+
+    合并表头来自对各文件表头的预扫描, 之后逐文件、逐块地读取数据并依次经过
+    各处理阶段, 由写出器边消费边落盘。
+    """
+
+    def __init__(self, file_paths: List[str], cleaning_rules: List[Dict] = None,
+                 validation_rules: List[Dict] = None, column_rule: Optional[Dict] = None,
+                 operations: List[Dict] = None, filter_mode: str = 'none',
+                 filter_columns: List[str] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress: Optional[ProgressTracker] = None, cleaning_backend: str = 'python',
+                 dedup_memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        self.file_paths = list(file_paths)
+        self.cleaning_rules = cleaning_rules or []
+        self.validation_rules = validation_rules or []
+        self.column_rule = column_rule
+        self.operations = operations or []
+        self.filter_mode = filter_mode
+        self.filter_columns = filter_columns or []
+        self.chunk_size = chunk_size
+        self.progress = progress or ProgressTracker()
+        self.cleaning_backend = cleaning_backend
+        self.dedup_memory_limit = dedup_memory_limit
+
+        self.columns = None
+        self.images = []
+        # 各文件第一行数据在所有数据行中的位置
+        self.file_starts = []
+        self.rows_read = 0
+        self.rows_written = 0
+
+    def scan_header(self) -> List[str]:
+        """表头预扫描: 只读取各文件的表头识别窗口, 不解析数据行"""
+        with self.progress.stage('scan'):
+            scan = DataProcessor.scan_headers(self.file_paths)
+        
+        estimates = [f['estimated_rows'] for f in scan['files']]
+        if estimates and None not in estimates:
+            self.progress.set_total_rows(sum(estimates))
+        return scan['columns']
+
+    def _iter_merged_rows(self, combined_header: List[str]) -> Iterator[List[Any]]:
+        """逐文件读取并映射到合并表头, 同时记录图片位置"""
+        column_index = {col: idx for idx, col in enumerate(combined_header)}
+        width = len(combined_header)
+        current_row = 1
+
+        for file_index, path in enumerate(self.file_paths):
+            self.progress.start_file(file_index)
+            self.file_starts.append(self.rows_read)
+            header, rows, metadata = DataProcessor.iter_file(path, self.columns)
+            missing = [col for col in header if col and col not in column_index]
+            if missing:
+                # 表头预扫描与实际读取得到的列不一致, 丢弃这些列会静默丢失数据
+                raise ValueError(f"文件 {path} 的列 {missing} 不在预扫描的表头中")
+            index_map = [column_index.get(col) if col else None for col in header]
+            pairs = [(i, j) for i, j in enumerate(index_map) if j is not None]
+
+            # 图片所在单元格: 数据行号 -> 合并表头中的列
+            image_cells = {}
+            pending_images = []
+            if metadata.get('format') in ['xlsx', 'xls'] and metadata.get('images'):
+                header_row_idx = metadata.get('header_row_idx', 0)
+                for img_info in metadata['images']:
+                    anchor_info = img_info['anchor_info']
+                    img_col = anchor_info['col']
+                    if img_col is None or img_col >= len(index_map) or index_map[img_col] is None:
+                        continue
+                    data_row_idx = anchor_info['row'] - header_row_idx - 1
+                    if data_row_idx < 0:
+                        continue
+                    image_cells.setdefault(data_row_idx, []).append(index_map[img_col])
+                    pending_images.append((data_row_idx, index_map[img_col], anchor_info, img_info))
+
+            count = 0
+            for row in rows:
+                mapped = [None] * width
+                n = len(row)
+                for i, j in pairs:
+                    if i < n:
+                        mapped[j] = row[i]
+                for col_idx in image_cells.get(count, ()):
+                    mapped[col_idx] = None
+                count += 1
+                self.rows_read += 1
+                yield mapped
+
+            for data_row_idx, col_idx, anchor_info, img_info in pending_images:
+                if data_row_idx >= count:
+                    continue
+                self.images.append({
+                    'merged_row': current_row + data_row_idx + 1,
+                    'col_index': col_idx,
+                    'width': anchor_info['width'],
+                    'height': anchor_info['height'],
+                    'image_data': img_info['image_data'],
+                })
+
+            current_row += count
+
+    def _chunk_sources(self, start: int, end: int) -> List[tuple]:
+        """第 start ~ end-1 行 (所有数据行中的位置) 的来源文件: [(文件序号, 行数)]"""
+        sources = []
+        bounds = self.file_starts[1:] + [end]
+        for file_index, (file_start, file_end) in enumerate(zip(self.file_starts, bounds)):
+            count = min(end, file_end) - max(start, file_start)
+            if count > 0:
+                sources.append((file_index, count))
+        return sources
+
+    def run(self, output_path, output_format: str = 'xlsx') -> Dict[str, Any]:
+        """
+        执行管道并写出结果
+
+        Returns:
+            dict: header (最终表头), rows_read, rows_written,
+                  duplicates (各文件删除的重复行数, 文件序号 -> 行数),
+                  validation (有验证规则时为验证结果, 否则为 None)
+        """
+        combined_header = self.scan_header()
+        if not combined_header:
+            raise ValueError('没有可处理的列')
+
+        # 列式格式的文件只解码后续阶段需要的列
+        self.columns = projection_columns(
+            combined_header, self.cleaning_rules, self.validation_rules, self.column_rule,
+            self.operations, self.filter_mode, self.filter_columns
+        )
+
+        plan = RulePlan(
+            combined_header, self.cleaning_rules, self.validation_rules, self.column_rule,
+            self.operations, self.filter_mode, self.filter_columns,
+            cleaning_backend=self.cleaning_backend,
+            dedup_memory_limit=self.dedup_memory_limit,
+        )
+
+        progress = self.progress
+        # 管道内部 (读取与各处理阶段) 的累计耗时, 其余时间属于写出器
+        pipeline_elapsed = [0.0]
+
+        def process_chunks():
+            chunks = iter_chunks(self._iter_merged_rows(combined_header), self.chunk_size)
+            while True:
+                resumed = time.perf_counter()
+                progress.set_stage('read')
+                chunk = next(chunks, None)
+                if chunk is None:
+                    pipeline_elapsed[0] += time.perf_counter() - resumed
+                    return
+                progress.add('read', time.perf_counter() - resumed, len(chunk))
+
+                # 清洗 → 验证 (行号按全局位置计算) → 列规则 → 单元格操作 → 列过滤
+                sources = self._chunk_sources(self.rows_read - len(chunk), self.rows_read)
+                chunk = plan.run(chunk, progress, sources)
+
+                self.rows_written += len(chunk)
+                progress.add('write', 0.0, len(chunk))
+                progress.set_stage('write')
+                pipeline_elapsed[0] += time.perf_counter() - resumed
+                yield from chunk
+
+        metadata = {
+            'images': self.images,
+            'output_format': output_format,
+        }
+        write_started = time.perf_counter()
+        try:
+            DataProcessor.write_file(plan.header, process_chunks(), output_path, metadata, output_format)
+        finally:
+            plan.close()
+        progress.add('write', time.perf_counter() - write_started - pipeline_elapsed[0])
+
+        return {
+            'header': plan.header,
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'duplicates': plan.duplicates,
+            'validation': plan.validation_result(),
+        }
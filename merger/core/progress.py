@@ -0,0 +1,161 @@
+"""
+合并任务进度跟踪
+记录当前阶段、当前文件、读写行数、各文件删除的重复行数以及各阶段累计耗时与吞吐量,
+并按固定间隔把快照交给回调 (例如写入数据库), 避免每个数据块都触发一次写入
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+# 阶段按执行顺序排列
+STAGES = ['scan', 'read', 'clean', 'validate', 'transform', 'write']
+
+DEFAULT_REPORT_INTERVAL = 1.0
+
+
+class ProgressTracker:
+    """
+    进度跟踪器
+
+    各阶段耗时按累计方式统计: 流式管道中各阶段交替执行, 每个阶段的耗时
+    为其所有数据块耗时之和, 吞吐量 = 该阶段处理行数 / 累计耗时
+    """
+
+    def __init__(self, file_names: Optional[List[str]] = None,
+                 callback: Optional[Callable[[Dict], None]] = None,
+                 interval: float = DEFAULT_REPORT_INTERVAL):
+        self.file_names = list(file_names or [])
+        self.callback = callback
+        self.interval = interval
+
+        self.stage_name = None
+        self.file_index = None
+        self.total_rows = None
+        self.rows_read = 0
+        self.rows_written = 0
+        self.stages = {}
+        # 各文件删除的重复行数: 文件序号 -> 行数
+        self.duplicates = {}
+
+        self._started = time.perf_counter()
+        self._last_report = None
+
+    def set_total_rows(self, total_rows):
+        """设置预计总行数 (来自表头预扫描的估计值), 用于计算完成百分比"""
+        self.total_rows = total_rows
+
+    def start_file(self, index):
+        """标记开始读取第 index 个文件"""
+        self.file_index = index
+
+    def set_stage(self, name):
+        self.stage_name = name
+
+    def set_duplicates(self, duplicates):
+        """更新各文件删除的重复行数 (文件序号 -> 累计行数)"""
+        self.duplicates = dict(duplicates)
+
+    def add(self, name, elapsed, rows=0):
+        """累计某阶段的耗时与处理行数"""
+        stage = self.stages.setdefault(name, {'elapsed': 0.0, 'rows': 0})
+        stage['elapsed'] += elapsed
+        stage['rows'] += rows
+        if name == 'read':
+            self.rows_read += rows
+        elif name == 'write':
+            self.rows_written += rows
+
+    def iter_files(self, results):
+        """
+        包装按文件产出的读取结果 (header, rows, metadata),
+        把等待每个结果的时间与行数计入 read 阶段
+        """
+        results = iter(results)
+        index = 0
+        while True:
+            self.start_file(index)
+            self.stage_name = 'read'
+            start = time.perf_counter()
+            try:
+                item = next(results)
+            except StopIteration:
+                self.file_index = index - 1 if index else None
+                return
+            self.add('read', time.perf_counter() - start, len(item[1]))
+            self.report()
+            yield item
+            index += 1
+
+    @contextmanager
+    def stage(self, name, rows=0):
+        """计时上下文: with tracker.stage('clean', rows=len(rows)): ..."""
+        self.stage_name = name
+        self.report()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, rows)
+            self.report()
+
+    def snapshot(self) -> Dict:
+        """返回可 JSON 序列化的进度快照"""
+        current_file = None
+        if self.file_index is not None and self.file_index < len(self.file_names):
+            current_file = self.file_names[self.file_index]
+
+        percent = None
+        if self.stage_name == 'done':
+            percent = 100
+        elif self.total_rows:
+            # 行数为估计值, 完成前最多显示 99%
+            percent = min(99, int(self.rows_read * 100 / self.total_rows))
+
+        stages = {}
+        for name in STAGES + sorted(set(self.stages) - set(STAGES)):
+            if name not in self.stages:
+                continue
+            elapsed = self.stages[name]['elapsed']
+            rows = self.stages[name]['rows']
+            stages[name] = {
+                'elapsed': round(elapsed, 3),
+                'rows': rows,
+                'rows_per_sec': round(rows / elapsed) if rows and elapsed > 0 else None,
+            }
+
+        return {
+            'stage': self.stage_name,
+            'current_file': current_file,
+            'file_index': self.file_index,
+            'total_files': len(self.file_names),
+            'rows_read': self.rows_read,
+            'rows_written': self.rows_written,
+            'total_rows': self.total_rows,
+            'duplicates_removed': [
+                {
+                    'file': self.file_names[index] if index < len(self.file_names) else None,
+                    'rows': rows,
+                }
+                for index, rows in sorted(self.duplicates.items())
+            ],
+            'percent': percent,
+            'elapsed': round(time.perf_counter() - self._started, 3),
+            'stages': stages,
+        }
+
+    def report(self, force=False):
+        """距上次回调超过 interval 秒 (或 force) 时把快照交给回调"""
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if not force and self._last_report is not None and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        self.callback(self.snapshot())
+
+    def finish(self) -> Dict:
+        """标记完成并立即回调, 返回最终快照"""
+        self.stage_name = 'done'
+        self.report(force=True)
+        return self.snapshot()
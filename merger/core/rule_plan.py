@@ -0,0 +1,451 @@
+"""
+规则执行计划
+把任务的清洗规则、验证规则、列规则、单元格操作和列过滤编译为一个逐行处理的函数,
+每行数据只经过一次所有阶段, 而不是每条规则各遍历一遍全部数据:
+
+- 列位置在编译时解析并写成常量; 列不存在、未知操作等不起作用的规则在编译时丢弃
+- 同一列上连续的单元格变换合并为一条变换链, 每个单元格只读写一次;
+  简单变换 (去空格、大小写、类型转换、填充) 直接内联, 不产生函数调用
+- 需要整列数据的填充方式 (向后/均值/中位数) 是屏障: 屏障之前的阶段先处理完
+  所有行, 再执行该填充, 然后继续后面的阶段; 日期标准化同样按整块执行,
+  以便按列批量解析
+- 删除重复行按整块执行 (RowDeduplicator 批量计算摘要), 是唯一会删除行的阶段,
+  据此按来源文件统计删除的重复行数
+- 验证规则单独生成一个逐行处理函数, 进度中的 validate 阶段只包含验证耗时
+
+生成的代码中只有列位置 (整数) 和内部变量名, 规则参数 (填充值、单元格操作的文本等)
+通过命名空间传入, 不会拼接进源码。执行结果与依次调用 DataCleaner、DataValidator
+和 DataProcessor 的各个步骤一致
+"""
+import sys
+from itertools import compress, count
+from typing import List, Dict, Any, Optional, Callable, Tuple
+
+import numpy as np
+
+from .data_analyzer import DataCleaner, DataValidator
+from .data_processor import DataProcessor
+from .dedup import DEFAULT_MEMORY_LIMIT, RowDeduplicator, dedup_keys
+from .vectorized_cleaner import cleaner_for
+
+
+# 这些填充方式需要先看到整列数据, 无法逐行 (或按块流式) 执行
+NON_STREAMING_FILL_METHODS = {'backward', 'mean', 'median'}
+
+# 内联的单元格变换, 作用于局部变量 v
+_STRING_METHODS = {'trim_spaces': 'strip', 'uppercase': 'upper', 'lowercase': 'lower'}
+_CONVERSIONS = {
+    'integer': 'int(float(str(v)))',
+    'float': 'float(v)',
+    'string': 'str(v)',
+}
+
+
+class RulePlan:
+    """
+    编译后的规则执行计划
+
+    计划对象保存跨批次的状态 (去重的已见键摘要、向前填充的上一个值、按列学习的日期布局、
+    唯一性验证的已见值、验证行号), 流式管道对每个数据块调用一次 run, 这些状态在块之间延续。
+    去重状态超过内存上限后会溢写到临时文件, 用完后调用 close 删除。
+
+    清洗后端为 'vectorized' 时, 删除重复行以外的连续清洗规则作为一个整体交给列式清洗器
+    按块执行, 列规则、单元格操作和列过滤仍然逐行融合执行。
+
+    验证规则单独生成一个逐行处理函数 (计入 validate 阶段), 以便在进度中与其他阶段分开统计耗时。
+    """
+
+    def __init__(self, header: List[str], cleaning_rules: List[Dict] = None,
+                 validation_rules: List[Dict] = None, column_rule: Optional[Dict] = None,
+                 operations: List[Dict] = None, filter_mode: str = 'none',
+                 filter_columns: List[str] = None, cleaning_backend: str = 'python',
+                 dedup_memory_limit: int = DEFAULT_MEMORY_LIMIT):
+        self.input_header = list(header)
+        self.validation_rules = validation_rules or []
+        self.dedup_memory_limit = dedup_memory_limit
+        self.warnings = []
+        self.rows_validated = 0
+        # 各来源文件被删除的重复行数: 文件序号 -> 行数 (run 未提供来源时不统计)
+        self.duplicates = {}
+        # 各段逐行处理函数的生成代码, 便于排查
+        self.sources = []
+
+        # 每条验证规则的错误单独收集, 汇总时按规则顺序拼接 (与 validate_data 一致)
+        self._rule_errors = []
+        # (进度阶段名, 函数 rows -> rows)
+        self._segments = []
+        # 当前逐行处理段的代码块, 以及生成代码引用的对象
+        self._blocks = []
+        self._namespace = {}
+        # 待合并的单元格变换: (列位置, 作用于 v 的代码行, 是否补齐行)
+        self._cells = []
+        self._keep_indices = None
+        self._deduplicators = []
+        # 当前批次每行的来源文件序号 (run 期间有效)
+        self._sources = None
+
+        cleaning_rules = sorted(cleaning_rules or [], key=lambda x: x.get('order', 0))
+        cleaner = cleaner_for(cleaning_backend)
+        if cleaner is DataCleaner:
+            self._compile_cleaning(cleaning_rules)
+        else:
+            pending = []
+            for rule in cleaning_rules + [None]:
+                if rule is not None and rule.get('action') != 'remove_duplicates':
+                    pending.append(rule)
+                    continue
+                if pending:
+                    self._add_segment('clean', self._columnar_cleaning(cleaner, pending))
+                    pending = []
+                if rule is not None:
+                    self._add_segment('clean', self._dedup_segment(self._dedup_columns(rule)))
+
+        self._compile_validation(self.validation_rules)
+        output_header = self._compile_column_rule(column_rule)
+        self._compile_operations(output_header, operations or [])
+        self.header = self._compile_filter(output_header, filter_mode, filter_columns)
+        self._close_row_pass()
+
+    def run(self, rows: List[List[Any]], progress=None,
+            sources: Optional[List[Tuple[int, int]]] = None) -> List[List[Any]]:
+        """
+        对一批数据行执行计划
+
+        Args:
+            rows: 数据行 (会被原地修改)
+            progress: ProgressTracker (可选), 逐行融合的部分计入 transform 阶段,
+                      验证计入 validate 阶段,
+                      屏障填充、日期标准化、去重与列式清洗计入 clean 阶段;
+                      各文件删除的重复行数同步到 progress
+            sources: 行的来源文件 (可选), 按顺序排列的 (文件序号, 行数),
+                     用于按文件统计删除的重复行数
+
+        Returns:
+            处理后的数据行, 对应 self.header
+        """
+        if sources is not None and self._deduplicators:
+            indices, counts = zip(*sources) if sources else ((), ())
+            self._sources = np.repeat(np.array(indices, dtype=np.intp), counts)
+        try:
+            for name, segment in self._segments:
+                if progress is None:
+                    rows = segment(rows)
+                else:
+                    with progress.stage(name, len(rows)):
+                        rows = segment(rows)
+        finally:
+            self._sources = None
+        if progress is not None and self.duplicates:
+            progress.set_duplicates(self.duplicates)
+        self.rows_validated += len(rows)
+        return rows
+
+    def close(self):
+        """释放去重状态 (删除溢写的临时文件)"""
+        for dedup in self._deduplicators:
+            dedup.close()
+
+    def validation_result(self) -> Optional[Dict[str, Any]]:
+        """已处理数据的验证结果, 没有验证规则时返回 None"""
+        if not self.validation_rules:
+            return None
+        errors = [error for rule_errors in self._rule_errors for error in rule_errors]
+        return DataValidator.build_result(errors, self.warnings, self.rows_validated)
+
+    def _bind(self, value, prefix: str = 'p') -> str:
+        """把对象放入生成代码的命名空间, 返回引用它的变量名"""
+        name = f"{prefix}{len(self._namespace)}"
+        self._namespace[name] = value
+        return name
+
+    def _add_cell(self, col_idx: int, lines: List[str], extend: bool = False):
+        self._cells.append((col_idx, lines, extend))
+
+    def _add_block(self, lines: List[str]):
+        self._flush_cells()
+        self._blocks.append(lines)
+
+    def _add_segment(self, name: str, segment: Callable):
+        self._close_row_pass()
+        self._segments.append((name, segment))
+
+    def _flush_cells(self):
+        """把连续的单元格变换合并为按列的变换链"""
+        cells, self._cells = self._cells, []
+        chains = []
+        if not any(extend for _, _, extend in cells):
+            # 各变换只读写自己的单元格且不改变行长度, 不同列之间的先后顺序无关,
+            # 同一列的变换按原顺序合并为一条链
+            by_column = {}
+            for col_idx, lines, _ in cells:
+                by_column.setdefault(col_idx, []).extend(lines)
+            chains = [(col_idx, lines, False) for col_idx, lines in by_column.items()]
+        else:
+            # 补齐行会改变其他列是否存在, 只合并相邻的同列变换
+            for col_idx, lines, extend in cells:
+                if chains and chains[-1][0] == col_idx and not extend:
+                    chains[-1][1].extend(lines)
+                else:
+                    chains.append((col_idx, list(lines), extend))
+
+        for col_idx, lines, extend in chains:
+            if extend:
+                # 与空值填充一致: 先把过短的行补齐到该列
+                self._blocks.append(self._extend_lines(col_idx + 1) + [
+                    f"v = row[{col_idx}]",
+                    *lines,
+                    f"row[{col_idx}] = v",
+                ])
+            else:
+                # 行中不存在该列时跳过
+                self._blocks.append([
+                    f"if {col_idx} < n:",
+                    f"    v = row[{col_idx}]",
+                    *('    ' + line for line in lines),
+                    f"    row[{col_idx}] = v",
+                ])
+
+    @staticmethod
+    def _extend_lines(width: int) -> List[str]:
+        return [
+            f"if n < {width}:",
+            f"    row.extend([None] * ({width} - n))",
+            f"    n = {width}",
+        ]
+
+    def _close_row_pass(self, name: str = 'transform'):
+        """把当前的代码块生成为一个逐行处理函数, name 为其进度阶段名"""
+        self._flush_cells()
+        blocks, self._blocks = self._blocks, []
+        if not blocks and self._keep_indices is None:
+            return
+
+        if self._keep_indices is None:
+            result = 'row'
+        elif not self._keep_indices:
+            result = '[]'
+        else:
+            # 列过滤: 缺失的列补 None
+            full = ', '.join(f"row[{i}]" for i in self._keep_indices)
+            padded = ', '.join(f"row[{i}] if {i} < n else None" for i in self._keep_indices)
+            result = f"[{full}] if n > {max(self._keep_indices)} else [{padded}]"
+
+        lines = [
+            'def run(rows):',
+            '    out = []',
+            '    append = out.append',
+            '    for row in rows:',
+            '        n = len(row)',
+        ]
+        for block in blocks:
+            lines.extend('        ' + line for line in block)
+        lines.append(f"        append({result})")
+        lines.append('    return out')
+        source = '\n'.join(lines) + '\n'
+
+        namespace = dict(self._namespace)
+        exec(compile(source, '<rule_plan>', 'exec'), namespace)
+        self.sources.append(source)
+        self._segments.append((name, namespace['run']))
+
+    def _columnar_cleaning(self, cleaner, cleaning_rules: List[Dict]) -> Callable:
+        state = {}
+        header = self.input_header
+
+        def segment(rows):
+            return cleaner.apply_cleaning_rules(header, rows, cleaning_rules, state=state)[1]
+        return segment
+
+    def _dedup_columns(self, rule: Dict) -> Optional[List[int]]:
+        """去重比较的列位置, None 表示整行比较"""
+        columns = rule.get('columns') or []
+        if not columns:
+            return None
+        return [self.input_header.index(col) for col in columns if col in self.input_header]
+
+    def _dedup_segment(self, col_indices: Optional[List[int]]) -> Callable:
+        dedup = RowDeduplicator(self.dedup_memory_limit)
+        self._deduplicators.append(dedup)
+
+        def segment(rows):
+            keep = dedup.keep_mask(dedup_keys(rows, col_indices), len(rows))
+            if keep.all():
+                return rows
+            if self._sources is not None:
+                removed = np.bincount(self._sources[~keep])
+                for file_index in np.flatnonzero(removed).tolist():
+                    self.duplicates[file_index] = self.duplicates.get(file_index, 0) + int(removed[file_index])
+                self._sources = self._sources[keep]
+            return list(compress(rows, keep))
+        return segment
+
+    def _rule_segment(self, rule: Dict) -> Callable:
+        """单条清洗规则按整块执行 (屏障填充、日期标准化), 状态在批次之间延续"""
+        state = {}
+        header = self.input_header
+
+        def segment(rows):
+            return DataCleaner.apply_cleaning_rules(header, rows, [rule], state=state)[1]
+        return segment
+
+    def _compile_cleaning(self, cleaning_rules: List[Dict]):
+        """清洗规则 → 逐行代码 (语义与 DataCleaner 的对应方法一致)"""
+        header = self.input_header
+
+        for rule in cleaning_rules:
+            action = rule.get('action')
+            params = rule.get('parameters', {})
+            columns = rule.get('columns') or []
+            col_indices = [header.index(col) for col in columns if col in header]
+
+            if action == 'remove_duplicates':
+                self._add_segment('clean', self._dedup_segment(self._dedup_columns(rule)))
+
+            elif action == 'fill_null':
+                method = params.get('method', 'forward')
+                if method in NON_STREAMING_FILL_METHODS:
+                    if col_indices:
+                        self._add_segment('clean', self._rule_segment(rule))
+                    continue
+                # 同一列重复出现时只填充一次 (与 DataCleaner 一致)
+                for col_idx in dict.fromkeys(col_indices):
+                    if method == 'forward':
+                        last_value = self._bind([None], 'last')
+                        self._add_cell(col_idx, [
+                            "if v is None or v == '':",
+                            f"    v = {last_value}[0]",
+                            "else:",
+                            f"    {last_value}[0] = v",
+                        ], extend=True)
+                    elif method == 'value':
+                        fill_value = self._bind(params.get('value', ''))
+                        self._add_cell(col_idx, [
+                            "if v is None or v == '':",
+                            f"    v = {fill_value}",
+                        ], extend=True)
+
+            elif action == 'convert_type':
+                conversion = _CONVERSIONS.get(params.get('type', 'string'))
+                if conversion is not None:
+                    for col_idx in col_indices:
+                        self._add_cell(col_idx, [
+                            "try:",
+                            f"    v = {conversion}",
+                            "except:",
+                            "    pass",
+                        ])
+
+            elif action in _STRING_METHODS:
+                for col_idx in col_indices:
+                    self._add_cell(col_idx, [
+                        "if isinstance(v, str):",
+                        f"    v = v.{_STRING_METHODS[action]}()",
+                    ])
+
+            elif action == 'standardize_date':
+                # 日期按列批量解析 (见 DateParser), 比逐个单元格解析快得多
+                if col_indices:
+                    self._add_segment('clean', self._rule_segment(rule))
+
+    def _compile_validation(self, validation_rules: List[Dict]):
+        header = self.input_header
+        checks = []
+        for rule in validation_rules:
+            column = rule.get('column')
+            if column not in header:
+                self.warnings.append({
+                    'column': column,
+                    'message': f"列 '{column}' 不存在"
+                })
+                continue
+
+            errors = []
+            self._rule_errors.append(errors)
+            check = DataValidator.cell_checker(rule.get('rule_type'), column, header.index(column), rule)
+            if check is not None:
+                checks.append(f"{self._bind(check, 'check')}(row, row_number, {self._bind(errors, 'errors')})")
+
+        if checks:
+            # 行号为通过清洗的行中的位置, 跨批次连续编号
+            row_numbers = self._bind(count(1), 'row_numbers')
+            self._close_row_pass()
+            self._add_block([f"row_number = next({row_numbers})", *checks])
+            self._close_row_pass('validate')
+
+    def _compile_column_rule(self, column_rule: Optional[Dict]) -> List[str]:
+        """列规则 → 派生列, 返回加上派生列后的表头"""
+        output_header = list(self.input_header)
+        if not column_rule:
+            return output_header
+
+        source_col = column_rule.get('source_column')
+        if source_col not in output_header:
+            print(f"Warning: Source column '{source_col}' not found", file=sys.stderr)
+            return output_header
+
+        source_idx = output_header.index(source_col)
+        output_header.append(column_rule.get('new_column'))
+        new_idx = len(output_header) - 1
+        derive = self._bind(DataProcessor.derived_value(column_rule), 'derive')
+        self._add_block(self._extend_lines(new_idx + 1) + [
+            f"row[{new_idx}] = {derive}(row[{source_idx}] if {source_idx} < n else None)",
+        ])
+        return output_header
+
+    def _compile_operations(self, output_header: List[str], operations: List[Dict]):
+        for op in operations:
+            col_name = op.get('column')
+            if col_name not in output_header:
+                print(f"Warning: Column '{col_name}' not found", file=sys.stderr)
+                continue
+            lines = self._inline_operation(op)
+            if lines is None:
+                func = DataProcessor.cell_operation(op)
+                if func is None:
+                    continue
+                lines = [f"v = {self._bind(func, 'f')}(v)"]
+            self._add_cell(output_header.index(col_name), lines)
+
+    def _inline_operation(self, op: Dict) -> Optional[List[str]]:
+        """常用的文本单元格操作内联为代码 (语义与 DataProcessor.cell_operation 一致), 其余返回 None"""
+        action = op.get('action')
+        value = op.get('value')
+        if action in ('add_prefix', 'add_suffix', 'remove_prefix', 'remove_suffix') and not isinstance(value, str):
+            return None
+
+        if action == 'add_prefix':
+            return ["if v is not None:", f"    v = {self._bind(value)} + str(v)"]
+        elif action == 'add_suffix':
+            return ["if v is not None:", f"    v = str(v) + {self._bind(value)}"]
+        elif action == 'remove_prefix':
+            return [
+                "if v is not None:",
+                "    s = str(v)",
+                f"    if s.startswith({self._bind(value)}):",
+                f"        v = s[{len(value)}:]",
+            ]
+        elif action == 'remove_suffix':
+            return [
+                "if v is not None:",
+                "    s = str(v)",
+                f"    if s.endswith({self._bind(value)}):",
+                f"        v = s[:{-len(value)}]",
+            ]
+        elif action == 'replace':
+            old_value = op.get('old_value', '')
+            new_value = op.get('new_value', '')
+            if not isinstance(old_value, str) or not isinstance(new_value, str):
+                return None
+            return ["if v is not None:", f"    v = str(v).replace({self._bind(old_value)}, {self._bind(new_value)})"]
+        return None
+
+    def _compile_filter(self, output_header: List[str], filter_mode: str,
+                        filter_columns: List[str]) -> List[str]:
+        if filter_mode not in ('keep', 'remove') or not filter_columns:
+            return output_header
+
+        if filter_mode == 'keep':
+            self._keep_indices = [i for i, col in enumerate(output_header) if col in filter_columns]
+        else:
+            self._keep_indices = [i for i, col in enumerate(output_header) if col not in filter_columns]
+        return [output_header[i] for i in self._keep_indices]
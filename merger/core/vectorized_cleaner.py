@@ -0,0 +1,318 @@
+"""
+向量化清洗后端
+与 DataCleaner 执行同一套清洗规则, 结果完全一致 (值、类型、行长度均相同)。
+
+规则涉及的列只从行中取出一次, 转为 NumPy 对象数组后按列批量处理:
+空值判断使用数组比较生成掩码, 向前/向后填充使用累积索引, 字符串处理使用 C 层的 map;
+全部规则执行完后只把发生变化的单元格写回原来的行。
+"""
+from collections import deque
+from itertools import compress, repeat
+from operator import is_not, itemgetter, setitem
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+from .data_analyzer import DataCleaner
+from .date_parsing import DateParser
+from .dedup import RowDeduplicator, dedup_keys
+from .numeric_stats import FILL_STATISTICS, fill_statistic
+
+
+CLEANING_BACKENDS = ['python', 'vectorized']
+
+
+def cleaner_for(backend):
+    """按配置 (CLEANING_BACKEND) 返回清洗实现, 两者的 apply_cleaning_rules 签名相同"""
+    if backend == 'python':
+        return DataCleaner
+    if backend == 'vectorized':
+        return VectorizedCleaner
+    raise ValueError(f"Unknown cleaning backend: {backend}. Expected one of {CLEANING_BACKENDS}")
+
+
+def _object_array(values, count):
+    return np.fromiter(values, dtype=object, count=count)
+
+
+def _bool_array(values, count):
+    return np.fromiter(values, dtype=bool, count=count)
+
+
+class _Columns:
+    """
+    数据行的列式视图
+
+    只为规则涉及的列建立对象数组 (行长度不足的位置为 None);
+    记录每行的目标长度 (填充空值会补齐短行) 与每列被修改的位置, flush 时写回行
+    """
+
+    def __init__(self, headers: List[str], rows: List[List[Any]]):
+        self.rows = rows
+        self.index = {}
+        for i, header in enumerate(headers):
+            # 与 headers.index 一致: 重名列取第一个
+            self.index.setdefault(header, i)
+        self.row_lengths = np.fromiter(map(len, rows), dtype=np.intp, count=len(rows))
+        self.lengths = self.row_lengths.copy()
+        self.arrays = {}
+        self.dirty = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, col_idx):
+        arr = self.arrays.get(col_idx)
+        if arr is None:
+            n = len(self.rows)
+            if n and self.row_lengths.min() > col_idx:
+                arr = _object_array(map(itemgetter(col_idx), self.rows), n)
+            else:
+                arr = _object_array((row[col_idx] if col_idx < len(row) else None for row in self.rows), n)
+            self.arrays[col_idx] = arr
+        return arr
+
+    def present(self, col_idx):
+        """行长度覆盖该列的位置"""
+        return self.lengths > col_idx
+
+    def set(self, col_idx, positions, values):
+        """按布尔掩码或位置数组写入新值"""
+        self.arrays[col_idx][positions] = values
+        dirty = self.dirty.get(col_idx)
+        if dirty is None:
+            dirty = self.dirty[col_idx] = np.zeros(len(self.rows), dtype=bool)
+        dirty[positions] = True
+
+    def extend_to(self, col_idx):
+        """把所有行补齐到包含该列 (与 DataCleaner 填充空值时的行为一致)"""
+        np.maximum(self.lengths, col_idx + 1, out=self.lengths)
+
+    def take(self, keep):
+        """只保留掩码为 True 的行"""
+        self.rows = list(compress(self.rows, keep))
+        self.row_lengths = self.row_lengths[keep]
+        self.lengths = self.lengths[keep]
+        self.arrays = {col_idx: arr[keep] for col_idx, arr in self.arrays.items()}
+        self.dirty = {col_idx: dirty[keep] for col_idx, dirty in self.dirty.items()}
+
+    def flush(self):
+        """补齐短行并写回被修改的单元格"""
+        rows = self.rows
+        for j in np.flatnonzero(self.lengths > self.row_lengths).tolist():
+            row = rows[j]
+            row.extend([None] * (int(self.lengths[j]) - len(row)))
+        self.row_lengths = self.lengths.copy()
+
+        for col_idx, dirty in self.dirty.items():
+            positions = np.flatnonzero(dirty)
+            if len(positions) > len(rows) // 4 and (not len(rows) or self.row_lengths.min() > col_idx):
+                # 修改较多时整列写回 (在 C 层循环中完成)
+                deque(map(setitem, rows, repeat(col_idx), self.arrays[col_idx].tolist()), maxlen=0)
+                continue
+            for j, value in zip(positions.tolist(), self.arrays[col_idx][positions].tolist()):
+                rows[j][col_idx] = value
+        self.dirty = {}
+        return rows
+
+
+class VectorizedCleaner:
+    """按列批量执行的数据清洗"""
+
+    @staticmethod
+    def apply_cleaning_rules(headers: List[str], rows: List[List[Any]],
+                             rules: List[Dict], state: Dict = None) -> Tuple[List[str], List[List[Any]]]:
+        """
+        应用数据清洗规则, 参数与返回值同 DataCleaner.apply_cleaning_rules
+
+        行在原位修改; 删除重复行时返回新的行列表
+        """
+        columns = _Columns(headers, rows)
+
+        for rule_idx, rule in enumerate(sorted(rules, key=lambda x: x.get('order', 0))):
+            action = rule.get('action')
+            rule_state = state.setdefault(rule_idx, {}) if state is not None else None
+
+            if action == 'remove_duplicates':
+                VectorizedCleaner._remove_duplicates(columns, rule, rule_state)
+            elif action == 'fill_null':
+                VectorizedCleaner._fill_null(columns, rule, rule_state)
+            elif action == 'convert_type':
+                VectorizedCleaner._convert_type(columns, rule)
+            elif action == 'trim_spaces':
+                VectorizedCleaner._map_strings(columns, rule, str.strip)
+            elif action == 'standardize_date':
+                VectorizedCleaner._standardize_date(columns, rule, rule_state)
+            elif action == 'uppercase':
+                VectorizedCleaner._map_strings(columns, rule, str.upper)
+            elif action == 'lowercase':
+                VectorizedCleaner._map_strings(columns, rule, str.lower)
+
+        return headers, columns.flush()
+
+    @staticmethod
+    def _col_indices(columns: _Columns, rule: Dict):
+        return [columns.index[col] for col in rule.get('columns', []) if col in columns.index]
+
+    @staticmethod
+    def _missing(arr):
+        """None 或空字符串"""
+        return (arr == None) | (arr == '')  # noqa: E711 - 逐元素比较
+
+    @staticmethod
+    def _remove_duplicates(columns: _Columns, rule: Dict, state: Dict = None):
+        """删除重复行; 去重状态与 DataCleaner 相同 (RowDeduplicator), 可跨批次延续"""
+        dedup = state.get('dedup') if state is not None else None
+        if dedup is None:
+            dedup = RowDeduplicator()
+            if state is not None:
+                state['dedup'] = dedup
+
+        if not rule.get('columns', []):
+            # 整行比较需要最新的行内容
+            keys = dedup_keys(columns.flush())
+        else:
+            col_indices = VectorizedCleaner._col_indices(columns, rule)
+            if col_indices:
+                keys = map(list, zip(*[columns.get(col_idx) for col_idx in col_indices]))
+            else:
+                keys = repeat([], len(columns))
+
+        keep = dedup.keep_mask(keys, len(columns))
+        if state is None:
+            dedup.close()
+        if not keep.all():
+            columns.take(keep)
+
+    @staticmethod
+    def _fill_null(columns: _Columns, rule: Dict, state: Dict = None):
+        """填充空值"""
+        method = rule.get('parameters', {}).get('method', 'forward')
+        fill_value = rule.get('parameters', {}).get('value', '')
+        n = len(columns)
+
+        # 同一列重复出现时只填充一次 (与 DataCleaner 一致)
+        for col in dict.fromkeys(rule.get('columns', [])):
+            if col not in columns.index:
+                continue
+            col_idx = columns.index[col]
+            arr = columns.get(col_idx)
+            missing = VectorizedCleaner._missing(arr)
+
+            if method == 'forward':
+                last_value = state.get(col) if state is not None else None
+                # 每个位置取其之前 (含自身) 最近的非空位置
+                source = np.where(missing, -1, np.arange(n))
+                np.maximum.accumulate(source, out=source)
+                filled = arr[np.maximum(source, 0)]
+                filled[source < 0] = last_value
+                columns.extend_to(col_idx)
+                if missing.any():
+                    columns.set(col_idx, missing, filled[missing])
+                if state is not None:
+                    state[col] = filled[-1] if n else last_value
+
+            elif method == 'backward':
+                # 每个位置取其之后 (含自身) 最近的非空位置
+                source = np.where(missing, n, np.arange(n))
+                source = np.minimum.accumulate(source[::-1])[::-1]
+                filled = arr[np.minimum(source, n - 1)] if n else arr
+                filled[source >= n] = None
+                columns.extend_to(col_idx)
+                if missing.any():
+                    columns.set(col_idx, missing, filled[missing])
+
+            elif method == 'value':
+                columns.extend_to(col_idx)
+                if missing.any():
+                    positions = np.flatnonzero(missing)
+                    columns.set(col_idx, positions, _object_array(repeat(fill_value, len(positions)), len(positions)))
+
+            elif method in FILL_STATISTICS:
+                # 与 DataCleaner 共用数值转换与统计 (见 numeric_stats)
+                fill = fill_statistic(arr[~missing], method)
+                if fill is not None:
+                    columns.extend_to(col_idx)
+                    if missing.any():
+                        columns.set(col_idx, missing, fill)
+
+    @staticmethod
+    def _convert_each(values, convert):
+        """逐个转换, 失败的值保持不变"""
+        result = values.copy()
+        for j, value in enumerate(values):
+            try:
+                result[j] = convert(value)
+            except Exception:
+                pass
+        return result
+
+    @staticmethod
+    def _convert_type(columns: _Columns, rule: Dict):
+        """转换数据类型"""
+        target_type = rule.get('parameters', {}).get('type', 'string')
+
+        for col_idx in VectorizedCleaner._col_indices(columns, rule):
+            arr = columns.get(col_idx)
+            present = columns.present(col_idx)
+            if target_type in ('integer', 'float'):
+                # None 与空字符串无法转换为数值, 直接跳过
+                present &= ~VectorizedCleaner._missing(arr)
+            positions = np.flatnonzero(present)
+            values = arr[positions]
+
+            if target_type == 'integer':
+                to_int = lambda value: int(float(str(value)))  # noqa: E731
+                try:
+                    # 整列一次转换; 有无法转换的值时退回逐个转换
+                    converted = _object_array(map(int, map(float, map(str, values))), len(values))
+                except Exception:
+                    converted = VectorizedCleaner._convert_each(values, to_int)
+            elif target_type == 'float':
+                try:
+                    converted = _object_array(map(float, values), len(values))
+                except Exception:
+                    converted = VectorizedCleaner._convert_each(values, float)
+            elif target_type == 'string':
+                try:
+                    converted = _object_array(map(str, values), len(values))
+                except Exception:
+                    converted = VectorizedCleaner._convert_each(values, str)
+            else:
+                continue
+
+            changed = _bool_array(map(is_not, converted, values), len(values))
+            if changed.any():
+                columns.set(col_idx, positions[changed], converted[changed])
+
+    @staticmethod
+    def _map_strings(columns: _Columns, rule: Dict, func):
+        """对字符串单元格应用 func (去空格/大小写转换), 其他类型保持不变"""
+        for col_idx in VectorizedCleaner._col_indices(columns, rule):
+            arr = columns.get(col_idx)
+            positions = np.flatnonzero(_bool_array(map(isinstance, arr, repeat(str)), len(arr)))
+            values = arr[positions]
+            converted = _object_array(map(func, values), len(values))
+            # 结果与原值都是字符串, 按值比较即可 (未变化时 str 方法返回原对象, 比较很快)
+            changed = converted != values
+            if changed.any():
+                columns.set(col_idx, positions[changed], converted[changed])
+
+    @staticmethod
+    def _standardize_date(columns: _Columns, rule: Dict, state: Dict = None):
+        """标准化日期格式; 每个不同的文本只解析一次, 符合已学到布局的值向量化解析"""
+        target_format = rule.get('parameters', {}).get('format', '%Y-%m-%d')
+        parsers = state.setdefault('parsers', {}) if state is not None else {}
+
+        for col_idx in VectorizedCleaner._col_indices(columns, rule):
+            parser = parsers.get(col_idx)
+            if parser is None:
+                parser = parsers[col_idx] = DateParser(DataCleaner.DATE_FORMATS)
+            arr = columns.get(col_idx)
+            # 与 DataCleaner 一致: 跳过空值 (None、空字符串、0 等)
+            positions = np.flatnonzero(_bool_array(map(bool, arr), len(arr)) & columns.present(col_idx))
+            texts = list(map(str, arr[positions]))
+            converted = _object_array(parser.format_many(texts, target_format), len(texts))
+            changed = converted != None  # noqa: E711 - 逐元素比较
+            if changed.any():
+                columns.set(col_idx, positions[changed], converted[changed])
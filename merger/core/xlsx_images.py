@@ -0,0 +1,152 @@
+"""
+XLSX 嵌入图片提取
+直接从 zip 包中读取首个工作表的绘图部件 (xl/drawings/*.xml) 与图片 (xl/media/*),
+无需再以完整模式加载整个工作簿
+"""
+import sys
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+from io import BytesIO
+
+try:
+    from PIL import Image as PILImage
+except ImportError:  # pragma: no cover - Pillow is optional
+    PILImage = None
+
+
+NS = {
+    'main': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main',
+    'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships',
+    'rel': 'http://schemas.openxmlformats.org/package/2006/relationships',
+    'xdr': 'http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing',
+    'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
+}
+
+REL_TYPE_WORKSHEET = '/worksheet'
+REL_TYPE_DRAWING = '/drawing'
+REL_TYPE_IMAGE = '/image'
+
+DEFAULT_IMAGE_SIZE = 100
+
+
+def _rels_path(part):
+    """返回部件对应的 .rels 路径, 如 xl/workbook.xml -> xl/_rels/workbook.xml.rels"""
+    folder, name = posixpath.split(part)
+    return posixpath.join(folder, '_rels', f'{name}.rels')
+
+
+def _read_rels(archive, part):
+    """读取部件的关系表, 返回 {rId: (type, 绝对路径)}"""
+    rels_path = _rels_path(part)
+    try:
+        tree = ET.fromstring(archive.read(rels_path))
+    except KeyError:
+        return {}
+
+    base = posixpath.dirname(part)
+    rels = {}
+    for rel in tree.findall('rel:Relationship', NS):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            target = target.lstrip('/')
+        else:
+            target = posixpath.normpath(posixpath.join(base, target))
+        rels[rel.get('Id')] = (rel.get('Type', ''), target)
+    return rels
+
+
+def _first_worksheet_part(archive):
+    """定位首个工作表的部件路径 (与 openpyxl 的 wb.worksheets[0] 一致)"""
+    workbook_part = 'xl/workbook.xml'
+    for rel_type, target in _read_rels(archive, '').values():
+        if rel_type.endswith('/officeDocument'):
+            workbook_part = target
+            break
+
+    workbook_rels = _read_rels(archive, workbook_part)
+    tree = ET.fromstring(archive.read(workbook_part))
+    for sheet in tree.iterfind('main:sheets/main:sheet', NS):
+        rel = workbook_rels.get(sheet.get(f"{{{NS['r']}}}id"))
+        if rel and rel[0].endswith(REL_TYPE_WORKSHEET):
+            return rel[1]
+    return None
+
+
+def _image_size(image_bytes):
+    """读取图片像素尺寸; 无法识别的图片返回 None"""
+    if PILImage is None:
+        return DEFAULT_IMAGE_SIZE, DEFAULT_IMAGE_SIZE
+    try:
+        # PIL 只解析文件头即可得到尺寸
+        with PILImage.open(BytesIO(image_bytes)) as img:
+            if (img.format or '').upper() == 'WMF':
+                return None
+            return img.size
+    except OSError:
+        return None
+
+
+def extract_images(path):
+    """
+    提取首个工作表中锚定到单元格的图片
+
+    Args:
+        path: xlsx 文件路径或可 seek 的二进制文件对象
+
+    Returns:
+        list of dict: [{'image_data': bytes, 'anchor_info': {'row', 'col', 'width', 'height'}}]
+        row/col 为 0-based, 与 openpyxl 的 anchor._from 一致
+    """
+    images_info = []
+
+    with zipfile.ZipFile(path) as archive:
+        sheet_part = _first_worksheet_part(archive)
+        if not sheet_part:
+            return images_info
+
+        for rel_type, drawing_part in _read_rels(archive, sheet_part).values():
+            if not rel_type.endswith(REL_TYPE_DRAWING):
+                continue
+
+            try:
+                drawing = ET.fromstring(archive.read(drawing_part))
+            except KeyError:
+                continue
+            drawing_rels = _read_rels(archive, drawing_part)
+
+            anchors = drawing.findall('xdr:twoCellAnchor', NS) + drawing.findall('xdr:oneCellAnchor', NS)
+            for anchor in anchors:
+                try:
+                    blip = anchor.find('xdr:pic/xdr:blipFill/a:blip', NS)
+                    start = anchor.find('xdr:from', NS)
+                    if blip is None or start is None:
+                        continue
+
+                    rel = drawing_rels.get(blip.get(f"{{{NS['r']}}}embed"))
+                    if not rel or not rel[0].endswith(REL_TYPE_IMAGE):
+                        continue
+
+                    img_bytes = archive.read(rel[1])
+                    if not img_bytes:
+                        continue
+
+                    size = _image_size(img_bytes)
+                    if size is None:
+                        continue
+
+                    images_info.append({
+                        'image_data': img_bytes,
+                        'anchor_info': {
+                            'row': int(start.findtext('xdr:row', '0', NS)),
+                            'col': int(start.findtext('xdr:col', '0', NS)),
+                            'width': size[0],
+                            'height': size[1],
+                        },
+                    })
+                except Exception as exc:
+                    print(f"Warning: Failed to extract image: {exc}", file=sys.stderr)
+
+    return images_info
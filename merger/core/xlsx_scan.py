@@ -0,0 +1,241 @@
+"""
+XLSX 表头窗口扫描
+直接增量解析首个工作表的 XML, 只读取前若干行, 共享字符串也只解析到窗口中用到的最大序号,
+因此耗时与文件总行数基本无关; 单元格值按 openpyxl 只读模式的规则解码
+"""
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+from openpyxl.cell.text import Text
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH, from_excel, from_ISO8601
+
+from .xlsx_images import NS, _first_worksheet_part, _read_rels
+
+MAIN = f"{{{NS['main']}}}"
+
+# 最多跳过的前导空行数, 超过后按空表处理
+MAX_LEADING_BLANK_ROWS = 1000
+
+# 估算行数时至少解析的 XML 字节数
+ESTIMATE_SAMPLE_BYTES = 64 * 1024
+
+_CELL_REF = re.compile(r'([A-Z]+)(\d+)')
+_DIMENSION_REF = re.compile(r'[A-Z]+\d+:[A-Z]+(\d+)$')
+
+
+class _CountingReader:
+    """记录已读取字节数的只读包装"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def _column_index(letters):
+    idx = 0
+    for ch in letters:
+        idx = idx * 26 + (ord(ch) - 64)
+    return idx - 1
+
+
+def _cast_number(raw):
+    """与 openpyxl 一致: 含小数点或指数的按 float, 否则按 int"""
+    if '.' in raw or 'E' in raw or 'e' in raw:
+        return float(raw)
+    return int(raw)
+
+
+class _SharedStrings:
+    """按需增量解析共享字符串表, 只解析到用到的最大序号为止"""
+
+    def __init__(self, archive, part):
+        self._src = archive.open(part) if part is not None else None
+        self._events = ET.iterparse(self._src, events=('end',)) if self._src is not None else iter(())
+        self._strings = []
+
+    def get(self, idx):
+        while idx >= len(self._strings):
+            elem = next((elem for _, elem in self._events if elem.tag == f'{MAIN}si'), None)
+            if elem is None:
+                return None
+            # 与 openpyxl 一致: 拼接正文与富文本片段, 忽略注音 (rPh)
+            self._strings.append(Text.from_tree(elem).content.replace('x005F_', ''))
+            elem.clear()
+        return self._strings[idx]
+
+    def close(self):
+        if self._src is not None:
+            self._src.close()
+
+
+class _CellReader:
+    """按 openpyxl 只读模式 (data_only, values_only) 的规则解码单元格值"""
+
+    def __init__(self, archive, workbook_part):
+        self.epoch = WINDOWS_EPOCH
+        try:
+            workbook = ET.fromstring(archive.read(workbook_part))
+        except KeyError:
+            workbook = None
+        if workbook is not None:
+            properties = workbook.find(f'{MAIN}workbookPr')
+            if properties is not None and properties.get('date1904') not in (None, '', 'false', 'f', '0'):
+                self.epoch = CALENDAR_MAC_1904
+
+        # 与 openpyxl 一致, 样式表固定位于 xl/styles.xml
+        self.date_styles = set()
+        self.timedelta_styles = set()
+        try:
+            styles = Stylesheet.from_tree(ET.fromstring(archive.read('xl/styles.xml')))
+        except KeyError:
+            styles = None
+        if styles is not None:
+            self.date_styles = styles.date_formats
+            self.timedelta_styles = styles.timedelta_formats
+
+        part = None
+        for rel_type, target in _read_rels(archive, workbook_part).values():
+            if rel_type.endswith('/sharedStrings'):
+                part = target
+                break
+        self.strings = _SharedStrings(archive, part)
+
+    def value(self, cell):
+        cell_type = cell.get('t', 'n')
+        if cell_type == 'inlineStr':
+            child = cell.find(f'{MAIN}is')
+            return Text.from_tree(child).content if child is not None else None
+
+        raw = cell.findtext(f'{MAIN}v') or None
+        if raw is None:
+            return None
+        if cell_type == 'n':
+            value = _cast_number(raw)
+            style = int(cell.get('s') or 0)
+            if style in self.date_styles:
+                try:
+                    return from_excel(value, self.epoch, timedelta=style in self.timedelta_styles)
+                except (OverflowError, ValueError):
+                    return '#VALUE!'
+            return value
+        if cell_type == 's':
+            return self.strings.get(int(raw))
+        if cell_type == 'b':
+            return bool(int(raw))
+        if cell_type == 'd':
+            return from_ISO8601(raw)
+        return raw
+
+    def close(self):
+        self.strings.close()
+
+
+def _is_blank(values):
+    """与 DataProcessor._is_blank_row 一致"""
+    return not any(value is not None and str(value).strip() != "" for value in values)
+
+
+def scan_sheet(path, window_rows):
+    """
+    读取首个工作表开头的行
+
+    单元格值的解码与 openpyxl 只读模式一致 (日期样式的数值转为日期时间、共享字符串、
+    内联字符串等), 空行的判定与 DataProcessor._is_blank_row 一致, 因此得到的表头与
+    stream_excel 相同。
+
+    Args:
+        path: xlsx 文件路径或二进制文件对象
+        window_rows: 首个非空行起需要读取的行数
+
+    Returns:
+        (rows, estimated_rows): rows 为从第 1 行起的值元组列表 (缺失行为空元组),
+        前导空行超过 MAX_LEADING_BLANK_ROWS 时为 None (窗口不完整, 调用方应退回流式读取);
+        estimated_rows 为工作表总行数估计 (优先使用 <dimension>), 无法估计时为 None
+    """
+    with zipfile.ZipFile(path) as archive:
+        sheet_part = _first_worksheet_part(archive)
+        if sheet_part is None:
+            return [], None
+
+        workbook_part = 'xl/workbook.xml'
+        for rel_type, target in _read_rels(archive, '').values():
+            if rel_type.endswith('/officeDocument'):
+                workbook_part = target
+                break
+
+        sheet_size = archive.getinfo(sheet_part).file_size
+        dimension_rows = None
+        rows = []
+        first_non_empty = None
+        parsed_rows = 0
+        last_row_number = 0
+        finished = True
+        complete = True
+
+        reader = None
+        cells = _CellReader(archive, workbook_part)
+        try:
+            with archive.open(sheet_part) as src:
+                reader = _CountingReader(src)
+                for event, elem in ET.iterparse(reader, events=('start', 'end')):
+                    if event == 'start':
+                        if elem.tag == f'{MAIN}dimension':
+                            match = _DIMENSION_REF.match(elem.get('ref', ''))
+                            if match and int(match.group(1)) > 1:
+                                dimension_rows = int(match.group(1))
+                        continue
+
+                    if elem.tag != f'{MAIN}row':
+                        continue
+
+                    parsed_rows += 1
+                    last_row_number = int(elem.get('r', last_row_number + 1))
+                    window_done = (
+                        first_non_empty is not None
+                        and len(rows) >= first_non_empty + window_rows
+                    )
+
+                    if not window_done:
+                        if first_non_empty is None and last_row_number > MAX_LEADING_BLANK_ROWS:
+                            finished = complete = False
+                            break
+                        values = {}
+                        for cell in elem.iter(f'{MAIN}c'):
+                            match = _CELL_REF.match(cell.get('r', ''))
+                            col = _column_index(match.group(1)) if match else len(values)
+                            values[col] = cells.value(cell)
+
+                        while len(rows) < last_row_number - 1:
+                            rows.append(())
+                        row = [None] * (max(values) + 1 if values else 0)
+                        for col, value in values.items():
+                            row[col] = value
+                        rows.append(tuple(row))
+                        if first_non_empty is None and not _is_blank(row):
+                            first_non_empty = len(rows) - 1
+
+                    elem.clear()
+
+                    if window_done and (dimension_rows or reader.bytes_read >= ESTIMATE_SAMPLE_BYTES):
+                        finished = False
+                        break
+        finally:
+            cells.close()
+
+    if dimension_rows:
+        estimated_rows = dimension_rows
+    elif finished:
+        estimated_rows = last_row_number
+    elif reader is not None and reader.bytes_read:
+        estimated_rows = round(parsed_rows * sheet_size / reader.bytes_read)
+    else:
+        estimated_rows = None
+
+    return (rows if complete else None), estimated_rows
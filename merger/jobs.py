@@ -0,0 +1,351 @@
+"""
+合并任务队列
+以 MergeTask 表作为本地任务队列, 无需外部消息中间件:
+接口只把任务标记为 queued, 由 run_merge_worker 管理命令启动的工作进程领取并处理
+"""
+import os
+import socket
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .models import MergeTask, ValidationResult
+from .core import compression
+from .core.data_processor import DataProcessor
+from .core.dedup import DEFAULT_MEMORY_LIMIT
+from .core.pipeline import StreamingMergePipeline, DEFAULT_CHUNK_SIZE, can_stream, projection_columns
+from .core.progress import ProgressTracker
+from .core.rule_plan import RulePlan
+
+
+DEFAULT_POLL_INTERVAL = 2.0
+
+# 已在队列中或正在处理的任务状态, 不能再次入队
+ACTIVE_STATUSES = ('queued', 'processing')
+
+
+def worker_name():
+    """工作进程标识: 主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue_task(task):
+    """
+    把任务放入队列, 由工作进程异步处理
+
+    与 claim_next_task 一样通过带状态条件的 UPDATE 入队: 任务已在队列中或正在处理时
+    (包括检查之后刚被工作进程领取的情况) 不做任何修改
+
+    Returns:
+        是否已入队
+    """
+    fields = {
+        'status': 'queued',
+        'error_message': None,
+        'queued_at': timezone.now(),
+        'started_at': None,
+        'finished_at': None,
+        'worker': '',
+        'progress': {},
+    }
+    queued = MergeTask.objects.filter(pk=task.pk).exclude(status__in=ACTIVE_STATUSES).update(**fields)
+    if queued:
+        for name, value in fields.items():
+            setattr(task, name, value)
+    return bool(queued)
+
+
+def start_task(task):
+    """
+    在当前进程中开始处理任务 (未启用任务队列时), 同样以带状态条件的 UPDATE 抢占
+
+    Returns:
+        是否已开始 (任务已在队列中或正在处理时为 False)
+    """
+    started_at = timezone.now()
+    started = MergeTask.objects.filter(pk=task.pk).exclude(status__in=ACTIVE_STATUSES).update(
+        status='processing', started_at=started_at
+    )
+    if started:
+        task.status = 'processing'
+        task.started_at = started_at
+    return bool(started)
+
+
+def claim_next_task(worker):
+    """
+    领取最早入队的任务
+
+    通过带状态条件的 UPDATE 抢占, 多个工作进程同时领取同一任务时只有一个会成功
+
+    Returns:
+        MergeTask 或 None (队列为空)
+    """
+    while True:
+        task_id = (MergeTask.objects.filter(status='queued')
+                   .order_by('queued_at', 'id')
+                   .values_list('id', flat=True)
+                   .first())
+        if task_id is None:
+            return None
+
+        claimed = MergeTask.objects.filter(pk=task_id, status='queued').update(
+            status='processing',
+            started_at=timezone.now(),
+            worker=worker,
+        )
+        if claimed:
+            return MergeTask.objects.get(pk=task_id)
+
+
+def recover_orphaned_tasks():
+    """把本机上已退出的工作进程遗留的 processing 任务重新放回队列"""
+    host = socket.gethostname()
+    recovered = 0
+    for task in MergeTask.objects.filter(status='processing', worker__startswith=f"{host}:"):
+        try:
+            pid = int(task.worker.rsplit(':', 1)[1])
+        except (IndexError, ValueError):
+            continue
+        if _pid_alive(pid):
+            continue
+        recovered += MergeTask.objects.filter(pk=task.pk, status='processing', worker=task.worker).update(
+            status='queued', worker='', started_at=None, progress={}
+        )
+    return recovered
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def result_member_name(task):
+    """结果文件名 (压缩输出时为压缩包中的文件名)"""
+    return f"merged_{task.id}.{task.output_format}"
+
+
+def _merge_and_write(task, file_paths, output, progress):
+    """
+    读取 → 清洗 → 验证 → 列规则 → 单元格操作 → 列过滤 → 写出到 output
+
+    Args:
+        output: 输出路径, 或可写的二进制流 (压缩输出时)
+
+    Returns:
+        验证结果 (未配置验证规则时为 None)
+    """
+    cleaning_rules = [{
+        'action': rule.action,
+        'columns': rule.columns,
+        'parameters': rule.parameters,
+        'order': rule.order
+    } for rule in task.cleaning_rules.all()]
+
+    validation_rules = [{
+        'column': rule.column,
+        'rule_type': rule.rule_type,
+        'parameters': rule.parameters,
+        'error_message': rule.error_message
+    } for rule in task.validation_rules.all()]
+
+    column_rule = task.column_rule.to_dict() if hasattr(task, 'column_rule') else None
+    operations = [op.to_dict() for op in task.cell_operations.all()]
+
+    validation_result = None
+    if getattr(settings, 'MERGE_STREAMING', True) and can_stream(cleaning_rules):
+        # 流式管道: 按块读取、处理并写出, 内存占用与总行数无关
+        pipeline = StreamingMergePipeline(
+            file_paths,
+            cleaning_rules=cleaning_rules,
+            validation_rules=validation_rules,
+            column_rule=column_rule,
+            operations=operations,
+            filter_mode=task.filter_mode,
+            filter_columns=task.filter_columns,
+            chunk_size=getattr(settings, 'MERGE_CHUNK_SIZE', DEFAULT_CHUNK_SIZE),
+            progress=progress,
+            cleaning_backend=getattr(settings, 'CLEANING_BACKEND', 'python'),
+            dedup_memory_limit=getattr(settings, 'DEDUP_MEMORY_LIMIT', DEFAULT_MEMORY_LIMIT),
+        )
+        validation_result = pipeline.run(output, task.output_format)['validation']
+    else:
+        # 需要整列数据的清洗规则 (向后/均值/中位数填充) 走内存模式
+        with progress.stage('scan'):
+            scan = DataProcessor.scan_headers(file_paths)
+        estimates = [f['estimated_rows'] for f in scan['files']]
+        if None not in estimates:
+            progress.set_total_rows(sum(estimates))
+
+        combined_header, merged_rows, metadata = DataProcessor.merge_files(
+            file_paths,
+            output_format=task.output_format,
+            workers=getattr(settings, 'MERGE_READ_WORKERS', 1),
+            progress=progress,
+            columns=projection_columns(
+                scan['columns'], cleaning_rules, validation_rules, column_rule,
+                operations, task.filter_mode, task.filter_columns
+            )
+        )
+
+        # 清洗 → 验证 → 列规则 → 单元格操作 → 列过滤, 编译为执行计划后融合执行
+        plan = RulePlan(
+            combined_header, cleaning_rules, validation_rules, column_rule, operations,
+            task.filter_mode, task.filter_columns,
+            cleaning_backend=getattr(settings, 'CLEANING_BACKEND', 'python'),
+            dedup_memory_limit=getattr(settings, 'DEDUP_MEMORY_LIMIT', DEFAULT_MEMORY_LIMIT),
+        )
+        try:
+            merged_rows = plan.run(merged_rows, progress, list(enumerate(metadata['file_rows'])))
+        finally:
+            plan.close()
+        combined_header = plan.header
+        validation_result = plan.validation_result()
+
+        # 写入文件
+        with progress.stage('write', len(merged_rows)):
+            DataProcessor.write_file(
+                combined_header,
+                merged_rows,
+                output,
+                metadata,
+                task.output_format
+            )
+
+    return validation_result
+
+
+def process_task(task):
+    """
+    执行合并任务: 读取 → 清洗 → 验证 → 列规则 → 单元格操作 → 列过滤 → 写出
+
+    成功时任务状态置为 completed, 失败时置为 failed 并记录错误信息后重新抛出异常;
+    处理过程中的进度快照约每秒写入一次 MergeTask.progress
+
+    Returns:
+        验证结果 (未配置验证规则时为 None)
+    """
+    uploaded_files = list(task.files.all())
+    progress = ProgressTracker(
+        file_names=[f.original_filename for f in uploaded_files],
+        callback=lambda snapshot: MergeTask.objects.filter(pk=task.pk).update(progress=snapshot),
+        interval=getattr(settings, 'MERGE_PROGRESS_INTERVAL', 1.0),
+    )
+
+    output_path = None
+    try:
+        # 获取所有上传的文件路径
+        file_paths = [f.source for f in uploaded_files]
+
+        if not file_paths:
+            raise Exception('没有可处理的文件')
+
+        # 结果直接写入存储中的最终位置, 完成后只把文件名关联到 result_file, 不再复制
+        member_name = result_member_name(task)
+        output_filename = member_name + compression.SUFFIXES.get(task.output_compression, '')
+        storage = task.result_file.storage
+        output_name = storage.get_available_name(
+            task.result_file.field.generate_filename(task, output_filename),
+            max_length=task.result_file.field.max_length,
+        )
+        output_path = Path(storage.path(output_name))
+
+        # 确保目录存在
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if task.output_compression in compression.OUTPUT_COMPRESSIONS:
+            # 写出器直接写入压缩流, 边写边压缩
+            with compression.open_output(output_path, task.output_compression, member_name) as output:
+                validation_result = _merge_and_write(task, file_paths, output, progress)
+            result_size = output.bytes_written
+            result_compressed_size = output_path.stat().st_size
+        else:
+            validation_result = _merge_and_write(task, file_paths, output_path, progress)
+            result_size = output_path.stat().st_size
+            result_compressed_size = None
+
+        if validation_result is not None:
+            # 保存验证结果
+            ValidationResult.objects.update_or_create(
+                task=task,
+                defaults={
+                    'is_valid': validation_result['is_valid'],
+                    'errors': validation_result['errors'],
+                    'warnings': validation_result['warnings'],
+                    'statistics': validation_result['statistics']
+                }
+            )
+
+        # 关联结果文件, 重新处理时替换掉上一次的结果
+        previous_result = task.result_file.name
+        task.result_file.name = output_name
+        task.result_size = result_size
+        task.result_compressed_size = result_compressed_size
+        task.status = 'completed'
+        task.error_message = None
+        task.finished_at = timezone.now()
+        task.progress = progress.finish()
+        task.save()
+
+        if previous_result and previous_result != output_name:
+            try:
+                storage.delete(previous_result)
+            except OSError as e:
+                print(f"Warning: Failed to delete previous result {previous_result}: {e}", file=sys.stderr)
+
+        return validation_result
+
+    except Exception as e:
+        # 删除写了一半的结果
+        if output_path is not None and output_path.exists():
+            output_path.unlink()
+        task.status = 'failed'
+        task.error_message = str(e)
+        task.finished_at = timezone.now()
+        task.progress = progress.snapshot()
+        task.save()
+        raise
+
+
+def run_worker(poll_interval=DEFAULT_POLL_INTERVAL, once=False):
+    """
+    工作进程主循环: 反复领取并处理队列中的任务
+
+    Args:
+        poll_interval: 队列为空时的轮询间隔 (秒)
+        once: 为 True 时处理完当前队列中的任务后退出
+
+    Returns:
+        已处理的任务数
+    """
+    worker = worker_name()
+    processed = 0
+
+    while True:
+        close_old_connections()
+        task = claim_next_task(worker)
+        if task is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+
+        started = time.time()
+        try:
+            process_task(task)
+            stages = ', '.join(
+                f"{name} {stage['elapsed']:.1f}s" for name, stage in task.progress.get('stages', {}).items()
+            )
+            print(f"[{worker}] Task {task.id} completed in {time.time() - started:.1f}s ({stages})", file=sys.stderr)
+        except Exception as e:
+            print(f"[{worker}] Task {task.id} failed: {e}", file=sys.stderr)
+        processed += 1
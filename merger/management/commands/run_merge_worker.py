@@ -0,0 +1,59 @@
+"""
+启动合并任务工作进程
+
+    python manage.py run_merge_worker --processes 4
+"""
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from merger.jobs import run_worker, recover_orphaned_tasks, DEFAULT_POLL_INTERVAL
+
+
+class Command(BaseCommand):
+    help = '启动合并任务工作进程, 从任务队列中领取并处理合并任务'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1,
+                            help='工作进程数 (默认 1)')
+        parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                            help='队列为空时的轮询间隔, 单位秒')
+        parser.add_argument('--once', action='store_true',
+                            help='处理完当前队列中的任务后退出')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        poll_interval = options['poll_interval']
+        once = options['once']
+
+        recovered = recover_orphaned_tasks()
+        if recovered:
+            self.stdout.write(f'已将 {recovered} 个中断的任务重新放回队列')
+
+        self.stdout.write(f'启动 {processes} 个工作进程 (Ctrl+C 退出)')
+
+        if processes == 1:
+            try:
+                processed = run_worker(poll_interval=poll_interval, once=once)
+            except KeyboardInterrupt:
+                return
+            self.stdout.write(self.style.SUCCESS(f'已处理 {processed} 个任务'))
+            return
+
+        # 子进程不能共用父进程的数据库连接
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=run_worker, kwargs={'poll_interval': poll_interval, 'once': once})
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+            for worker in workers:
+                worker.join()
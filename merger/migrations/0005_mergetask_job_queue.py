@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merger', '0004_tasktemplate_datacleaningrule_datavalidationrule_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mergetask',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='处理结束时间'),
+        ),
+        migrations.AddField(
+            model_name='mergetask',
+            name='queued_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='入队时间'),
+        ),
+        migrations.AddField(
+            model_name='mergetask',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='开始处理时间'),
+        ),
+        migrations.AddField(
+            model_name='mergetask',
+            name='worker',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='处理进程'),
+        ),
+        migrations.AlterField(
+            model_name='mergetask',
+            name='status',
+            field=models.CharField(choices=[('pending', '等待处理'), ('queued', '排队中'), ('processing', '处理中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 03:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merger', '0005_mergetask_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mergetask',
+            name='progress',
+            field=models.JSONField(blank=True, default=dict, verbose_name='处理进度'),
+        ),
+    ]
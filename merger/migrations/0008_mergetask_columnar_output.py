@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merger', '0007_mergetask_ndjson_output'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mergetask',
+            name='output_format',
+            field=models.CharField(choices=[('xlsx', 'XLSX'), ('xls', 'XLS'), ('csv', 'CSV'), ('json', 'JSON'), ('ndjson', 'NDJSON'), ('parquet', 'Parquet'), ('arrow', 'Arrow IPC')], default='xlsx', max_length=10, verbose_name='输出格式'),
+        ),
+        migrations.AlterField(
+            model_name='tasktemplate',
+            name='output_format',
+            field=models.CharField(choices=[('xlsx', 'XLSX'), ('xls', 'XLS'), ('csv', 'CSV'), ('json', 'JSON'), ('ndjson', 'NDJSON'), ('parquet', 'Parquet'), ('arrow', 'Arrow IPC')], default='xlsx', max_length=10, verbose_name='输出格式'),
+        ),
+    ]
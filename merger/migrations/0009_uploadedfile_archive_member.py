@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merger', '0008_mergetask_columnar_output'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='archive_member',
+            field=models.CharField(blank=True, default='', max_length=255, verbose_name='压缩包成员'),
+        ),
+    ]
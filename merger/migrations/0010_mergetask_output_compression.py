@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-17 04:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merger', '0009_uploadedfile_archive_member'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mergetask',
+            name='output_compression',
+            field=models.CharField(choices=[('none', '不压缩'), ('gzip', 'gzip'), ('zip', 'zip')], default='none', max_length=10, verbose_name='输出压缩'),
+        ),
+        migrations.AddField(
+            model_name='mergetask',
+            name='result_compressed_size',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='结果大小 (压缩后, 字节)'),
+        ),
+        migrations.AddField(
+            model_name='mergetask',
+            name='result_size',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='结果大小 (未压缩, 字节)'),
+        ),
+        migrations.AddField(
+            model_name='tasktemplate',
+            name='output_compression',
+            field=models.CharField(choices=[('none', '不压缩'), ('gzip', 'gzip'), ('zip', 'zip')], default='none', max_length=10, verbose_name='输出压缩'),
+        ),
+    ]
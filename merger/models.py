@@ -1,12 +1,14 @@
 from django.db import models
 from django.utils import timezone
 import json
+from .core.archive import ArchiveMember
 
 
 class MergeTask(models.Model):
     """合并任务模型"""
     STATUS_CHOICES = [
         ('pending', '等待处理'),
+        ('queued', '排队中'),
         ('processing', '处理中'),
         ('completed', '已完成'),
         ('failed', '失败'),
@@ -17,6 +19,15 @@ class MergeTask(models.Model):
         ('xls', 'XLS'),
         ('csv', 'CSV'),
         ('json', 'JSON'),
+        ('ndjson', 'NDJSON'),
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow IPC'),
+    ]
+    
+    OUTPUT_COMPRESSION_CHOICES = [
+        ('none', '不压缩'),
+        ('gzip', 'gzip'),
+        ('zip', 'zip'),
     ]
     
     FILTER_MODE_CHOICES = [
@@ -28,10 +39,18 @@ class MergeTask(models.Model):
     name = models.CharField(max_length=200, verbose_name='任务名称')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name='状态')
     output_format = models.CharField(max_length=10, choices=OUTPUT_FORMAT_CHOICES, default='xlsx', verbose_name='输出格式')
+    output_compression = models.CharField(max_length=10, choices=OUTPUT_COMPRESSION_CHOICES, default='none', verbose_name='输出压缩')
     filter_mode = models.CharField(max_length=10, choices=FILTER_MODE_CHOICES, default='none', verbose_name='列过滤模式')
     filter_columns = models.JSONField(default=list, verbose_name='过滤列列表')
     result_file = models.FileField(upload_to='results/', null=True, blank=True, verbose_name='结果文件')
+    result_size = models.BigIntegerField(null=True, blank=True, verbose_name='结果大小 (未压缩, 字节)')
+    result_compressed_size = models.BigIntegerField(null=True, blank=True, verbose_name='结果大小 (压缩后, 字节)')
     error_message = models.TextField(null=True, blank=True, verbose_name='错误信息')
+    queued_at = models.DateTimeField(null=True, blank=True, db_index=True, verbose_name='入队时间')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='开始处理时间')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='处理结束时间')
+    worker = models.CharField(max_length=100, blank=True, default='', verbose_name='处理进程')
+    progress = models.JSONField(default=dict, blank=True, verbose_name='处理进度')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='创建时间')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='更新时间')
     
@@ -45,9 +64,15 @@ class MergeTask(models.Model):
 
 
 class UploadedFile(models.Model):
-    """上传文件模型"""
+    """
+    上传文件模型
+    
+    zip/gz 压缩包上传后, 其中每个可读取的成员对应一条记录, 这些记录共用同一个压缩包文件,
+    archive_member 为成员名 (普通文件为空)
+    """
     task = models.ForeignKey(MergeTask, on_delete=models.CASCADE, related_name='files', verbose_name='所属任务')
     file = models.FileField(upload_to='uploads/', verbose_name='文件')
+    archive_member = models.CharField(max_length=255, blank=True, default='', verbose_name='压缩包成员')
     original_filename = models.CharField(max_length=255, verbose_name='原始文件名')
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name='上传时间')
     
@@ -58,6 +83,21 @@ class UploadedFile(models.Model):
     
     def __str__(self):
         return self.original_filename
+    
+    @property
+    def source(self):
+        """供 DataProcessor 读取的输入: 普通文件为路径, 压缩包成员为 ArchiveMember"""
+        if self.archive_member:
+            return ArchiveMember(self.file.path, self.archive_member)
+        return self.file.path
+    
+    def delete_file(self):
+        """删除物理文件; 压缩包仍被其他成员记录引用时保留"""
+        if not self.file:
+            return
+        shared = UploadedFile.objects.filter(file=self.file.name).exclude(pk=self.pk).exists()
+        if not shared:
+            self.file.delete(save=False)
 
 
 class ColumnRule(models.Model):
@@ -149,6 +189,7 @@ class TaskTemplate(models.Model):
     name = models.CharField(max_length=200, verbose_name='模板名称')
     description = models.TextField(blank=True, verbose_name='模板描述')
     output_format = models.CharField(max_length=10, choices=MergeTask.OUTPUT_FORMAT_CHOICES, default='xlsx', verbose_name='输出格式')
+    output_compression = models.CharField(max_length=10, choices=MergeTask.OUTPUT_COMPRESSION_CHOICES, default='none', verbose_name='输出压缩')
     filter_mode = models.CharField(max_length=10, choices=MergeTask.FILTER_MODE_CHOICES, default='none', verbose_name='列过滤模式')
     filter_columns = models.JSONField(default=list, verbose_name='过滤列列表')
     
@@ -178,6 +219,7 @@ class TaskTemplate(models.Model):
     def apply_to_task(self, task):
         """将模板应用到任务"""
         task.output_format = self.output_format
+        task.output_compression = self.output_compression
         task.filter_mode = self.filter_mode
         task.filter_columns = self.filter_columns
         task.save()
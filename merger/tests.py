@@ -0,0 +1,186 @@
+"""
+merger 核心逻辑的回归测试
+运行: python manage.py test merger
+"""
+import copy
+import os
+import random
+import shutil
+import tempfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from .core import arrow_io
+from .core.data_analyzer import DataCleaner
+from .core.data_processor import DataProcessor, ARROW_SUPPORT
+from .core.rule_plan import NON_STREAMING_FILL_METHODS
+from .core.vectorized_cleaner import VectorizedCleaner
+
+
+class ColumnarWriteTests(SimpleTestCase):
+    """Parquet / Arrow 写出的列类型: 类型混杂的列不会被强制转换, 结果与值的顺序无关"""
+
+    def setUp(self):
+        if not ARROW_SUPPORT:
+            self.skipTest('pyarrow 未安装')
+        self.tempdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempdir)
+
+    def write(self, values, output_format='parquet'):
+        """把单列的值写出后读回, 返回 (列类型, 读回的值)"""
+        import pyarrow.ipc as ipc
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.tempdir, f'out.{output_format}')
+        DataProcessor.write_file(['a'], [[value] for value in values], path, None, output_format)
+        if output_format == 'parquet':
+            table = pq.read_table(path)
+        else:
+            with open(path, 'rb') as f:
+                table = ipc.open_file(f).read_all()
+        return table.schema.field('a').type, table.column('a').to_pylist()
+
+    def test_mixed_types_become_strings(self):
+        day = date(2024, 1, 1)
+        moment = datetime(2024, 1, 2, 3, 4)
+        cases = [
+            ([day, 5], ['2024-01-01', '5']),
+            ([5, day], ['5', '2024-01-01']),
+            ([datetime(2024, 1, 1), 7], ['2024-01-01 00:00:00', '7']),
+            ([time(1, 2), 9], ['01:02:00', '9']),
+            ([day, moment], ['2024-01-01', '2024-01-02 03:04:00']),
+            ([1.5, True], ['1.5', 'True']),
+            ([True, 1.5], ['True', '1.5']),
+            ([3, False], ['3', 'False']),
+            ([False, 3], ['False', '3']),
+            (['a', 1], ['a', '1']),
+        ]
+        for values, expected in cases:
+            for output_format in ('parquet', 'arrow'):
+                with self.subTest(values=values, output_format=output_format):
+                    data_type, result = self.write(values, output_format)
+                    self.assertEqual(str(data_type), 'string')
+                    self.assertEqual(result, expected)
+
+    def test_numbers_widen_to_float(self):
+        for values in ([1, 2.5], [2.5, 1]):
+            with self.subTest(values=values):
+                data_type, result = self.write(values)
+                self.assertEqual(str(data_type), 'double')
+                self.assertEqual(result, [float(value) for value in values])
+
+    def test_uniform_types_are_kept(self):
+        day = date(2024, 1, 2)
+        cases = [
+            ([None, 3, ''], 'int64', [None, 3, None]),
+            ([day, None, day], 'date32[day]', [day, None, day]),
+            ([True, None, False], 'bool', [True, None, False]),
+            (['', None], 'string', [None, None]),
+        ]
+        for values, expected_type, expected in cases:
+            with self.subTest(values=values):
+                data_type, result = self.write(values)
+                self.assertEqual(str(data_type), expected_type)
+                self.assertEqual(result, expected)
+
+    def test_types_widen_across_batches(self):
+        day = date(2024, 1, 1)
+        cases = [
+            ([day, None, 5, 6], 'string', ['2024-01-01', None, '5', '6']),
+            ([1, 2, 2.5, None], 'double', [1.0, 2.0, 2.5, None]),
+            ([1.5, 2.5, True, False], 'string', ['1.5', '2.5', 'True', 'False']),
+            ([None, None, 1, 2], 'int64', [None, None, 1, 2]),
+            ([None, None, day, datetime(2024, 1, 1, 1)], 'string',
+             [None, None, '2024-01-01', '2024-01-01 01:00:00']),
+        ]
+        with mock.patch.object(arrow_io, 'BATCH_ROWS', 2):
+            for values, expected_type, expected in cases:
+                with self.subTest(values=values):
+                    data_type, result = self.write(values)
+                    self.assertEqual(str(data_type), expected_type)
+                    self.assertEqual(result, expected)
+
+
+class VectorizedCleanerEquivalenceTests(SimpleTestCase):
+    """
+    VectorizedCleaner 与 DataCleaner 的随机对照: 两种清洗后端对同一输入必须得到相同的结果
+    (包括抛出的异常类型)
+
+    覆盖长短不一的行、混合类型的单元格 (数字、数字字符串、布尔值、NaN、日期、Decimal)、
+    重复行, 以及按块执行时跨批次延续的状态 (去重、向前填充、日期布局)
+    """
+
+    HEADER = ['a', 'b', 'c', 'd', 'e', 'a']
+    ACTIONS = ['remove_duplicates', 'fill_null', 'convert_type', 'trim_spaces',
+               'standardize_date', 'uppercase', 'lowercase', 'unknown']
+    VALUES = [
+        None, '', ' ', ' a ', 'ABC', 'abc ', 'x', 0, 1, 2, -3, 1.5, True, False, float('nan'),
+        '1.5', '-2', '3', '007', '２', '1e3', 'inf', ' 12 ', 'NaN',
+        '2024-01-05', '2024/02/03', '05/06/2023', '2023-01-01 10:11:12', 'bad-date',
+        datetime(2024, 1, 2, 3, 4, 5), Decimal('2.5'),
+    ]
+    CASES = 2000
+    CHUNK_SIZE = 7
+
+    def random_rules(self, rng):
+        rules = []
+        for _ in range(rng.randint(1, 6)):
+            action = rng.choice(self.ACTIONS)
+            params = {}
+            if action == 'fill_null':
+                params = {'method': rng.choice(['forward', 'backward', 'value', 'mean', 'median']),
+                          'value': rng.choice(['X', 0, None])}
+            elif action == 'convert_type':
+                params = {'type': rng.choice(['integer', 'float', 'string', 'other'])}
+            elif action == 'standardize_date':
+                params = {'format': rng.choice(['%Y-%m-%d', '%d.%m.%Y'])}
+            rules.append({
+                'action': action,
+                'columns': rng.sample(self.HEADER[:5] + ['zz'], rng.randint(0, 3)),
+                'parameters': params,
+                'order': rng.randint(0, 3),
+            })
+        return rules
+
+    def random_rows(self, rng):
+        rows = [
+            [rng.choice(self.VALUES) for _ in range(rng.choice([6, 6, 6, 6, 3, 0, 1, 8]))]
+            for _ in range(rng.randint(0, 40))
+        ]
+        # 重复行
+        rows.extend(list(rng.choice(rows)) for _ in range(len(rows) // 4))
+        return rows
+
+    def clean(self, cleaner, rows, rules, chunked):
+        """执行清洗, 返回结果行的 repr (NaN 之间可以比较) 或异常类型"""
+        try:
+            if not chunked:
+                return repr(cleaner.apply_cleaning_rules(list(self.HEADER), rows, rules)[1])
+            state = {}
+            cleaned = []
+            for start in range(0, len(rows), self.CHUNK_SIZE):
+                chunk = rows[start:start + self.CHUNK_SIZE]
+                cleaned.extend(cleaner.apply_cleaning_rules(list(self.HEADER), chunk, rules, state=state)[1])
+            return repr(cleaned)
+        except Exception as e:
+            return f'exception {type(e).__name__}'
+
+    def test_matches_python_cleaner(self):
+        rng = random.Random(0)
+        for case in range(self.CASES):
+            rules = self.random_rules(rng)
+            rows = self.random_rows(rng)
+            # 需要整列数据的填充方式不能按块执行
+            chunked = rng.random() < 0.4 and not any(
+                rule['action'] == 'fill_null'
+                and rule['parameters'].get('method') in NON_STREAMING_FILL_METHODS
+                for rule in rules
+            )
+            expected = self.clean(DataCleaner, copy.deepcopy(rows), rules, chunked)
+            result = self.clean(VectorizedCleaner, copy.deepcopy(rows), rules, chunked)
+            if result != expected:
+                self.fail(f'case {case} (chunked={chunked})\nrules: {rules!r}\nrows: {rows!r}\n'
+                          f'DataCleaner: {expected}\nVectorizedCleaner: {result}')
@@ -18,6 +18,7 @@ urlpatterns = [
     path('api/tasks/<int:task_id>/download/', views.api_download_result, name='api_download_result'),
     path('api/tasks/<int:task_id>/delete/', views.api_delete_task, name='api_delete_task'),
     path('api/tasks/<int:task_id>/status/', views.api_get_task_status, name='api_get_task_status'),
+    path('api/tasks/<int:task_id>/columns/', views.api_scan_task_columns, name='api_scan_task_columns'),
     
     # API 路由 - 文件相关
     path('api/files/<int:file_id>/delete/', views.api_delete_file, name='api_delete_file'),
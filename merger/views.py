@@ -3,14 +3,16 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse, FileResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
-from django.core.files.base import ContentFile
+from django.utils.cache import patch_vary_headers
 from django.conf import settings
 from pathlib import Path
 import base64
 import io
 import json
+import mimetypes
 import os
 import re
+import zipfile
 
 import matplotlib
 matplotlib.use('Agg')
@@ -26,10 +28,15 @@ except ImportError:  # pragma: no cover - seaborn is optional
 from .models import (MergeTask, UploadedFile, ColumnRule, CellOperation,
                      TaskTemplate, FilePreview, DataCleaningRule, 
                      DataValidationRule, ValidationResult)
-from .core import excel_processor
+from .core import archive, excel_processor
+from .jobs import enqueue_task, process_task, result_member_name, start_task
 from .core.data_processor import DataProcessor
-from .core.data_analyzer import (DataPreviewGenerator, DataCleaner, 
-                                DataValidator, ChartGenerator)
+from .core.data_analyzer import (DataPreviewGenerator, DataValidator,
+                                ChartGenerator)
+
+
+# 可上传的数据文件格式; zip/gz 压缩包中这些格式的成员会被展开为独立的输入文件
+UPLOAD_FORMATS = ['xlsx', 'xls', 'csv', 'json', 'jsonl', 'ndjson', 'parquet', 'arrow', 'feather']
 
 
 def index(request):
@@ -246,8 +253,14 @@ def _read_dataframe_from_upload(uploaded_file, sheet_name=None, max_rows=50000):
             df = pd.read_csv(stream, header=0)
         elif file_ext == '.json':
             df = pd.read_json(stream)
+        elif file_ext in {'.jsonl', '.ndjson'}:
+            df = pd.read_json(stream, lines=True)
+        elif file_ext == '.parquet':
+            df = pd.read_parquet(stream)
+        elif file_ext in {'.arrow', '.feather'}:
+            df = pd.read_feather(stream)
         else:
-            raise ValueError('仅支持 Excel (.xlsx/.xls)、CSV 或 JSON 文件')
+            raise ValueError('仅支持 Excel (.xlsx/.xls)、CSV、JSON、JSON Lines、Parquet 或 Arrow 文件')
     except ValueError as exc:
         raise exc
     except Exception as exc:
@@ -256,7 +269,7 @@ def _read_dataframe_from_upload(uploaded_file, sheet_name=None, max_rows=50000):
     df = _trim_leading_empty_rows(df)
 
     inferred_header = None
-    if file_ext != '.json' and _should_infer_header(df.columns):
+    if file_ext not in {'.json', '.jsonl', '.ndjson', '.parquet', '.arrow', '.feather'} and _should_infer_header(df.columns):
         raw_stream = io.BytesIO(payload)
         try:
             if file_ext in {'.xlsx', '.xls'}:
@@ -676,6 +689,7 @@ def api_create_task(request):
         task = MergeTask.objects.create(
             name=data.get('name', '未命名任务'),
             output_format=data.get('output_format', 'xlsx'),
+            output_compression=data.get('output_compression', 'none'),
             filter_mode=data.get('filter_mode', 'none'),
             filter_columns=data.get('filter_columns', []),
         )
@@ -703,7 +717,10 @@ def api_upload_file(request, task_id):
         for file in files:
             # 检查文件格式
             file_ext = file.name.split('.')[-1].lower()
-            if file_ext not in ['xlsx', 'xls', 'csv', 'json']:
+            if file_ext in archive.ARCHIVE_FORMATS:
+                uploaded_files.extend(_save_archive_upload(task, file))
+                continue
+            if file_ext not in UPLOAD_FORMATS:
                 continue
             
             uploaded_file = UploadedFile.objects.create(
@@ -728,6 +745,36 @@ def api_upload_file(request, task_id):
         }, status=400)
 
 
+def _save_archive_upload(task, file):
+    """
+    保存 zip/gz 压缩包: 压缩包只存储一份, 每个可读取的成员创建一条 UploadedFile 记录,
+    读取时直接从压缩包中流式解压; 无法识别的压缩包或没有可读取成员时跳过
+    """
+    try:
+        members = archive.list_members(file, file.name, UPLOAD_FORMATS)
+    except (zipfile.BadZipFile, ValueError):
+        return []
+    finally:
+        file.seek(0)
+    
+    saved = []
+    stored_name = None
+    for member in members:
+        uploaded_file = UploadedFile.objects.create(
+            task=task,
+            # 第一个成员保存压缩包, 其余成员引用同一个文件
+            file=stored_name or file,
+            archive_member=member,
+            original_filename=f"{file.name}/{member}" if file.name.lower().endswith('.zip') else member
+        )
+        stored_name = uploaded_file.file.name
+        saved.append({
+            'id': uploaded_file.id,
+            'name': uploaded_file.original_filename
+        })
+    return saved
+
+
 @require_http_methods(["POST"])
 def api_add_column_rule(request, task_id):
     """API: 添加列规则"""
@@ -803,128 +850,40 @@ def api_add_cell_operations(request, task_id):
 
 @require_http_methods(["POST"])
 def api_process_task(request, task_id):
-    """API: 处理任务 - 使用通用数据处理器"""
+    """API: 处理任务 - 放入任务队列, 由 run_merge_worker 工作进程处理"""
     try:
         task = get_object_or_404(MergeTask, pk=task_id)
         
-        # 更新任务状态
-        task.status = 'processing'
-        task.save()
+        if not task.files.exists():
+            raise Exception('没有可处理的文件')
         
-        try:
-            # 获取所有上传的文件路径
-            file_paths = [f.file.path for f in task.files.all()]
-            
-            if not file_paths:
-                raise Exception('没有可处理的文件')
-            
-            # 使用通用数据处理器合并文件
-            combined_header, merged_rows, metadata = DataProcessor.merge_files(
-                file_paths, 
-                output_format=task.output_format
-            )
-            
-            # 1. 应用数据清洗规则
-            cleaning_rules = [{
-                'action': rule.action,
-                'columns': rule.columns,
-                'parameters': rule.parameters,
-                'order': rule.order
-            } for rule in task.cleaning_rules.all()]
-            
-            if cleaning_rules:
-                combined_header, merged_rows = DataCleaner.apply_cleaning_rules(
-                    combined_header, 
-                    merged_rows, 
-                    cleaning_rules
-                )
-            
-            # 2. 应用数据验证规则（如果有）
-            validation_rules = [{
-                'column': rule.column,
-                'rule_type': rule.rule_type,
-                'parameters': rule.parameters,
-                'error_message': rule.error_message
-            } for rule in task.validation_rules.all()]
-            
-            if validation_rules:
-                validation_result = DataValidator.validate_data(
-                    combined_header, 
-                    merged_rows, 
-                    validation_rules
-                )
-                
-                # 保存验证结果
-                ValidationResult.objects.update_or_create(
-                    task=task,
-                    defaults={
-                        'is_valid': validation_result['is_valid'],
-                        'errors': validation_result['errors'],
-                        'warnings': validation_result['warnings'],
-                        'statistics': validation_result['statistics']
-                    }
-                )
-                
-                # 如果验证失败，根据配置决定是否继续
-                if not validation_result['is_valid']:
-                    # 这里可以选择抛出异常或继续处理
-                    # raise Exception(f"数据验证失败: {len(validation_result['errors'])} 个错误")
-                    pass
-            
-            # 3. 应用列规则
-            if hasattr(task, 'column_rule'):
-                rule_dict = task.column_rule.to_dict()
-                DataProcessor.create_derived_column(merged_rows, combined_header, rule_dict)
-            
-            # 4. 应用单元格操作
-            operations = [op.to_dict() for op in task.cell_operations.all()]
-            if operations:
-                DataProcessor.apply_cell_operations(merged_rows, combined_header, operations)
-            
-            # 5. 应用列过滤
-            if task.filter_mode != 'none' and task.filter_columns:
-                combined_header, merged_rows = DataProcessor.filter_columns(
-                    combined_header, 
-                    merged_rows, 
-                    task.filter_mode, 
-                    task.filter_columns
-                )
-            
-            # 生成输出文件
-            output_filename = f"merged_{task.id}.{task.output_format}"
-            output_path = Path(settings.MEDIA_ROOT) / 'results' / output_filename
-            
-            # 确保目录存在
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 写入文件
-            DataProcessor.write_file(
-                combined_header,
-                merged_rows,
-                output_path,
-                metadata,
-                task.output_format
-            )
-            
-            # 保存结果文件
-            with open(output_path, 'rb') as f:
-                task.result_file.save(output_filename, ContentFile(f.read()))
-            
-            task.status = 'completed'
-            task.save()
-            
+        busy = JsonResponse({
+            'success': False,
+            'error': '任务已在处理中'
+        }, status=409)
+        
+        if getattr(settings, 'MERGE_JOB_QUEUE', True):
+            if not enqueue_task(task):
+                return busy
             return JsonResponse({
                 'success': True,
-                'message': '任务处理完成',
-                'download_url': task.result_file.url,
-                'validation': validation_result if validation_rules else None
-            })
-            
-        except Exception as e:
-            task.status = 'failed'
-            task.error_message = str(e)
-            task.save()
-            raise
+                'queued': True,
+                'message': '任务已加入处理队列',
+                'status': task.status,
+                'status_url': f'/api/tasks/{task.id}/status/'
+            }, status=202)
+        
+        # 未启用任务队列时在请求内同步处理
+        if not start_task(task):
+            return busy
+        validation_result = process_task(task)
+        
+        return JsonResponse({
+            'success': True,
+            'message': '任务处理完成',
+            'download_url': task.result_file.url,
+            'validation': validation_result
+        })
             
     except Exception as e:
         return JsonResponse({
@@ -940,8 +899,20 @@ def api_download_result(request, task_id):
     if not task.result_file:
         return HttpResponse('结果文件不存在', status=404)
     
-    response = FileResponse(task.result_file.open('rb'))
-    response['Content-Disposition'] = f'attachment; filename="{task.result_file.name}"'
+    filename = os.path.basename(task.result_file.name)
+    
+    # gzip 结果: 客户端支持时以 Content-Encoding: gzip 传输, 浏览器保存为解压后的文件;
+    # 否则作为 .gz 文件下载 (zip 结果始终作为 .zip 文件下载)
+    if task.output_compression == 'gzip' and re.search(r'\bgzip\b', request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        filename = result_member_name(task)
+        content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = FileResponse(task.result_file.open('rb'), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = FileResponse(task.result_file.open('rb'))
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if task.output_compression == 'gzip':
+        patch_vary_headers(response, ('Accept-Encoding',))
     return response
 
 
@@ -953,8 +924,7 @@ def api_delete_file(request, file_id):
         task = uploaded_file.task
         
         # 删除文件
-        if uploaded_file.file:
-            uploaded_file.file.delete()
+        uploaded_file.delete_file()
         
         uploaded_file.delete()
         
@@ -975,10 +945,10 @@ def api_delete_task(request, task_id):
     try:
         task = get_object_or_404(MergeTask, pk=task_id)
         
-        # 删除关联文件
+        # 删除关联文件 (逐条删除记录, 共用的压缩包在最后一个成员删除时才移除)
         for uploaded_file in task.files.all():
-            if uploaded_file.file:
-                uploaded_file.file.delete()
+            uploaded_file.delete_file()
+            uploaded_file.delete()
         
         if task.result_file:
             task.result_file.delete()
@@ -1037,14 +1007,21 @@ def api_get_task_status(request, task_id):
             'name': task.name,
             'status': task.status,
             'output_format': task.output_format,
+            'output_compression': task.output_compression,
             'filter_mode': task.filter_mode,
             'filter_columns': task.filter_columns,
             'files': files,
             'column_rule': column_rule,
             'operations': operations,
             'result_url': task.result_file.url if task.result_file else None,
+            'result_size': task.result_size,
+            'result_compressed_size': task.result_compressed_size,
             'error_message': task.error_message,
             'created_at': task.created_at.isoformat(),
+            'queued_at': task.queued_at.isoformat() if task.queued_at else None,
+            'started_at': task.started_at.isoformat() if task.started_at else None,
+            'finished_at': task.finished_at.isoformat() if task.finished_at else None,
+            'progress': task.progress,
         }
     })
 
@@ -1055,9 +1032,8 @@ def api_delete_file(request, file_id):
     try:
         uploaded_file = get_object_or_404(UploadedFile, pk=file_id)
         
-        # 删除物理文件
-        if uploaded_file.file:
-            uploaded_file.file.delete()
+        # 删除物理文件 (压缩包仍被其他成员引用时保留)
+        uploaded_file.delete_file()
         
         # 删除数据库记录
         uploaded_file.delete()
@@ -1080,8 +1056,8 @@ def api_preview_file(request, file_id):
     """API: 预览上传的文件"""
     try:
         uploaded_file = get_object_or_404(UploadedFile, pk=file_id)
-        file_path = uploaded_file.file.path
-        file_ext = Path(file_path).suffix.lower()
+        file_path = uploaded_file.source
+        file_ext = Path(uploaded_file.archive_member or file_path).suffix.lower()
         
         # 检查文件类型是否支持预览
         supported_formats = ['.xlsx', '.xls', '.csv']
@@ -1121,7 +1097,7 @@ def api_preview_file(request, file_id):
             sample_rows=preview_data['sample_rows'],
             total_rows=preview_data['total_rows'],
             total_columns=preview_data['total_columns'],
-            file_size=os.path.getsize(file_path),
+            file_size=archive.source_stat(file_path).st_size,
             column_types=preview_data['column_types'],
             null_counts=preview_data['null_counts']
         )
@@ -1146,6 +1122,36 @@ def api_preview_file(request, file_id):
         }, status=400)
 
 
+@require_http_methods(["GET"])
+def api_scan_task_columns(request, task_id):
+    """API: 预扫描任务文件的表头, 返回合并后的列 (供列过滤选择使用)"""
+    try:
+        task = get_object_or_404(MergeTask, pk=task_id)
+        uploaded_files = list(task.files.all())
+        
+        scan = DataProcessor.scan_headers([f.source for f in uploaded_files])
+        
+        files = [{
+            'id': uploaded_file.id,
+            'name': uploaded_file.original_filename,
+            'format': file_scan['format'],
+            'columns': file_scan['columns'],
+            'estimated_rows': file_scan['estimated_rows'],
+        } for uploaded_file, file_scan in zip(uploaded_files, scan['files'])]
+        
+        return JsonResponse({
+            'success': True,
+            'columns': scan['columns'],
+            'files': files,
+            'elapsed_ms': scan['elapsed_ms']
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+
 @require_http_methods(["POST"])
 def api_save_template(request):
     """API: 保存任务模板"""
@@ -1156,6 +1162,7 @@ def api_save_template(request):
             name=data.get('name', '未命名模板'),
             description=data.get('description', ''),
             output_format=data.get('output_format', 'xlsx'),
+            output_compression=data.get('output_compression', 'none'),
             filter_mode=data.get('filter_mode', 'none'),
             filter_columns=data.get('filter_columns', []),
             column_rule_config=data.get('column_rule_config'),
@@ -1187,6 +1194,7 @@ def api_list_templates(request):
             'name': t.name,
             'description': t.description,
             'output_format': t.output_format,
+            'output_compression': t.output_compression,
             'created_at': t.created_at.isoformat(),
             'updated_at': t.updated_at.isoformat()
         } for t in templates]
@@ -1215,6 +1223,7 @@ def api_get_template(request, template_id):
                 'name': template.name,
                 'description': template.description,
                 'output_format': template.output_format,
+                'output_compression': template.output_compression,
                 'filter_mode': template.filter_mode,
                 'filter_columns': template.filter_columns,
                 'column_rule_config': template.column_rule_config,
@@ -1348,7 +1357,7 @@ def api_validate_task_data(request, task_id):
         task = get_object_or_404(MergeTask, pk=task_id)
         
         # 获取所有上传的文件
-        file_paths = [f.file.path for f in task.files.all()]
+        file_paths = [f.source for f in task.files.all()]
         
         if not file_paths:
             raise Exception('没有可验证的文件')
@@ -1356,7 +1365,8 @@ def api_validate_task_data(request, task_id):
         # 合并文件数据
         combined_header, merged_rows, metadata = DataProcessor.merge_files(
             file_paths, 
-            output_format=task.output_format
+            output_format=task.output_format,
+            workers=getattr(settings, 'MERGE_READ_WORKERS', 1)
         )
         
         # 获取验证规则
@@ -1413,9 +1423,9 @@ def api_generate_charts(request, task_id):
         supported_formats = ['.xlsx', '.xls', '.csv']
         
         for f in files:
-            file_ext = Path(f.file.path).suffix.lower()
+            file_ext = Path(f.archive_member or f.file.path).suffix.lower()
             if file_ext in supported_formats:
-                file_paths.append(f.file.path)
+                file_paths.append(f.source)
             else:
                 unsupported_files.append(f.name)
         
@@ -1435,7 +1445,8 @@ def api_generate_charts(request, task_id):
         # 合并文件数据
         combined_header, merged_rows, metadata = DataProcessor.merge_files(
             file_paths, 
-            output_format=task.output_format
+            output_format=task.output_format,
+            workers=getattr(settings, 'MERGE_READ_WORKERS', 1)
         )
         
         # 分析列类型